@@ -3,45 +3,163 @@
 # Features: Bronze->Silver->Gold->Diamond (catalog from ENV or Google Sheet, cart, checkout, orders, stock, reports)
 #
 # Requirements: python 3.9+, packages: flask, requests
+# Serve with gunicorn --worker-class gthread (see Procfile): /admin/orders streams for longer than --timeout
 # Deploy notes: set TELEGRAM_BOT_TOKEN (new bot for isolation), ADMINS (comma separated chat_ids),
 # SHEET_URL (for silver+), PLAN (bronze/silver/gold/diamond), SHOW_PRODUCTS=1
 # Data persistence: SQLite file data.sqlite (created automatically)
 # ----------------------------------------------------------------------------
 
-import os, re, io, csv, json, time, sqlite3, requests
+import os, re, json, time, sqlite3, tempfile, threading, requests
 from datetime import datetime, timedelta
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
+from bot.outbound import make_outbox, OUTBOX_WORKERS
+from bot.dispatcher import make_dispatcher, update_chat_id, UPDATE_WORKERS
+from bot.router import IntentRouter, normalize_text
+from bot.catalog import Catalog, EMPTY as EMPTY_CATALOG, ENV_VERSION
+from bot.snapshot import SnapshotStore
+from bot.search import SearchIndex, fold as search_fold
+from bot import paging
+from bot.render_cache import RenderCache
+from bot.sheet_sync import sync_sheet, init_sync_schema, catalog_generation
+from bot.refresher import Refresher
+from bot.broadcast import BroadcastRunner, progress as broadcast_progress
+from bot.metrics import METRICS
+from bot.log import get_logger, sample as log_sample, tracing
+from bot.tenants import TenantRegistry, TenantConfigs
+from bot.zones import ZoneIndex, load_zones
+from storage.sessions import make_session_store
+from storage.pool import manager as db_manager, release as release_db
+from storage.db import UserStore, default_store, DEFAULT_DB as USERS_DB
+from storage.rollups import init_rollup_schema, record_order, range_summary, backfill as backfill_rollups
+from storage.order_items import init_order_items_schema, record_items, top_skus, top_categories
+from storage.dedup import UpdateDeduper
+from storage.inventory import init_inventory_schema, hold_cart, commit_cart, release_cart, expire_holds, current_stock, OutOfStock
+from storage.broadcasts import init_broadcasts, create_broadcast, cancel_broadcast, get_broadcast
+from storage.exports import export_chunks
 
 # ---------------- ENV / CONFIG ----------------
-BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-API_SEND = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage" if BOT_TOKEN else None
-BRAND_NAME = os.getenv("BRAND_NAME", "Work1 Shop")
-DEFAULT_LANG = (os.getenv("DEFAULT_LANG") or "FA").upper()
-PLAN = (os.getenv("PLAN") or "bronze").lower()
-SHOW_PRODUCTS = os.getenv("SHOW_PRODUCTS","0").strip().lower() in ["1","true","yes","on"]
-SHEET_URL = (os.getenv("SHEET_URL") or "").strip()
-ADMINS = [x.strip() for x in (os.getenv("ADMINS") or "").split(",") if x.strip()]
-WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET","")
-
-DB_FILE = os.getenv("DATA_DB_FILE", "data.sqlite")
-
-# Support channels
-SUPPORT_TG = (os.getenv("SUPPORT_TG") or "").strip()
-SUPPORT_EMAIL = (os.getenv("SUPPORT_EMAIL") or "").strip()
-SUPPORT_WHATSAPP = (os.getenv("SUPPORT_WHATSAPP") or "").strip()
-SUPPORT_INSTAGRAM = (os.getenv("SUPPORT_INSTAGRAM") or "").strip()
+# process-wide; everything a shop (tenant) may set for itself is read by Shop below
+METRICS_TOKEN = os.getenv("METRICS_TOKEN","")   # optional bearer token for /metrics
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN","")       # bearer token for /admin/* (unset = disabled)
+EXPORT_DOC_MAX = int(os.getenv("EXPORT_DOC_MAX_MB", "49")) * 1024 * 1024   # Bot API upload limit is 50 MB
+
+# multi-tenant: "tenants.json" or "db" (tenants table) -> extra shops at /webhook/telegram/<name>
+TENANTS_CONFIG = (os.getenv("TENANTS_CONFIG") or "").strip()
 
 # ---------------- App ----------------
 app = Flask(__name__)
+log = get_logger("app")
+TRACE_UPDATES = tracing(log)   # LOG_LEVEL=DEBUG + LOG_SAMPLE>0: sampled per-update records
 
-# ---------------- Helpers: DB ----------------
-def db_connect():
-    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+# ---------------- Metrics ----------------
+# per-shop series carry the shop's name as `tenant` ("" = SHOP, this process's own shop)
+UPDATE_SECONDS = METRICS.histogram("jawab_update_seconds", "process_update latency by intent", ("tenant", "intent"))
+UPDATE_ERRORS = METRICS.counter("jawab_update_errors_total", "process_update exceptions by intent", ("tenant", "intent"))
+DB_SECONDS = METRICS.histogram("jawab_db_query_seconds", "SQLite work on the request path", ("tenant", "query"))
+SYNC_SECONDS = METRICS.histogram("jawab_sheet_sync_seconds", "Google Sheet sync duration", ("tenant", "result"),
+                                 buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60))
+ZONE_LOOKUPS = METRICS.counter("jawab_delivery_zone_lookups_total", "Checkout locations by outcome", ("tenant", "result"))
+# per-thread request context: process_update records the intent it dispatched to
+_REQ = threading.local()
+
+def mark_intent(name):
+    _REQ.intent = name
+
+# ---------------- Shop ----------------
+class Shop:
+    """One bot: settings read from `env`, its SQLite files, outbox, sessions, catalog, caches and
+    background jobs. Handlers take it as their first argument. SHOP is built from os.environ;
+    tenants get theirs from TENANTS with a tenant-scoped env (bot/tenants.py)."""
+
+    def __init__(self, name:str, env):
+        self.name, self.env = name, env
+        get = env.get
+        self.log = get_logger(f"app.{name}") if name else log
+        self.bot_token = get("TELEGRAM_BOT_TOKEN")
+        api_base = (get("TELEGRAM_API_BASE") or "https://api.telegram.org").rstrip("/")   # e.g. a local Bot API server / bench stand-in
+        self.api_send = f"{api_base}/bot{self.bot_token}/sendMessage" if self.bot_token else None
+        self.api_edit = f"{api_base}/bot{self.bot_token}/editMessageText" if self.bot_token else None
+        self.api_answer = f"{api_base}/bot{self.bot_token}/answerCallbackQuery" if self.bot_token else None
+        self.api_document = f"{api_base}/bot{self.bot_token}/sendDocument" if self.bot_token else None
+        self.page_size = int(get("PAGE_SIZE", str(paging.PAGE_SIZE)))   # buttons per inline catalog page
+        self.brand_name = get("BRAND_NAME", "Work1 Shop")
+        self.default_lang = (get("DEFAULT_LANG") or "FA").upper()
+        self.plan = (get("PLAN") or "bronze").lower()
+        self.show_products = get("SHOW_PRODUCTS","0").strip().lower() in ["1","true","yes","on"]
+        self.sheet_url = (get("SHEET_URL") or "").strip()
+        self.use_sheet = self.plan in ["silver","gold","diamond"] and bool(self.sheet_url)
+        self.stock_tracking = self.plan in ["gold","diamond"]   # reserve stock at checkout, decrement on order
+        self.reservation_ttl = float(get("RESERVATION_TTL_MIN", "15")) * 60   # abandoned checkout holds expire
+        self.admins = [x.strip() for x in (get("ADMINS") or "").split(",") if x.strip()]
+        self.webhook_secret = get("WEBHOOK_SECRET","")
+        # async mode: webhook only validates + enqueues; workers (sharded by chat_id) run process_update
+        self.async_updates = get("ASYNC_UPDATES","0").strip().lower() in ["1","true","yes","on"]
+        # delivery zones (bot/zones.py): .json/.geojson/.csv file or sheet CSV URL; "" = deliver anywhere, no fee
+        self.delivery_zones = (get("DELIVERY_ZONES") or "").strip()
+        self.support_tg = (get("SUPPORT_TG") or "").strip()
+        self.support_email = (get("SUPPORT_EMAIL") or "").strip()
+        self.support_whatsapp = (get("SUPPORT_WHATSAPP") or "").strip()
+        self.support_instagram = (get("SUPPORT_INSTAGRAM") or "").strip()
+
+        # one connection per thread (and per process after gunicorn forks), WAL + tuned pragmas
+        self.db_file = get("DATA_DB_FILE", "data.sqlite")
+        self.pool = db_manager(self.db_file, row_factory=sqlite3.Row)
+        # users, messages log, broadcasts; the process shop shares storage.db's module-level store
+        self.users = UserStore(get("DB_PATH", USERS_DB), self.default_lang) if name else default_store()
+        # redelivered updates (same update_id) are acknowledged but not processed twice
+        self.dedup = UpdateDeduper(self.db, (self.bot_token or "").split(":")[0],
+                                   max_entries=int(get("DEDUP_MAX", "10000")), ttl=float(get("DEDUP_TTL_SEC", "86400")))
+        self.outbox = make_outbox(workers=int(get("OUTBOX_WORKERS", str(OUTBOX_WORKERS))), tenant=name)
+        # carts / flow state / phones: "memory" (per worker) or "sqlite" (shared by all gunicorn workers)
+        cart_ttl = float(get("CART_TTL_HOURS", "48")) * 3600   # abandoned carts expire (sqlite store)
+        self.sessions = make_session_store((get("SESSION_STORE") or "memory").lower(), get("SESSION_DB_FILE", self.db_file))
+        self.carts = self.sessions.namespace("cart", ttl=cart_ttl)  # chat_id -> list of items {sku,name,price,qty}
+        self.ctx = self.sessions.namespace("ctx", ttl=cart_ttl)     # chat_id -> flow state e.g. "cart_order"
+        self.phones = self.sessions.namespace("phone")
+        # users table (broadcast audience): one upsert per chat per process, not per message
+        self.seen_users = set()
+
+        # Catalog / SnapshotCatalog: indexed, versioned; swapped as a whole
+        self.catalog = EMPTY_CATALOG
+        # DB catalogs are published as one mmap'd binary snapshot shared by all workers; "" = per-worker dicts
+        snapshot_file = get("CATALOG_SNAPSHOT_FILE", self.db_file + ".catalog")
+        self.snapshots = SnapshotStore(snapshot_file) if snapshot_file and self.use_sheet else None
+        self.router = IntentRouter(intent_rules())
+        self.search = SearchIndex()   # words + trigrams over names/categories, follows catalog.version
+        self.render = RenderCache()
+        self.zones = ZoneIndex()
+
+        # background sheet refresh; CATALOG_REFRESH_SEC=0 = only on /sync
+        self.catalog_refresher = Refresher("catalog", lambda: refresh_catalog(self), float(get("CATALOG_REFRESH_SEC", "300")))
+        self.reservation_sweeper = Refresher("reservations", lambda: expire_reservations(self), 60)
+        self.zone_refresher = Refresher("zones", lambda: refresh_zones(self), float(get("ZONES_REFRESH_SEC", "600")))
+        # every worker polls; the job lease makes sure only one of them sends
+        self.broadcasts = BroadcastRunner(lambda chat_id, text, on_result: broadcast_send(self, chat_id, text, on_result), self.users)
+        self.broadcast_runner = Refresher("broadcast", self.broadcasts.tick, 5)
+        self.updates = make_dispatcher(lambda update: handle_update(self, update),
+                                       workers=int(get("UPDATE_WORKERS", str(UPDATE_WORKERS))))
 
-DB = db_connect()
-def init_db():
+        init_db(self)
+        if self.delivery_zones and not self.delivery_zones.startswith(("http://", "https://")):
+            try: refresh_zones(self)   # local file: ready before the first checkout
+            except Exception: self.log.exception("delivery zones load error")
+
+    def db(self):
+        return self.pool.get()
+
+    def close(self):
+        # tenant eviction: stop this shop's threads, flush what it still buffers, drop its DB handles
+        for r in (self.catalog_refresher, self.reservation_sweeper, self.broadcast_runner, self.zone_refresher):
+            r.stop()
+        self.updates.close()
+        self.outbox.close()
+        self.sessions.close()
+        self.users.close()
+        release_db(self.db_file)
+
+# ---------------- Helpers: DB ----------------
+def init_db(shop):
+    DB = shop.db()
     cur = DB.cursor()
     # products for Gold (persisted optionally) ; if using sheet, we'll sync into this table
     cur.execute("""CREATE TABLE IF NOT EXISTS products (
@@ -66,24 +184,64 @@ def init_db():
         status TEXT,
         created_at TEXT
     )""")
+    cols = [r[1] for r in cur.execute("PRAGMA table_info(orders)").fetchall()]
+    if "delivery_zone" not in cols:
+        cur.execute("ALTER TABLE orders ADD COLUMN delivery_zone TEXT")
+    if "delivery_fee" not in cols:
+        cur.execute("ALTER TABLE orders ADD COLUMN delivery_fee REAL DEFAULT 0")
     DB.commit()
-
-init_db()
+    init_sync_schema(DB)
+    init_rollup_schema(DB)
+    init_order_items_schema(DB)
+    init_inventory_schema(DB)
+    shop.dedup.init_schema()
+    init_broadcasts(shop.users.conn)
 
 # ---------------- Utilities ----------------
-def send_text(chat_id, text, keyboard=None, parse_mode=None):
-    if not BOT_TOKEN:
-        print("BOT_TOKEN not set, can't send message.")
+def send_text(shop, chat_id, text, keyboard=None, parse_mode=None):
+    if not shop.bot_token:
+        shop.log.warning("BOT_TOKEN not set, can't send message", extra={"chat_id": chat_id})
         return
     payload = {"chat_id": chat_id, "text": text}
     if keyboard:
         payload["reply_markup"] = keyboard
     if parse_mode:
         payload["parse_mode"] = parse_mode
-    try:
-        requests.post(API_SEND, json=payload, timeout=10)
-    except Exception as e:
-        print("send_text error:", e)
+    # queued: delivery happens on the outbox workers, not inside the webhook request
+    shop.outbox.submit(shop.api_send, payload)
+    shop.users.log_message(chat_id, text, "out")
+
+def edit_text(shop, chat_id, message_id, text, keyboard=None):
+    # in-place update of an inline-keyboard screen (browsing never piles up new messages)
+    if not shop.bot_token:
+        return
+    payload = {"chat_id": chat_id, "message_id": message_id, "text": text}
+    if keyboard:
+        payload["reply_markup"] = keyboard
+    shop.outbox.submit(shop.api_edit, payload)
+
+def answer_callback(shop, callback_id, text=None):
+    # stops the button spinner; text shows as a small toast
+    if not shop.bot_token:
+        return
+    payload = {"callback_query_id": callback_id}
+    if text:
+        payload["text"] = text
+    shop.outbox.submit(shop.api_answer, payload)
+
+def notify_admins(shop, text):
+    for admin in shop.admins:
+        try: send_text(shop, int(admin), text)
+        except ValueError: shop.log.warning("bad admin id", extra={"admin": admin})
+
+def remember_user(shop, chat_id, name):
+    if chat_id in shop.seen_users:
+        return
+    if len(shop.seen_users) >= 50000:
+        shop.seen_users.clear()
+    shop.users.upsert_user(chat_id, name)
+    shop.users.unmark_blocked(chat_id)   # writing to us again means they unblocked the bot
+    shop.seen_users.add(chat_id)
 
 def now_ts():
     return datetime.utcnow().isoformat()
@@ -92,26 +250,11 @@ def safe_float(x, default=0.0):
     try: return float(x)
     except: return default
 
-# normalize and strip emojis for matching
-def normalize_text(txt):
-    if not txt: return ""
-    t = str(txt)
-    for emo in ["🧩","🤖","💵","ℹ️","📞","🛟","🗂","✅","❌","🧺","📍","🧹"]:
-        t = t.replace(emo, "")
-    t = " ".join(t.split()).strip().lower()
-    return t
-
-def contains_any(text, needles):
-    t = normalize_text(text)
-    for n in needles:
-        if not n: continue
-        if normalize_text(n) in t: return True
-    return False
-
 # ---------------- Static text (defaults) ----------------
+# {brand} in "welcome" is the shop's BRAND_NAME
 TEXT = {
  "FA": {
-  "welcome": f"✨ به {BRAND_NAME} خوش آمدید ✨\nبرای شروع منو 🗂 را بزنید.",
+  "welcome": "✨ به {brand} خوش آمدید ✨\nبرای شروع منو 🗂 را بزنید.",
   "choose": "یک گزینه را انتخاب کنید:",
   "back":"↩️ بازگشت",
   "btn_products":"🛍 محصولات",
@@ -126,10 +269,15 @@ TEXT = {
   "phone_ok":"شماره شما ثبت شد.",
   "unknown":"متوجه نشدم. از دکمه‌ها استفاده کنید.",
   "catalog_empty":"کالکشن خالی است.",
-  "ask_address":"لطفاً آدرس خود را ارسال کنید یا از «ارسال لوکیشن» استفاده کنید."
+  "ask_address":"لطفاً آدرس خود را ارسال کنید یا از «ارسال لوکیشن» استفاده کنید.",
+  "need_location":"برای محاسبه هزینه ارسال، لطفاً با «📍 Send Location» موقعیت خود را بفرستید.",
+  "out_of_zone":"متأسفیم، به این موقعیت ارسال نداریم. موقعیت دیگری بفرستید یا بازگشت را بزنید.",
+  "zones_loading":"مناطق ارسال در حال بارگذاری است؛ لطفاً چند لحظه دیگر دوباره موقعیت را بفرستید.",
+  "min_order":"حداقل سفارش برای منطقه {zone}: ${min:.2f}. لطفاً محصولات بیشتری اضافه کنید.",
+  "delivery":"هزینه ارسال ({zone}): ${fee:.2f}\nجمع کل: ${total:.2f}"
  },
  "EN": {
-  "welcome": f"✨ Welcome to {BRAND_NAME} ✨\nTap Menu 🗂 to start.",
+  "welcome": "✨ Welcome to {brand} ✨\nTap Menu 🗂 to start.",
   "choose":"Please choose:",
   "back":"↩️ Back",
   "btn_products":"🛍 Products",
@@ -144,10 +292,15 @@ TEXT = {
   "phone_ok":"Your phone is saved.",
   "unknown":"Sorry, I didn't get that. Use the buttons.",
   "catalog_empty":"Catalog is empty.",
-  "ask_address":"Please send your address or use Send Location."
+  "ask_address":"Please send your address or use Send Location.",
+  "need_location":"To work out delivery, please share your location with “📍 Send Location”.",
+  "out_of_zone":"Sorry, we don't deliver to this location. Send another location or tap Back.",
+  "zones_loading":"Delivery areas are loading; please send your location again in a moment.",
+  "min_order":"Minimum order for {zone}: ${min:.2f}. Please add more items.",
+  "delivery":"Delivery ({zone}): ${fee:.2f}\nTotal: ${total:.2f}"
  },
  "AR": {
-  "welcome": f"✨ مرحباً بـ {BRAND_NAME} ✨\nاضغط القائمة 🗂 للبدء.",
+  "welcome": "✨ مرحباً بـ {brand} ✨\nاضغط القائمة 🗂 للبدء.",
   "choose":"اختر خياراً:",
   "back":"↩️ رجوع",
   "btn_products":"🛍 المنتجات",
@@ -162,15 +315,20 @@ TEXT = {
   "phone_ok":"تم حفظ رقمك.",
   "unknown":"لم أفهم. استخدم الأزرار.",
   "catalog_empty":"الكاتالوج فارغ.",
-  "ask_address":"الرجاء إرسال العنوان أو استخدام إرسال الموقع."
+  "ask_address":"الرجاء إرسال العنوان أو استخدام إرسال الموقع.",
+  "need_location":"لحساب رسوم التوصيل، الرجاء مشاركة موقعك عبر «📍 Send Location».",
+  "out_of_zone":"عذراً، لا نوصل إلى هذا الموقع. أرسل موقعاً آخر أو اضغط رجوع.",
+  "zones_loading":"جارٍ تحميل مناطق التوصيل؛ الرجاء إرسال موقعك مرة أخرى بعد قليل.",
+  "min_order":"الحد الأدنى للطلب في {zone}: ${min:.2f}. الرجاء إضافة منتجات أخرى.",
+  "delivery":"رسوم التوصيل ({zone}): ${fee:.2f}\nالمجموع: ${total:.2f}"
  }
 }
 
 # ENV overrides for welcome/about/prices are supported via get_section below
-def get_section(prefix, lang):
-    suf = (lang or DEFAULT_LANG).upper()
+def get_section(shop, prefix, lang):
+    suf = (lang or shop.default_lang).upper()
     for key in [f"{prefix}_{suf}", f"{prefix}_TEXT_{suf}", prefix]:
-        v = (os.getenv(key) or "").strip()
+        v = (shop.env.get(key) or "").strip()
         if v: return v
     # default fallback
     return TEXT[lang].get(prefix.lower(), "")
@@ -189,10 +347,10 @@ def reply_keyboard_layout(rows):
         kb_rows.append(row)
     return {"keyboard": kb_rows, "resize_keyboard": True}
 
-def menu_keyboard(lang):
+def menu_keyboard(shop, lang):
     L = TEXT[lang]
     rows = []
-    if SHOW_PRODUCTS:
+    if shop.show_products:
         rows.append([L["btn_products"], L["btn_cart"]])
     else:
         rows.append([L["btn_cart"]])
@@ -201,11 +359,53 @@ def menu_keyboard(lang):
     rows.append([L["back"]])
     return reply_keyboard_layout(rows)
 
+# ---------------- Intent router ----------------
+# priority order matters: first rule found in the text wins (categories sit right after "products")
+def intent_rules():
+    def btn(key): return [TEXT[l][key] for l in TEXT]
+    return [
+        ("products", btn("btn_products") + ["محصول", "products", "المنتجات"]),
+        ("empty_cart", ["empty cart", "خالی"]),   # before "cart": "🧹 Empty cart" contains it
+        ("cart",     btn("btn_cart") + ["سبد", "cart", "🧺"]),
+        ("checkout", btn("btn_order") + ["ثبت سفارش", "place order", "confirm order"]),
+        ("prices",   btn("btn_prices") + ["price", "قیمت", "الأسعار"]),
+        ("about",    btn("btn_about") + ["about", "درباره", "من نحن"]),
+        ("support",  ["پشتیبانی", "support", "الدعم"]),
+        ("back",     ["back", "بازگشت", "رجوع"]),
+    ]
+
+def rebuild_router(shop, catalog):
+    # called on every catalog (re)load so category names are matched in the same pass
+    shop.router = IntentRouter(intent_rules(), categories=catalog.categories)
+
 # ---------------- Catalog: in-memory and DB sync ----------------
-CATALOG = []  # list of dicts {sku,category,name,price,stock,is_available}
 
-def load_products_from_env(lang):
-    raw = os.getenv(f"PRODUCTS_{lang}", "") or os.getenv("PRODUCTS", "") or ""
+def install_catalog(shop, items, version=ENV_VERSION):
+    # build indexes off to the side, then publish with a single rebind
+    cat = Catalog(items, version)
+    if cat.version != shop.catalog.version:
+        shop.render.clear()   # cached catalog screens belong to the old generation
+    shop.catalog = cat
+    rebuild_router(shop, cat)
+    return len(cat)
+
+def adopt_snapshot(shop, snap):
+    if snap.version != shop.catalog.version:
+        shop.render.clear()
+    shop.catalog = snap
+    rebuild_router(shop, snap)
+    return len(snap)
+
+def check_catalog_snapshot(shop):
+    # another worker published a newer generation: remap it (stat at most once a second)
+    if shop.snapshots is None:
+        return
+    snap = shop.snapshots.current()
+    if snap is not None and snap is not shop.catalog and snap.version >= shop.catalog.version:
+        adopt_snapshot(shop, snap)
+
+def load_products_from_env(shop, lang):
+    raw = shop.env.get(f"PRODUCTS_{lang}", "") or shop.env.get("PRODUCTS", "") or ""
     items=[]
     for ln in raw.splitlines():
         ln = ln.strip()
@@ -221,168 +421,490 @@ def load_products_from_env(lang):
         items.append({"sku": sku, "category":"Uncategorized", "name":name, "price":safe_float(price), "stock":-1, "is_available":1})
     return items
 
-def sync_catalog_from_sheet():
-    if not SHEET_URL:
-        raise RuntimeError("SHEET_URL missing")
-    r = requests.get(SHEET_URL, timeout=15)
-    r.raise_for_status()
-    f = io.StringIO(r.text)
-    reader = csv.DictReader(f)
-    items=[]
-    for row in reader:
-        # expected keys: sku, category, item_name or name, price, is_available, stock
-        sku = (row.get("sku") or row.get("id") or "").strip()
-        cat = (row.get("category") or "").strip()
-        name = (row.get("item_name") or row.get("name") or "").strip()
-        price = safe_float(row.get("price") or row.get("price_usd") or 0)
-        avail = str(row.get("is_available") or "1").strip().lower() in ["1","true","yes","available"]
-        stock = -1
-        try:
-            stock = int(row.get("stock")) if row.get("stock") not in (None,"") else -1
-        except:
-            stock = -1
-        if not name:
-            continue
-        items.append({"sku": sku or name, "category": cat or "Uncategorized", "name": name, "price": price, "stock": stock, "is_available": 1 if avail else 0})
-    # persist into DB table products (replace)
-    cur = DB.cursor()
-    for it in items:
-        cur.execute("""INSERT OR REPLACE INTO products (sku,category,name,price,stock,is_available) VALUES (?,?,?,?,?,?)""",
-                    (it["sku"], it["category"], it["name"], it["price"], it["stock"] if it["stock"]>=0 else -1, it["is_available"]))
-    DB.commit()
-    # Also update in-memory CATALOG from DB
-    load_catalog_from_db()
-    return len(items)
+def sync_catalog_from_sheet(shop, force=False):
+    # incremental: conditional GET + streamed CSV + hash diff; returns added/changed/removed/elapsed
+    if not shop.sheet_url:
+        raise RuntimeError("shop.sheet_url missing")
+    t0 = time.perf_counter()
+    try:
+        res = sync_sheet(shop.db(), shop.sheet_url, force=force)
+    except Exception:
+        SYNC_SECONDS.observe(time.perf_counter() - t0, shop.name, "error")
+        raise
+    SYNC_SECONDS.observe(time.perf_counter() - t0, shop.name, "not_modified" if res["not_modified"] else "ok")
+    # Also update the in-memory catalog from DB when its generation moved (here or in another worker)
+    if catalog_generation(shop.db()) != shop.catalog.version or len(shop.catalog) == 0:
+        load_catalog_from_db(shop)
+    return res
 
-def load_catalog_from_db():
-    cur = DB.cursor()
-    cur.execute("SELECT sku,category,name,price,stock,is_available FROM products WHERE is_available=1")
-    rows = cur.fetchall()
+def load_catalog_from_db(shop):
+    with DB_SECONDS.time(shop.name, "load_catalog"):
+        gen = catalog_generation(shop.db())   # read before the rows: a concurrent sync only makes us reload again
+        if shop.snapshots is not None:
+            snap = shop.snapshots.current(force=True)
+            if snap is not None and snap.version == gen:   # already published by some worker
+                return adopt_snapshot(shop, snap)
+        cur = shop.db().cursor()
+        cur.execute("SELECT sku,category,name,price,stock,is_available FROM products WHERE is_available=1")
+        rows = cur.fetchall()
     items=[]
     for r in rows:
         items.append({"sku": r["sku"], "category": r["category"], "name": r["name"], "price": r["price"], "stock": r["stock"], "is_available": r["is_available"]})
-    global CATALOG
-    CATALOG = items
-    return len(items)
+    if shop.snapshots is not None:
+        try:
+            shop.snapshots.publish(items, gen)
+            return adopt_snapshot(shop, shop.snapshots.current(force=True))
+        except OSError:
+            shop.log.exception("catalog snapshot publish failed")
+    return install_catalog(shop, items, gen)
 
-def ensure_catalog():
-    # load from DB or ENV fallback
-    if PLAN in ["silver","gold","diamond"] and SHEET_URL:
+def ensure_catalog(shop):
+    # never touches SHEET_URL on the request path: serve what we have, the refresher fetches
+    if shop.use_sheet:
+        shop.catalog_refresher.start()
+        if len(shop.catalog):   # ENV fallback included: the refresher swaps in the sheet catalog when ready
+            return len(shop.catalog)
         try:
-            # try to load from DB first; if empty, sync
-            n = load_catalog_from_db()
-            if n == 0:
-                sync_catalog_from_sheet()
-                n = load_catalog_from_db()
-            return n
-        except Exception as e:
-            print("sync error:", e)
-            # fallback to ENV
-    # fallback to ENV
-    items = load_products_from_env(DEFAULT_LANG)
-    global CATALOG
-    CATALOG = items
-    return len(CATALOG)
+            n = load_catalog_from_db(shop)
+            if n:
+                return n
+        except Exception:
+            shop.log.exception("catalog load error")
+        # DB still empty: fetch in the background, fall back to ENV meanwhile
+        shop.catalog_refresher.kick()
+    # fallback to ENV: a shop's env never changes, so that catalog (and its router) is built once
+    if shop.catalog.version == ENV_VERSION:
+        return len(shop.catalog)
+    return install_catalog(shop, load_products_from_env(shop, shop.default_lang), ENV_VERSION)
+
+def refresh_catalog(shop):
+    sync_catalog_from_sheet(shop)
+    shop.search.ensure(shop.catalog)   # re-index changed products here, not on a user's first search
+    return len(shop.catalog)
+
+# ---------------- Product search ----------------
+def search_products(shop, query, limit=10):
+    shop.search.ensure(shop.catalog)
+    return [p for p in (shop.catalog.get(sku) for sku in shop.search.search(query, limit)) if p]
+
+def send_search_results(shop, chat_id, LANG, query):
+    prods = search_products(shop, query)
+    if not prods:
+        return False
+    rows = [[f"{i}) {p.get('name')} — ${safe_float(p.get('price')):.2f}"] for i, p in enumerate(prods, start=1)]
+    rows.append([TEXT[LANG]["back"]])
+    send_text(shop, chat_id, f"🔎 {query}:", keyboard=reply_keyboard_layout(rows))
+    # number picks resolve against this list (same flow as a category page)
+    shop.ctx[str(chat_id)] = json.dumps({"skus": [p["sku"] for p in prods]})
+    return True
+
+# ---------------- Render cache ----------------
+# static and catalog screens serialized once per (lang, screen, catalog version); a send only
+# splices the chat_id in. install_catalog / adopt_snapshot clear it when the version moves.
+
+def screen(shop, LANG, key, build):
+    # build(catalog) -> (text, keyboard); catalog pinned so key and content agree during a swap
+    cat = shop.catalog
+    return shop.render.get((LANG, key, cat.version), lambda: build(cat))
+
+def menu_screen(shop, LANG, key, text_fn):
+    return screen(shop, LANG, key, lambda cat: (text_fn(), menu_keyboard(shop, LANG)))
+
+def categories_screen(shop, LANG, page=0, text="Categories:"):
+    return screen(shop, LANG, ("categories", page, text), lambda cat: (text, paging.category_list(cat, page, shop.page_size)[1]))
+
+def products_screen(shop, LANG, cat_idx, page=0):
+    def build(cat):
+        p = paging.product_page(cat, cat_idx, page, shop.page_size, back_label=TEXT[LANG]["back"])
+        if not p:   # swapped under us: same fallback as a stale callback
+            return "Catalog updated. Categories:", paging.category_list(cat, 0, shop.page_size)[1]
+        return f"Products in {p[0]}:", p[3]
+    return screen(shop, LANG, ("products", cat_idx, page), build)
+
+def send_screen(shop, chat_id, frag):
+    if not shop.bot_token:
+        shop.log.warning("BOT_TOKEN not set, can't send message", extra={"chat_id": chat_id})
+        return
+    shop.outbox.submit(shop.api_send, frag.body(chat_id), chat_id=chat_id)
+    shop.users.log_message(chat_id, frag.text, "out")
+
+def edit_screen(shop, chat_id, message_id, frag):
+    if not shop.bot_token:
+        return
+    shop.outbox.submit(shop.api_edit, frag.body(chat_id, message_id), chat_id=chat_id)
 
 # ---------------- Cart & Flow ----------------
-CARTS = {}  # chat_id -> list of items {sku,name,price,qty}
-LEAD_CONTEXT = {}  # chat_id -> flow state e.g. "cart_order"
 
-def cart_add(chat_id, item):
-    lst = CARTS.get(str(chat_id), [])
+def cart_add(shop, chat_id, item):
+    lst = shop.carts.get(str(chat_id), [])
     for it in lst:
         if it["sku"] == item["sku"]:
             it["qty"] += item.get("qty",1)
-            CARTS[str(chat_id)] = lst; return
+            shop.carts[str(chat_id)] = lst; return
     cp = {"sku": item["sku"], "name": item["name"], "price": item["price"], "qty": item.get("qty",1)}
-    lst.append(cp); CARTS[str(chat_id)] = lst
+    lst.append(cp); shop.carts[str(chat_id)] = lst
 
-def cart_get(chat_id):
-    return CARTS.get(str(chat_id), [])
+def cart_get(shop, chat_id):
+    return shop.carts.get(str(chat_id), [])
 
-def cart_clear(chat_id):
-    CARTS.pop(str(chat_id), None)
+def cart_clear(shop, chat_id):
+    shop.carts.pop(str(chat_id), None)
 
-def cart_total(chat_id):
+def cart_total(shop, chat_id):
     total=0.0
-    for it in cart_get(chat_id):
+    for it in cart_get(shop, chat_id):
         total += safe_float(it.get("price",0)) * it.get("qty",1)
     return total
 
-def build_cart_message(lang, chat_id):
-    items = cart_get(chat_id)
+def build_cart_message(shop, lang, chat_id):
+    items = cart_get(shop, chat_id)
     if not items:
         return (TEXT[lang]["catalog_empty"], reply_keyboard_layout([[TEXT[lang]["back"]]]))
     lines=[]
     for i,it in enumerate(items, start=1):
         lines.append(f"{i}) {it['name']} x{it['qty']} — ${safe_float(it['price']):.2f}")
-    lines.append(f"\nTotal: ${cart_total(chat_id):.2f}")
+    lines.append(f"\nTotal: ${cart_total(shop, chat_id):.2f}")
     kb = reply_keyboard_layout([[TEXT[lang]["btn_order"], "🧹 Empty cart"], [TEXT[lang]["back"]]])
     return ("\n".join(lines), kb)
 
 # ---------------- Orders ----------------
-def create_order_db(chat_id, contact_phone, contact_name, address_text, location_lat, location_lon, items, total):
-    cur = DB.cursor()
-    cur.execute("""INSERT INTO orders (chat_id,contact_phone,contact_name,address_text,location_lat,location_lon,items_json,total,status,created_at)
-                VALUES (?,?,?,?,?,?,?,?,?)""", (str(chat_id), contact_phone or "", contact_name or "", address_text or "", location_lat or None, location_lon or None, json.dumps(items), total, "new", now_ts()))
-    DB.commit()
-    return cur.lastrowid
+def create_order_db(shop, chat_id, contact_phone, contact_name, address_text, location_lat, location_lon, items, total, zone=None, fee=0.0):
+    DB = shop.db()
+    created = now_ts()
+    touched = []
+    with DB_SECONDS.time(shop.name, "create_order"):
+        DB.execute("BEGIN IMMEDIATE")
+        with DB:   # stock, order, rollup and line rows commit together (OutOfStock rolls everything back)
+            cur = DB.execute("""INSERT INTO orders (chat_id,contact_phone,contact_name,address_text,location_lat,location_lon,items_json,total,status,created_at,delivery_zone,delivery_fee)
+                        VALUES (?,?,?,?,?,?,?,?,?,?,?,?)""", (str(chat_id), contact_phone or "", contact_name or "", address_text or "", location_lat or None, location_lon or None, json.dumps(items), total, "new", created, zone, fee))
+            oid = cur.lastrowid
+            record_order(DB, created, total, sum(int(it.get("qty",1)) for it in items))
+            record_items(DB, oid, created, items, category_of=lambda sku: (shop.catalog.get(sku) or {}).get("category"))
+            if shop.stock_tracking:
+                touched = commit_cart(DB, chat_id, items, oid)
+    refresh_stock(shop, touched)
+    return oid
 
-def report_summary(period="daily"):
-    cur = DB.cursor()
-    if period=="daily":
-        since = datetime.utcnow() - timedelta(days=1)
-    else:
-        since = datetime.utcnow() - timedelta(days=30)
-    cur.execute("SELECT COUNT(*) as cnt, SUM(total) as revenue FROM orders WHERE created_at > ?", (since.isoformat(),))
-    r = cur.fetchone()
-    return {"orders": r["cnt"] or 0, "revenue": float(r["revenue"] or 0.0)}
+# ---------------- Stock reservations ----------------
+def refresh_stock(shop, skus):
+    # patch the in-memory counts of just the touched SKUs instead of reloading the catalog
+    for sku, stock in current_stock(shop.db(), skus).items():
+        shop.catalog.set_stock(sku, stock)
+
+def out_of_stock_text(shop, e):
+    it = shop.catalog.get(e.sku) or {}
+    return f"Sorry, out of stock: {it.get('name') or e.sku} (available: {max(e.available, 0)})."
+
+def expire_reservations(shop):
+    skus = expire_holds(shop.db())
+    refresh_stock(shop, skus)
+    return len(skus)
+
+# ---------------- Delivery zones ----------------
+# a shared location resolves to (zone, fee, min order) through a grid index; no zone = refused
+def refresh_zones(shop):
+    shop.zones = ZoneIndex(load_zones(shop.delivery_zones))   # built aside, swapped in one assignment
+    shop.log.info("delivery zones loaded", extra=shop.zones.stats())
+    return len(shop.zones)
+
+def location_keyboard(lang):
+    return reply_keyboard_layout([[{"text":"📍 Send Location","request_location": True}], [TEXT[lang]["back"]]])
+
+# ---------------- Broadcasts ----------------
+def broadcast_send(shop, chat_id, text, on_result):
+    return shop.outbox.submit(shop.api_send, {"chat_id": chat_id, "text": text}, on_result=on_result)
+
+def parse_broadcast_args(text):
+    """'/broadcast [lang=XX] [source=YY] message' -> (lang, source, message)."""
+    rest = text.strip().split(None, 1)[1] if len(text.strip().split(None, 1)) > 1 else ""
+    lang = source = None
+    while True:
+        m = re.match(r"(lang|source)=(\S+)\s*", rest)
+        if not m: break
+        if m.group(1) == "lang": lang = m.group(2).upper()
+        else: source = m.group(2)
+        rest = rest[m.end():]
+    return lang, source, rest.strip()
+
+def parse_broadcast_command(text):
+    """'/broadcast status [id]' / '/broadcast cancel [id]' exactly -> (subcommand, id or None).
+    None for anything else: the text is a message to broadcast."""
+    parts = text.split()
+    if len(parts) in (2, 3) and parts[1].lower() in ("status", "cancel"):
+        if len(parts) == 2:
+            return parts[1].lower(), None
+        if parts[2].lstrip("#").isdigit():
+            return parts[1].lower(), int(parts[2].lstrip("#"))
+    return None
+
+def broadcast_status_text(shop, job_id=None):
+    job = get_broadcast(shop.users.conn, job_id) if job_id else None
+    if job_id and not job:
+        return f"No broadcast #{job_id}."
+    p = broadcast_progress(shop.users, job)
+    if not p:
+        return "No broadcasts yet."
+    line = f"Broadcast #{p['id']} [{p['status']}]: sent {p['sent']} | failed {p['failed']} | blocked {p['blocked']} | {p['processed']}/{p['total']} | {p['rate']:.1f} msg/s"
+    if p["status"] == "running" and p["remaining"]:
+        line += f" | ETA {int(p['eta_sec'] // 60)}m{int(p['eta_sec'] % 60):02d}s"
+    return line
+
+def parse_report_range(args):
+    """/report args -> (label, since, until) in UTC, or None if not understood.
+    daily|24h, today, 7d / 30d / Nd, monthly, YYYY-MM-DD [YYYY-MM-DD] (inclusive days)."""
+    now = datetime.utcnow()
+    a = args[0] if args else "daily"
+    if a in ("daily", "24h"):
+        return ("24h", now - timedelta(days=1), now)
+    if a == "today":
+        return ("today", now.replace(hour=0, minute=0, second=0, microsecond=0), now)
+    if a == "monthly":
+        return ("30d", now - timedelta(days=30), now)
+    m = re.fullmatch(r"(\d{1,4})d", a)
+    if m:
+        return (a, now - timedelta(days=int(m.group(1))), now)
+    try:
+        d1 = datetime.strptime(a, "%Y-%m-%d")
+        d2 = datetime.strptime(args[1], "%Y-%m-%d") if len(args) > 1 else d1
+    except ValueError:
+        return None
+    return (f"{d1:%Y-%m-%d}..{d2:%Y-%m-%d}", d1, d2 + timedelta(days=1))
+
+def report_summary(shop, since, until):
+    # answered from sales_hourly / sales_daily, not by scanning orders
+    with DB_SECONDS.time(shop.name, "report"):
+        return range_summary(shop.db(), since, until)
+
+# ---------------- Order export ----------------
+EXPORT_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson; charset=utf-8"}
+
+def parse_export_args(args):
+    """/export args -> (fmt, gz, status, period, since, until) or None.
+    [csv|ndjson] [gz] [status=x] [all|today|7d|30d|YYYY-MM-DD [YYYY-MM-DD]] (default 30d)."""
+    fmt, gz, status, rest = "csv", False, None, []
+    for a in args:
+        if a in EXPORT_TYPES: fmt = a
+        elif a in ("gz", "gzip"): gz = True
+        elif a.startswith("status="): status = a.split("=", 1)[1] or None
+        else: rest.append(a)
+    if rest == ["all"]:
+        return fmt, gz, status, "all", None, None
+    rng = parse_report_range(rest or ["30d"])
+    return (fmt, gz, status) + rng if rng else None
+
+def send_export(shop, chat_id, fmt, gz, status, period, since, until):
+    # runs on its own thread: spooled to a temp file, then uploaded as one sendDocument
+    name = f"orders_{period.replace('..', '_')}.{fmt}" + (".gz" if gz else "")
+    try:
+        with tempfile.TemporaryFile() as f:
+            for chunk in export_chunks(shop.db(), fmt, gz, since=since, until=until, status=status):
+                f.write(chunk)
+                if f.tell() > EXPORT_DOC_MAX:
+                    send_text(shop, chat_id, "Export is larger than Telegram allows: add gz, narrow the range or use /admin/orders." + fmt)
+                    return
+            f.seek(0)
+            r = requests.post(shop.api_document, data={"chat_id": chat_id, "caption": f"Orders {period}" + (f" [{status}]" if status else "")},
+                              files={"document": (name, f, "application/gzip" if gz else EXPORT_TYPES[fmt])}, timeout=120)
+        if r.status_code >= 400:
+            shop.log.warning("export upload failed", extra={"chat_id": chat_id, "status": r.status_code, "body": r.text[:200]})
+            send_text(shop, chat_id, f"Export upload failed ({r.status_code}).")
+    except Exception:
+        # the error text can hold the sendDocument URL (token): the log masks it, the chat gets none of it
+        shop.log.exception("export failed", extra={"chat_id": chat_id})
+        send_text(shop, chat_id, "Export failed, please try again later.")
 
 # ---------------- Support text builder ----------------
-def build_support_text(lang):
+def build_support_text(shop, lang):
     L = {
         "FA":{"title":"پشتیبانی 🛟","tg":"تلگرام","mail":"ایمیل","wa":"واتساپ","ig":"اینستاگرام"},
         "EN":{"title":"Support 🛟","tg":"Telegram","mail":"Email","wa":"WhatsApp","ig":"Instagram"},
         "AR":{"title":"الدعم 🛟","tg":"تيليجرام","mail":"البريد","wa":"واتساب","ig":"إنستغرام"},
     }[lang]
     lines=[L["title"]]
-    if SUPPORT_TG:
-        handle = SUPPORT_TG.lstrip("@")
+    if shop.support_tg:
+        handle = shop.support_tg.lstrip("@")
         lines.append(f"{L['tg']}: @{handle} (https://t.me/{handle})")
-    if SUPPORT_EMAIL:
-        lines.append(f"{L['mail']}: {SUPPORT_EMAIL}")
-    if SUPPORT_WHATSAPP:
-        lines.append(f"{L['wa']}: {SUPPORT_WHATSAPP}")
-    if SUPPORT_INSTAGRAM:
-        lines.append(f"{L['ig']}: @{SUPPORT_INSTAGRAM.replace('https://instagram.com/','').lstrip('@')}")
+    if shop.support_email:
+        lines.append(f"{L['mail']}: {shop.support_email}")
+    if shop.support_whatsapp:
+        lines.append(f"{L['wa']}: {shop.support_whatsapp}")
+    if shop.support_instagram:
+        lines.append(f"{L['ig']}: @{shop.support_instagram.replace('https://instagram.com/','').lstrip('@')}")
     return "\n".join(lines)
 
 # ---------------- Handlers (core) ----------------
+def shop_health(shop):
+    return {"plan": shop.plan, "catalog": {"version": shop.catalog.version, "items": len(shop.catalog)}, "catalog_refresh": shop.catalog_refresher.stats() if shop.use_sheet else None, "dedup": shop.dedup.stats(), "outbox": shop.outbox.stats(), "updates": shop.updates.stats() if shop.async_updates else None, "zones": dict(shop.zones.stats(), refresh=shop.zone_refresher.stats()) if shop.delivery_zones else None}
+
 @app.get("/health")
 def health():
-    return jsonify({"ok": True, "plan": PLAN})
+    return jsonify(dict(shop_health(SHOP), ok=True, tenants=TENANTS.stats() if TENANTS else None))
+
+def live_shops():
+    return [SHOP] + (TENANTS.shops() if TENANTS else [])
+
+def per_shop(fn):
+    # gauge over every resident shop: fn(shop) -> number | {label_value(s): number}, keyed by tenant first
+    def collect():
+        out = {}
+        for shop in live_shops():
+            v = fn(shop)
+            for k, x in (v.items() if isinstance(v, dict) else [((), v)]):
+                out[(shop.name,) + (k if isinstance(k, tuple) else (k,))] = x
+        return out
+    return collect
+
+# scrape-time gauges (the hot path only touches histograms / counters)
+METRICS.gauge("jawab_catalog_items", "Products in the in-memory catalog", per_shop(lambda shop: len(shop.catalog)), labels=("tenant",))
+METRICS.gauge("jawab_catalog_version", "Catalog generation served by this worker", per_shop(lambda shop: shop.catalog.version), labels=("tenant",))
+METRICS.gauge("jawab_active_carts", "Non-expired carts", per_shop(lambda shop: len(shop.carts)), labels=("tenant",))
+METRICS.gauge("jawab_queue_depth", "Items waiting in in-process queues", per_shop(lambda shop: {
+    "outbox": shop.outbox.stats()["queue_depth"],
+    "messages_journal": shop.users.messages.stats()["pending"],
+    **({"updates": shop.updates.stats()["queue_depth"]} if shop.async_updates else {})}), labels=("tenant", "queue"))
+METRICS.gauge("jawab_outbox_messages_total", "Outbox results", per_shop(lambda shop: {k: v for k, v in shop.outbox.stats().items()
+    if k in ("enqueued", "sent", "failed", "dropped", "throttled", "retried")}), labels=("tenant", "result"), kind="counter")
+METRICS.gauge("jawab_render_cache_lookups_total", "Pre-serialized screen lookups", per_shop(lambda shop: {
+    "hit": shop.render.hits, "miss": shop.render.misses}), labels=("tenant", "result"), kind="counter")
+METRICS.gauge("jawab_updates_deduplicated_total", "Redelivered updates skipped", per_shop(lambda shop: shop.dedup.stats()["duplicates"]),
+              labels=("tenant",), kind="counter")
+
+@app.get("/metrics")
+def metrics():
+    if METRICS_TOKEN and request.headers.get("Authorization","") != f"Bearer {METRICS_TOKEN}":
+        return "unauthorized", 401
+    return METRICS.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+@app.get("/admin/orders.<fmt>")
+def export_orders(fmt):
+    # ?from=YYYY-MM-DD&to=YYYY-MM-DD (inclusive) &status=x &gzip=1 &tenant=name ; streamed in keyset batches.
+    # A big export outlives gunicorn's 30s --timeout on a sync worker: run the gthread worker class
+    # (Procfile / render.yaml), whose main loop keeps heartbeating while a thread streams.
+    tenant = request.args.get("tenant") or ""
+    # the process ADMIN_TOKEN exports any shop; a tenant's own ADMIN_TOKEN only that tenant's orders
+    cfg = (TENANTS.configs.get(tenant) if TENANTS and tenant else None) or {}
+    tokens = [t for t in (ADMIN_TOKEN, cfg.get("ADMIN_TOKEN")) if t]
+    if request.headers.get("Authorization","") not in [f"Bearer {t}" for t in tokens]:
+        return "unauthorized", 401
+    if fmt not in EXPORT_TYPES:
+        return "unknown format (csv, ndjson)", 404
+    shop = (TENANTS.get(tenant) if TENANTS else None) if tenant else SHOP
+    if shop is None:
+        return "unknown tenant", 404
+    try:
+        since = datetime.strptime(request.args["from"], "%Y-%m-%d") if request.args.get("from") else None
+        until = datetime.strptime(request.args["to"], "%Y-%m-%d") + timedelta(days=1) if request.args.get("to") else None
+    except ValueError:
+        return "bad date, use YYYY-MM-DD", 400
+    gz = request.args.get("gzip","0").strip().lower() in ["1","true","yes","on"]
+    # shop.db() is this thread's connection and the generator is drained on this same thread
+    body = export_chunks(shop.db(), fmt, gz, since=since, until=until, status=request.args.get("status") or None)
+    name = f"orders{'_' + tenant if tenant else ''}.{fmt}" + (".gz" if gz else "")
+    return Response(body, mimetype="application/gzip" if gz else EXPORT_TYPES[fmt],
+                    headers={"Content-Disposition": f'attachment; filename="{name}"'})
 
 @app.route("/telegram", methods=["GET","POST"])
 @app.route("/webhook/telegram", methods=["GET","POST"])
 def webhook():
+    return shop_webhook(SHOP)
+
+def shop_webhook(shop):
     if request.method == "GET":
         return "OK", 200
-    if WEBHOOK_SECRET:
+    if shop.webhook_secret:
         secret_hdr = request.headers.get("X-Telegram-Bot-Api-Secret-Token","")
-        if secret_hdr != WEBHOOK_SECRET:
+        if secret_hdr != shop.webhook_secret:
             return "unauthorized", 401
     update = request.get_json(silent=True) or {}
+    update_id = update.get("update_id")
+    if not shop.dedup.claim(update_id):
+        return jsonify({"ok": True})
+    if shop.use_sheet:
+        shop.catalog_refresher.start()
+    if shop.stock_tracking:
+        shop.reservation_sweeper.start()
+    shop.broadcast_runner.start()
+    if shop.delivery_zones:
+        shop.zone_refresher.start()
+    if shop.async_updates:
+        if not shop.updates.submit(update):
+            # shard full: a non-2xx makes Telegram keep the update and redeliver later
+            shop.dedup.forget(update_id)
+            return "busy", 503, {"Retry-After": "5"}
+        return jsonify({"ok": True})
+    return jsonify(handle_update(shop, update))
+
+def handle_update(shop, update):
+    _REQ.intent = "none"
+    t0 = time.perf_counter()
     try:
-        return jsonify(process_update(update))
-    except Exception as e:
-        print("handler exception:", e)
+        return process_update(shop, update)
+    except Exception:
+        UPDATE_ERRORS.inc(1, shop.name, _REQ.intent)
+        shop.log.exception("handler exception", extra={"update_id": update.get("update_id"), "chat_id": update_chat_id(update), "intent": _REQ.intent})
         # best-effort notify user
-        chat_id = ((update.get("message") or {}).get("chat") or {}).get("id")
+        chat_id = update_chat_id(update)
         if chat_id:
-            send_text(chat_id, "⚠️ Temporary error. Try again.")
-        return jsonify({"ok": True})
+            send_text(shop, chat_id, "⚠️ Temporary error. Try again.")
+        return {"ok": True}
+    finally:
+        dt = time.perf_counter() - t0
+        UPDATE_SECONDS.observe(dt, shop.name, _REQ.intent)
+        if TRACE_UPDATES and log_sample():
+            shop.log.debug("update", extra={"update_id": update.get("update_id"), "chat_id": update_chat_id(update),
+                                            "intent": _REQ.intent, "latency_ms": round(dt * 1000, 2)})
+
+def add_product_to_cart(shop, chat_id, p):
+    # if product out of stock (stock >=0 indicates tracked)
+    if shop.plan in ["gold","diamond"] and p.get("stock", -1) >= 0 and p.get("stock",0) <= 0:
+        return "Sorry, out of stock."
+    cart_add(shop, chat_id, {"sku": p.get("sku"), "name": p.get("name"), "price": p.get("price"), "qty": 1})
+    return f"Added to cart: {p.get('name')} — ${safe_float(p.get('price')):.2f}"
+
+def handle_callback(shop, cq):
+    # inline catalog navigation: edit the message in place, answer every callback once
+    m = cq.get("message") or {}
+    chat_id, message_id = (m.get("chat") or {}).get("id"), m.get("message_id")
+    LANG = shop.default_lang if shop.default_lang in TEXT else "FA"
+    parsed = paging.decode(cq.get("data"))
+    if not chat_id or not parsed:
+        answer_callback(shop, cq.get("id")); return {"ok": True}
+    kind, version, args = parsed
+    mark_intent("callback_" + kind)
+    if not len(shop.catalog):
+        ensure_catalog(shop)
+    if version != shop.catalog.version:
+        # keyboard built from an older catalog: indexes may point elsewhere now, start over
+        edit_screen(shop, chat_id, message_id, categories_screen(shop, LANG, 0, "Catalog updated. Categories:"))
+        answer_callback(shop, cq.get("id")); return {"ok": True}
+    if kind == "l" and args:
+        edit_screen(shop, chat_id, message_id, categories_screen(shop, LANG, args[0]))
+        answer_callback(shop, cq.get("id"))
+    elif kind == "p" and len(args) == 2:
+        if 0 <= args[0] < len(shop.catalog.categories):
+            edit_screen(shop, chat_id, message_id, products_screen(shop, LANG, args[0], args[1]))
+            shop.ctx[str(chat_id)] = json.dumps({"category": shop.catalog.categories[args[0]]})
+        answer_callback(shop, cq.get("id"))
+    elif kind == "a" and len(args) == 2 and 0 <= args[0] < len(shop.catalog.categories):
+        prods = shop.catalog.products_in(shop.catalog.categories[args[0]])
+        answer_callback(shop, cq.get("id"), add_product_to_cart(shop, chat_id, prods[args[1]]) if 0 <= args[1] < len(prods) else None)
+    else:
+        answer_callback(shop, cq.get("id"))
+    return {"ok": True}
 
-def process_update(update):
+ADMIN_COMMANDS = ("/sync", "/report", "/top", "/broadcast", "/export", "/backfill")
+
+def admin_intent(tnorm):
+    # metrics label: one of a fixed set, never the admin's text (unbounded label values)
+    for cmd in ADMIN_COMMANDS:
+        if tnorm.startswith(cmd):
+            return "admin" + cmd
+    return "admin_other"
+
+def process_update(shop, update):
+    if update.get("callback_query"):
+        check_catalog_snapshot(shop)
+        return handle_callback(shop, update["callback_query"])
     msg = update.get("message") or update.get("edited_message") or {}
     chat = msg.get("chat") or {}
     chat_id = chat.get("id")
@@ -392,43 +914,71 @@ def process_update(update):
 
     if not chat_id:
         return {"ok": True}
+    check_catalog_snapshot(shop)
+    if chat.get("type", "private") == "private":
+        remember_user(shop, chat_id, chat.get("first_name"))
+    shop.users.log_message(chat_id, text or ("[contact]" if contact else "[location]" if location else ""), "in")
 
-    # simple logging for debug
-    print("[DBG]", {"chat_id":chat_id, "text": text[:200], "contact": bool(contact), "loc": bool(location)})
-
-    # determine language for user: fallback to DEFAULT_LANG
-    lang = get_user_lang = lambda cid: (DEFAULT_LANG)  # quick - could be extended to per-user lang
+    # determine language for user: fallback to the shop's DEFAULT_LANG
+    lang = get_user_lang = lambda cid: (shop.default_lang)  # quick - could be extended to per-user lang
     user_lang = get_user_lang(chat_id)
-    LANG = user_lang if user_lang in TEXT else DEFAULT_LANG
+    LANG = user_lang if user_lang in TEXT else shop.default_lang
 
     # CONTACT flow (request_contact)
     if contact and contact.get("phone_number"):
-        set_user_phone(chat_id, contact.get("phone_number"))
-        send_text(chat_id, TEXT[LANG]["phone_ok"], keyboard=menu_keyboard(LANG))
+        mark_intent("contact")
+        set_user_phone(shop, chat_id, contact.get("phone_number"))
+        send_text(shop, chat_id, TEXT[LANG]["phone_ok"], keyboard=menu_keyboard(shop, LANG))
         # If user was in cart_order flow, ask for address next
-        if LEAD_CONTEXT.get(str(chat_id)) == "cart_order":
-            send_text(chat_id, TEXT[LANG]["ask_address"], keyboard=reply_keyboard_layout([[{"text":"📍 Send Location","request_location": True}], [TEXT[LANG]["back"]]]))
+        if shop.ctx.get(str(chat_id)) == "cart_order":
+            send_text(shop, chat_id, TEXT[LANG]["ask_address"], keyboard=location_keyboard(LANG))
         return {"ok": True}
 
     # LOCATION flow (request_location)
     if location:
+        mark_intent("location")
         # finalize if in cart_order
-        if LEAD_CONTEXT.get(str(chat_id)) == "cart_order":
-            items = cart_get(chat_id)
+        if shop.ctx.get(str(chat_id)) == "cart_order":
+            items = cart_get(shop, chat_id)
             if not items:
-                send_text(chat_id, "Cart empty", keyboard=menu_keyboard(LANG)); return {"ok": True}
-            total = cart_total(chat_id)
-            oid = create_order_db(chat_id, get_user_phone(chat_id), chat.get("first_name") or "", "", location.get("latitude"), location.get("longitude"), items, total)
+                send_text(shop, chat_id, "Cart empty", keyboard=menu_keyboard(shop, LANG)); return {"ok": True}
+            total = cart_total(shop, chat_id)
+            zone = None
+            if shop.delivery_zones:
+                shop.zone_refresher.start()
+                if not len(shop.zones):   # URL source still loading (or failed): never take the order unpriced
+                    shop.zone_refresher.kick()
+                    ZONE_LOOKUPS.inc(1, shop.name, "unavailable")
+                    send_text(shop, chat_id, TEXT[LANG]["zones_loading"], keyboard=location_keyboard(LANG)); return {"ok": True}
+                zone = shop.zones.locate(safe_float(location.get("latitude")), safe_float(location.get("longitude")))
+                if zone is None:   # stay in cart_order: another location can still be shared
+                    ZONE_LOOKUPS.inc(1, shop.name, "outside")
+                    send_text(shop, chat_id, TEXT[LANG]["out_of_zone"], keyboard=location_keyboard(LANG)); return {"ok": True}
+                if total < zone.min_order:
+                    ZONE_LOOKUPS.inc(1, shop.name, "below_min")
+                    shop.ctx.pop(str(chat_id), None)
+                    send_text(shop, chat_id, TEXT[LANG]["min_order"].format(zone=zone.name, min=zone.min_order), keyboard=menu_keyboard(shop, LANG)); return {"ok": True}
+                ZONE_LOOKUPS.inc(1, shop.name, "served")
+                total += zone.fee
+            try:
+                oid = create_order_db(shop, chat_id, get_user_phone(shop, chat_id), chat.get("first_name") or "", "", location.get("latitude"), location.get("longitude"), items, total,
+                                      zone.name if zone else None, zone.fee if zone else 0.0)
+            except OutOfStock as e:
+                send_text(shop, chat_id, out_of_stock_text(shop, e), keyboard=menu_keyboard(shop, LANG)); return {"ok": True}
             # admin notify
-            admin_msg = f"NEW ORDER #{oid}\nUser: {chat.get('first_name','-')} ({chat_id})\nPhone: {get_user_phone(chat_id) or '-'}\nLocation: {location.get('latitude')},{location.get('longitude')}\nItems:\n"
+            admin_msg = f"NEW ORDER #{oid}\nUser: {chat.get('first_name','-')} ({chat_id})\nPhone: {get_user_phone(shop, chat_id) or '-'}\nLocation: {location.get('latitude')},{location.get('longitude')}\n"
+            if zone:
+                admin_msg += f"Zone: {zone.name} (delivery ${zone.fee:.2f})\n"
+            admin_msg += "Items:\n"
             for it in items:
                 admin_msg += f"- {it['name']} x{it['qty']} — ${safe_float(it['price'])*it['qty']:.2f}\n"
             admin_msg += f"Total: ${total:.2f}"
-            for admin in ADMINS:
-                try: requests.post(API_SEND, json={"chat_id": int(admin), "text": admin_msg}, timeout=10)
-                except: pass
-            cart_clear(chat_id); LEAD_CONTEXT.pop(str(chat_id), None)
-            send_text(chat_id, TEXT[LANG]["order_saved"].format(oid=oid), keyboard=menu_keyboard(LANG))
+            notify_admins(shop, admin_msg)
+            cart_clear(shop, chat_id); shop.ctx.pop(str(chat_id), None)
+            saved = TEXT[LANG]["order_saved"].format(oid=oid)
+            if zone:
+                saved += "\n" + TEXT[LANG]["delivery"].format(zone=zone.name, fee=zone.fee, total=total)
+            send_text(shop, chat_id, saved, keyboard=menu_keyboard(shop, LANG))
             return {"ok": True}
         # otherwise ignore
         return {"ok": True}
@@ -438,142 +988,238 @@ def process_update(update):
 
     # /start
     if text.strip().startswith("/start"):
-        send_text(chat_id, os.getenv(f"WELCOME_{LANG}") or TEXT[LANG]["welcome"], keyboard=menu_keyboard(LANG))
+        mark_intent("start")
+        # deep link t.me/<bot>?start=<source> -> broadcast audience segment
+        parts = text.strip().split(None, 1)
+        if len(parts) > 1:
+            shop.users.set_user_source(chat_id, parts[1][:64])
+        send_screen(shop, chat_id, menu_screen(shop, LANG, "welcome", lambda: shop.env.get(f"WELCOME_{LANG}") or TEXT[LANG]["welcome"].format(brand=shop.brand_name)))
         return {"ok": True}
 
     # admin commands
-    if tnorm.startswith("/sync") and str(chat_id) in ADMINS:
+    if tnorm.startswith("/") and str(chat_id) in shop.admins:
+        mark_intent(admin_intent(tnorm))
+    if tnorm.startswith("/sync") and str(chat_id) in shop.admins:
         try:
-            n = sync_catalog_from_sheet()
-            send_text(chat_id, f"Catalog synced: {n} items.", keyboard=menu_keyboard(LANG))
+            res = sync_catalog_from_sheet(shop, force="force" in tnorm)
+            if res["not_modified"]:
+                send_text(shop, chat_id, f"Catalog unchanged ({len(shop.catalog)} items, {res['elapsed']:.2f}s).", keyboard=menu_keyboard(shop, LANG))
+            else:
+                send_text(shop, chat_id, f"Catalog synced: {res['total']} items | +{res['added']} ~{res['changed']} -{res['removed']} | {res['elapsed']:.2f}s", keyboard=menu_keyboard(shop, LANG))
         except Exception as e:
-            send_text(chat_id, f"Sync failed: {e}", keyboard=menu_keyboard(LANG))
+            send_text(shop, chat_id, f"Sync failed: {e}", keyboard=menu_keyboard(shop, LANG))
+        return {"ok": True}
+
+    if tnorm.startswith("/report") and str(chat_id) in shop.admins:
+        # /report [daily|today|7d|30d|monthly|YYYY-MM-DD [YYYY-MM-DD]]
+        rng = parse_report_range(tnorm.split()[1:])
+        if not rng:
+            send_text(shop, chat_id, "Usage: /report [today|24h|7d|30d|YYYY-MM-DD [YYYY-MM-DD]]", keyboard=menu_keyboard(shop, LANG))
+            return {"ok": True}
+        period, since, until = rng
+        rep = report_summary(shop, since, until)
+        send_text(shop, chat_id, f"Report ({period}): Orders {rep['orders']} | Items {rep['items']} | Revenue ${rep['revenue']:.2f}", keyboard=menu_keyboard(shop, LANG))
+        return {"ok": True}
+
+    if tnorm.startswith("/top") and str(chat_id) in shop.admins:
+        # /top [cats] [7d|30d|today|YYYY-MM-DD [YYYY-MM-DD]]  (default 7d)
+        args = tnorm.split()[1:]
+        by_cat = bool(args) and args[0] in ("cats", "categories", "category")
+        if by_cat: args = args[1:]
+        rng = parse_report_range(args or ["7d"])
+        if not rng:
+            send_text(shop, chat_id, "Usage: /top [cats] [today|7d|30d|YYYY-MM-DD [YYYY-MM-DD]]", keyboard=menu_keyboard(shop, LANG))
+            return {"ok": True}
+        period, since, until = rng
+        if by_cat:
+            rows = top_categories(shop.db(), since, until)
+            lines = [f"{i}) {r['category']} — {r['units']} units | ${r['revenue']:.2f}" for i, r in enumerate(rows, start=1)]
+        else:
+            rows = top_skus(shop.db(), since, until)
+            lines = [f"{i}) {r['name'] or r['sku']} [{r['sku']}] — {r['units']} units | ${r['revenue']:.2f}" for i, r in enumerate(rows, start=1)]
+        send_text(shop, chat_id, f"Top {'categories' if by_cat else 'products'} ({period}):\n" + ("\n".join(lines) or "—"), keyboard=menu_keyboard(shop, LANG))
+        return {"ok": True}
+
+    if tnorm.startswith("/broadcast") and str(chat_id) in shop.admins:
+        # /broadcast [lang=XX] [source=YY] <text> | /broadcast status [id] | /broadcast cancel [id]
+        sub = parse_broadcast_command(text)
+        if sub and sub[0] == "status":
+            send_text(shop, chat_id, broadcast_status_text(shop, sub[1]), keyboard=menu_keyboard(shop, LANG))
+        elif sub:
+            jid = cancel_broadcast(shop.users.conn, sub[1])
+            send_text(shop, chat_id, f"Broadcast #{jid} cancelled." if jid else "No running broadcast.", keyboard=menu_keyboard(shop, LANG))
+        else:
+            lang, source, body = parse_broadcast_args(text)
+            if not body:
+                send_text(shop, chat_id, "Usage: /broadcast [lang=FA] [source=x] <text> | status [id] | cancel [id]", keyboard=menu_keyboard(shop, LANG))
+                return {"ok": True}
+            total = shop.users.count_user_ids(0, lang, source)
+            jid = create_broadcast(shop.users.conn, body, lang, source, str(chat_id), total)
+            shop.broadcast_runner.kick()
+            send_text(shop, chat_id, f"Broadcast #{jid} queued for {total} users.", keyboard=menu_keyboard(shop, LANG))
         return {"ok": True}
 
-    if tnorm.startswith("/report") and str(chat_id) in ADMINS:
-        # /report daily|monthly
-        parts = tnorm.split()
-        period = parts[1] if len(parts)>1 else "daily"
-        rep = report_summary(period=period)
-        send_text(chat_id, f"Report ({period}): Orders {rep['orders']} | Revenue ${rep['revenue']:.2f}", keyboard=menu_keyboard(LANG))
+    if tnorm.startswith("/export") and str(chat_id) in shop.admins:
+        args = parse_export_args(tnorm.split()[1:])
+        if not args:
+            send_text(shop, chat_id, "Usage: /export [csv|ndjson] [gz] [status=x] [all|today|7d|30d|YYYY-MM-DD [YYYY-MM-DD]]", keyboard=menu_keyboard(shop, LANG))
+            return {"ok": True}
+        threading.Thread(target=send_export, args=(shop, chat_id) + args, name="export", daemon=True).start()
+        send_text(shop, chat_id, f"Exporting orders ({args[3]})…", keyboard=menu_keyboard(shop, LANG))
+        return {"ok": True}
+
+    if tnorm.startswith("/backfill") and str(chat_id) in shop.admins:
+        n = backfill_rollups(shop.db())
+        send_text(shop, chat_id, f"Rollups rebuilt from {n} orders.", keyboard=menu_keyboard(shop, LANG))
         return {"ok": True}
 
+    # one pass over the text: highest-priority intent (and category, if any)
+    intent, matched_cat = shop.router.match(text)
+    mark_intent(intent or ("category" if matched_cat else "other"))
+
     # menu
-    if contains_any(text, [TEXT[LANG]["btn_products"], "محصول", "products", "المنتجات"]):
-        n = ensure_catalog()
+    if intent == "products":
+        n = ensure_catalog(shop)
         if n==0:
-            send_text(chat_id, TEXT[LANG]["catalog_empty"], keyboard=menu_keyboard(LANG)); return {"ok": True}
-        # show categories
-        cats = sorted(list({it.get("category") or "Uncategorized" for it in CATALOG}))
-        rows = [[c] for c in cats[:10]]
-        rows.append([TEXT[LANG]["back"]])
-        send_text(chat_id, "Categories:", keyboard=reply_keyboard_layout(rows))
-        LEAD_CONTEXT.pop(str(chat_id), None)
+            send_screen(shop, chat_id, menu_screen(shop, LANG, "catalog_empty", lambda: TEXT[LANG]["catalog_empty"])); return {"ok": True}
+        # show categories (inline, paged; further navigation edits this message)
+        send_screen(shop, chat_id, categories_screen(shop, LANG))
+        shop.ctx.pop(str(chat_id), None)
         return {"ok": True}
 
-    # If user clicked category
-    # find best matching category
-    cats = sorted(list({it.get("category") or "Uncategorized" for it in CATALOG}))
-    for c in cats:
-        if normalize_text(c) == tnorm or normalize_text(c) in tnorm or tnorm in normalize_text(c):
-            # show products in category
-            prods = [p for p in CATALOG if p.get("category")==c and p.get("is_available",1)]
-            if not prods:
-                send_text(chat_id, "No products in this category.", keyboard=menu_keyboard(LANG)); return {"ok": True}
-            rows = []
-            for i,p in enumerate(prods[:10], start=1):
-                rows.append([f"{i}) {p.get('name')} — ${safe_float(p.get('price')):.2f}"])
-            rows.append([TEXT[LANG]["back"]])
-            send_text(chat_id, f"Products in {c}:", keyboard=reply_keyboard_layout(rows))
-            LEAD_CONTEXT[str(chat_id)] = json.dumps({"category": c})
-            return {"ok": True}
+    # If user typed a category name
+    if intent == "category":
+        c = matched_cat
+        if c not in shop.catalog.categories or not len(shop.catalog.products_in(c)):
+            send_text(shop, chat_id, "No products in this category.", keyboard=menu_keyboard(shop, LANG)); return {"ok": True}
+        send_screen(shop, chat_id, products_screen(shop, LANG, shop.catalog.categories.index(c)))
+        shop.ctx[str(chat_id)] = json.dumps({"category": c})
+        return {"ok": True}
 
     # product selection by number when inside a category
     m = re.match(r"^\s*(\d+)\s*\)?", text)
-    if m and LEAD_CONTEXT.get(str(chat_id)):
-        ctx = json.loads(LEAD_CONTEXT.get(str(chat_id)) or "{}")
+    if m and (shop.ctx.get(str(chat_id)) or "").startswith("{"):   # not the "cart_order" address step
+        ctx = json.loads(shop.ctx.get(str(chat_id)) or "{}")
         cat = ctx.get("category")
-        prods = [p for p in CATALOG if p.get("category")==cat and p.get("is_available",1)]
+        prods = [p for p in map(shop.catalog.get, ctx["skus"]) if p] if ctx.get("skus") else shop.catalog.products_in(cat)
         idx = int(m.group(1)) - 1
         if 0 <= idx < len(prods):
-            p = prods[idx]
-            # if product out of stock (stock >=0 indicates tracked)
-            if PLAN in ["gold","diamond"] and p.get("stock", -1) >= 0 and p.get("stock",0) <= 0:
-                send_text(chat_id, "Sorry, out of stock.", keyboard=menu_keyboard(LANG)); return {"ok": True}
-            cart_add(chat_id, {"sku": p.get("sku"), "name": p.get("name"), "price": p.get("price"), "qty": 1})
-            send_text(chat_id, f"Added to cart: {p.get('name')} — ${safe_float(p.get('price')):.2f}", keyboard=menu_keyboard(LANG))
+            send_text(shop, chat_id, add_product_to_cart(shop, chat_id, prods[idx]), keyboard=menu_keyboard(shop, LANG))
             return {"ok": True}
 
     # view cart
-    if contains_any(text, [TEXT[LANG]["btn_cart"], "سبد", "cart", "🧺"]):
-        msg,kb = build_cart_message(LANG, chat_id)
-        send_text(chat_id, msg, keyboard=kb); return {"ok": True}
+    if intent == "cart":
+        msg,kb = build_cart_message(shop, LANG, chat_id)
+        send_text(shop, chat_id, msg, keyboard=kb); return {"ok": True}
 
     # empty cart (simple trigger)
-    if contains_any(text, ["empty cart","خالی"]):
-        cart_clear(chat_id); send_text(chat_id, "Cart cleared.", keyboard=menu_keyboard(LANG)); return {"ok": True}
+    if intent == "empty_cart":
+        if shop.stock_tracking:
+            refresh_stock(shop, release_cart(shop.db(), chat_id))
+        cart_clear(shop, chat_id); send_text(shop, chat_id, "Cart cleared.", keyboard=menu_keyboard(shop, LANG)); return {"ok": True}
 
     # checkout / place order
-    if text == TEXT[LANG]["btn_order"] or contains_any(text, ["ثبت سفارش","place order","confirm order"]):
-        items = cart_get(chat_id)
+    if intent == "checkout":
+        items = cart_get(shop, chat_id)
         if not items:
-            send_text(chat_id, "Your cart is empty.", keyboard=menu_keyboard(LANG)); return {"ok": True}
+            send_text(shop, chat_id, "Your cart is empty.", keyboard=menu_keyboard(shop, LANG)); return {"ok": True}
+        # hold the stock while we collect phone/address; the sweeper gives it back if abandoned
+        if shop.stock_tracking:
+            try:
+                with DB_SECONDS.time(shop.name, "hold_cart"):
+                    held = hold_cart(shop.db(), chat_id, items, shop.reservation_ttl)
+                refresh_stock(shop, held)
+            except OutOfStock as e:
+                refresh_stock(shop, [e.sku])
+                send_text(shop, chat_id, out_of_stock_text(shop, e), keyboard=menu_keyboard(shop, LANG)); return {"ok": True}
         # ensure contact
-        phone = get_user_phone(chat_id)
+        phone = get_user_phone(shop, chat_id)
         if not phone:
-            LEAD_CONTEXT[str(chat_id)] = "cart_order"
-            send_text(chat_id, TEXT[LANG]["need_phone"], keyboard=reply_keyboard_layout([[{"text":TEXT[LANG]["btn_send_phone"], "request_contact":True}], [TEXT[LANG]["back"]]]))
+            shop.ctx[str(chat_id)] = "cart_order"
+            send_text(shop, chat_id, TEXT[LANG]["need_phone"], keyboard=reply_keyboard_layout([[{"text":TEXT[LANG]["btn_send_phone"], "request_contact":True}], [TEXT[LANG]["back"]]]))
             return {"ok": True}
         # ask for address
-        LEAD_CONTEXT[str(chat_id)] = "cart_order"
-        send_text(chat_id, TEXT[LANG]["ask_address"], keyboard=reply_keyboard_layout([[{"text":"📍 Send Location","request_location": True}], [TEXT[LANG]["back"]]]))
+        shop.ctx[str(chat_id)] = "cart_order"
+        send_text(shop, chat_id, TEXT[LANG]["ask_address"], keyboard=location_keyboard(LANG))
         return {"ok": True}
 
+    # with delivery zones the fee and serviceability come from a shared location, not typed text
+    if shop.delivery_zones and shop.ctx.get(str(chat_id)) == "cart_order" and text and not contact and not location:
+        if intent != "back":
+            send_text(shop, chat_id, TEXT[LANG]["need_location"], keyboard=location_keyboard(LANG)); return {"ok": True}
+        shop.ctx.pop(str(chat_id), None)
+
     # when user sends plain address while in cart_order
-    if LEAD_CONTEXT.get(str(chat_id)) == "cart_order" and text and not contact and not location:
-        items = cart_get(chat_id)
+    if shop.ctx.get(str(chat_id)) == "cart_order" and text and not contact and not location:
+        items = cart_get(shop, chat_id)
         if not items:
-            send_text(chat_id, "Cart empty.", keyboard=menu_keyboard(LANG)); return {"ok": True}
-        total = cart_total(chat_id)
-        oid = create_order_db(chat_id, get_user_phone(chat_id), chat.get("first_name") or "", text, None, None, items, total)
+            send_text(shop, chat_id, "Cart empty.", keyboard=menu_keyboard(shop, LANG)); return {"ok": True}
+        total = cart_total(shop, chat_id)
+        try:
+            oid = create_order_db(shop, chat_id, get_user_phone(shop, chat_id), chat.get("first_name") or "", text, None, None, items, total)
+        except OutOfStock as e:
+            send_text(shop, chat_id, out_of_stock_text(shop, e), keyboard=menu_keyboard(shop, LANG)); return {"ok": True}
         # notify admins
-        admin_msg = f"NEW ORDER #{oid}\nUser: {chat.get('first_name','-')} ({chat_id})\nPhone: {get_user_phone(chat_id) or '-'}\nAddress: {text}\nItems:\n"
+        admin_msg = f"NEW ORDER #{oid}\nUser: {chat.get('first_name','-')} ({chat_id})\nPhone: {get_user_phone(shop, chat_id) or '-'}\nAddress: {text}\nItems:\n"
         for it in items:
             admin_msg += f"- {it['name']} x{it['qty']} — ${safe_float(it['price'])*it['qty']:.2f}\n"
         admin_msg += f"Total: ${total:.2f}"
-        for admin in ADMINS:
-            try: requests.post(API_SEND, json={"chat_id": int(admin), "text": admin_msg}, timeout=10)
-            except: pass
-        cart_clear(chat_id); LEAD_CONTEXT.pop(str(chat_id), None)
-        send_text(chat_id, TEXT[LANG]["order_saved"].format(oid=oid), keyboard=menu_keyboard(LANG))
+        notify_admins(shop, admin_msg)
+        cart_clear(shop, chat_id); shop.ctx.pop(str(chat_id), None)
+        send_text(shop, chat_id, TEXT[LANG]["order_saved"].format(oid=oid), keyboard=menu_keyboard(shop, LANG))
         return {"ok": True}
 
     # prices / about
-    if contains_any(text, [TEXT[LANG]["btn_prices"], "price","قیمت","الأسعار"]):
-        send_text(chat_id, get_section("PRICES", LANG) or "—", keyboard=menu_keyboard(LANG)); return {"ok": True}
-    if contains_any(text, [TEXT[LANG]["btn_about"], "about","درباره","من نحن"]):
-        send_text(chat_id, get_section("ABOUT", LANG) or "—", keyboard=menu_keyboard(LANG)); return {"ok": True}
+    if intent == "prices":
+        send_screen(shop, chat_id, menu_screen(shop, LANG, "prices", lambda: get_section(shop, "PRICES", LANG) or "—")); return {"ok": True}
+    if intent == "about":
+        send_screen(shop, chat_id, menu_screen(shop, LANG, "about", lambda: get_section(shop, "ABOUT", LANG) or "—")); return {"ok": True}
 
     # support
-    if contains_any(text, ["پشتیبانی","support","الدعم"]):
-        send_text(chat_id, build_support_text(LANG), keyboard=menu_keyboard(LANG)); return {"ok": True}
+    if intent == "support":
+        send_screen(shop, chat_id, menu_screen(shop, LANG, "support", lambda: build_support_text(shop, LANG))); return {"ok": True}
 
     # back
-    if contains_any(text, ["back","بازگشت","رجوع"]):
-        send_text(chat_id, TEXT[LANG]["choose"], keyboard=menu_keyboard(LANG)); return {"ok": True}
+    if intent == "back":
+        send_screen(shop, chat_id, menu_screen(shop, LANG, "choose", lambda: TEXT[LANG]["choose"])); return {"ok": True}
+
+    # free text: product search (also "/search <words>")
+    query = text.strip()[len("/search"):].strip() if tnorm.startswith("/search") else text.strip()
+    if len(search_fold(query)) >= 2 and not query.startswith("/") and (len(shop.catalog) or ensure_catalog(shop)):
+        if send_search_results(shop, chat_id, LANG, query[:100]):
+            mark_intent("search")
+            return {"ok": True}
 
     # default
-    send_text(chat_id, TEXT[LANG]["unknown"], keyboard=menu_keyboard(LANG))
+    send_screen(shop, chat_id, menu_screen(shop, LANG, "unknown", lambda: TEXT[LANG]["unknown"]))
     return {"ok": True}
 
 # ---------------- Simple per-user phone persistence (very small) ----------------
-# For production you might use dedicated user table; here minimal local storage via SQLite orders table and a small runtime map
-_USER_PHONES = {}
-def set_user_phone(chat_id, phone):
-    _USER_PHONES[str(chat_id)] = phone
+# kept in the session store (shared across workers when SESSION_STORE=sqlite)
+def set_user_phone(shop, chat_id, phone):
+    shop.phones[str(chat_id)] = phone
+
+def get_user_phone(shop, chat_id):
+    return shop.phones.get(str(chat_id))
+
+# ---------------- Shops ----------------
+SHOP = Shop("", os.environ)   # this process's own bot (/webhook/telegram)
+
+# ---------------- Tenants ----------------
+# every tenant is a Shop of its own (catalog, sessions, DB files, outbox), built from its config
+TENANTS = TenantRegistry(TenantConfigs(TENANTS_CONFIG, SHOP.db), Shop) if TENANTS_CONFIG else None
+TENANT_SWEEPER = Refresher("tenants", lambda: TENANTS.sweep(), 60) if TENANTS else None
+
+@app.route("/webhook/telegram/<tenant>", methods=["GET","POST"])
+def tenant_webhook(tenant):
+    shop = TENANTS.get(tenant) if TENANTS else None
+    if shop is None:
+        return "unknown tenant", 404
+    TENANT_SWEEPER.start()
+    return shop_webhook(shop)   # the tenant's own secret check, dedup and dispatch
 
-def get_user_phone(chat_id):
-    return _USER_PHONES.get(str(chat_id))
+if TENANTS:
+    METRICS.gauge("jawab_tenants_loaded", "Tenants resident in this worker", lambda: len(TENANTS.loaded))
 
 # ---------------- Run ----------------
 if __name__ == "__main__":
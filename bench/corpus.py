@@ -0,0 +1,82 @@
+# bench/corpus.py
+# Realistic update corpora for the load test: each simulated user runs a session
+# (/start, browse categories, pick products, view cart, checkout with contact + location),
+# some only browse, and admins ask for /report. Also builds the matching catalog CSV.
+# Run: python bench/corpus.py [--users 500] [--seed 1] > corpus.jsonl
+import sys, json, random, argparse
+
+CATEGORIES = ["Coffee", "Tea", "Bakery", "Sweets", "Juice", "Snacks", "Dairy", "Frozen",
+              "قهوه", "شیرینی", "حلويات", "مخبوزات"]
+LABELS = {   # reply-keyboard buttons as app.py renders them
+    "FA": {"products": "🛍 محصولات", "cart": "🧺 سبد خرید", "order": "✅ ثبت سفارش", "prices": "💵 قیمت‌ها"},
+    "EN": {"products": "🛍 Products", "cart": "🧺 Cart", "order": "✅ Place order", "prices": "💵 Prices"},
+    "AR": {"products": "🛍 المنتجات", "cart": "🧺 سلة التسوق", "order": "✅ تأكيد الطلب", "prices": "💵 الأسعار"},
+}
+ADMIN_ID = 1
+FIRST_USER = 100000
+
+def category_names(n:int)->list:
+    return [CATEGORIES[i] if i < len(CATEGORIES) else f"Category {i}" for i in range(n)]
+
+def catalog_csv(categories:int=8, per_category:int=25, stock:int=1000000)->str:
+    lines = ["sku,category,item_name,price,stock,is_available"]
+    for ci, cat in enumerate(category_names(categories)):
+        for p in range(per_category):
+            lines.append(f"C{ci}P{p},{cat},Item {ci}-{p},{1 + (p % 20) * 0.5:.2f},{stock},1")
+    return "\n".join(lines) + "\n"
+
+class _Ids:
+    def __init__(self):
+        self.update_id = 0
+    def next(self):
+        self.update_id += 1
+        return self.update_id
+
+def _update(ids, chat_id, name, **msg):
+    chat = {"id": chat_id, "type": "private", "first_name": name}
+    m = {"message_id": ids.next(), "date": 0, "chat": chat, "from": {"id": chat_id, "first_name": name}}
+    m.update(msg)
+    return {"update_id": ids.update_id, "message": m}
+
+def session(rnd, ids, chat_id, lang, categories, per_category)->list:
+    L, name = LABELS[lang], f"user{chat_id}"
+    ups = [_update(ids, chat_id, name, text="/start")]
+    buyer = rnd.random() < 0.4
+    for _ in range(rnd.randint(1, 3)):
+        ups.append(_update(ids, chat_id, name, text=L["products"]))
+        ups.append(_update(ids, chat_id, name, text=rnd.choice(categories)))
+        for _ in range(rnd.randint(0, 3) if not buyer else rnd.randint(1, 3)):
+            ups.append(_update(ids, chat_id, name, text=str(rnd.randint(1, min(10, per_category)))))
+    if rnd.random() < 0.2:
+        ups.append(_update(ids, chat_id, name, text=L["prices"]))
+    ups.append(_update(ids, chat_id, name, text=L["cart"]))
+    if buyer:
+        ups.append(_update(ids, chat_id, name, text=L["order"]))
+        ups.append(_update(ids, chat_id, name, contact={"phone_number": f"+98912{chat_id:07d}", "user_id": chat_id}))
+        ups.append(_update(ids, chat_id, name, location={"latitude": 35.7 + rnd.random() / 10, "longitude": 51.4 + rnd.random() / 10}))
+    return ups
+
+def generate(users:int=500, seed:int=1, categories:int=8, per_category:int=25, admin_every:int=50)->list:
+    """-> list of sessions (list of updates, in order per chat). update_ids are unique."""
+    rnd, ids = random.Random(seed), _Ids()
+    cats = category_names(categories)
+    sessions = []
+    for u in range(users):
+        sessions.append(session(rnd, ids, FIRST_USER + u, rnd.choice(list(LABELS)), cats, per_category))
+        if admin_every and u % admin_every == 0:
+            sessions.append([_update(ids, ADMIN_ID, "admin", text=rnd.choice(["/report", "/report today", "/report 7d", "/top"]))])
+    return sessions
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=500)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--categories", type=int, default=8)
+    ap.add_argument("--per-category", type=int, default=25)
+    a = ap.parse_args()
+    for s in generate(a.users, a.seed, a.categories, a.per_category):
+        for u in s:
+            sys.stdout.write(json.dumps(u, ensure_ascii=False) + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# bench/fake_telegram.py
+# Local stand-in for the Telegram Bot API (and the products sheet) for load tests.
+# Answers POST /bot<token>/<method> like Telegram, with optional latency and injected 429s,
+# and counts every call. GET /sheet.csv serves the catalog (with an ETag), GET /_stats the counters.
+# Run: python bench/fake_telegram.py [--port 8081] [--latency-ms 40] [--rate-429 0.02]
+import os, sys, json, time, random, hashlib, argparse, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class FakeTelegram(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, latency_ms=0.0, jitter_ms=0.0, rate_429=0.0, retry_after=1, sheet_csv="", seed=1):
+        super().__init__(addr, _Handler)
+        self.latency_ms, self.jitter_ms = latency_ms, jitter_ms
+        self.rate_429, self.retry_after = rate_429, retry_after
+        self.set_sheet(sheet_csv)
+        self.rnd = random.Random(seed)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def set_sheet(self, csv_text):
+        self.sheet = csv_text.encode("utf-8")
+        self.sheet_etag = '"%s"' % hashlib.sha1(self.sheet).hexdigest()[:16]
+
+    def reset(self):
+        with self.lock:
+            self.calls = {}          # method -> count (answered 200)
+            self.throttled = 0       # 429s handed out
+            self.bytes_in = 0
+            self.chats = {}          # chat_id -> messages received
+            self.first_at = self.last_at = None
+
+    def stats(self)->dict:
+        with self.lock:
+            return {"calls": dict(self.calls), "throttled": self.throttled, "bytes_in": self.bytes_in,
+                    "chats": len(self.chats), "first_at": self.first_at, "last_at": self.last_at}
+
+    def total(self, method="sendMessage")->int:
+        with self.lock:
+            return self.calls.get(method, 0)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="fake-telegram", daemon=True).start()
+        return self
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, like api.telegram.org
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, code, body:bytes, ctype="application/json", headers=()):
+        self.send_response(code)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in headers:
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        srv = self.server
+        if self.path.startswith("/sheet.csv"):
+            if self.headers.get("If-None-Match") == srv.sheet_etag:
+                return self._reply(304, b"", headers=[("ETag", srv.sheet_etag)])
+            return self._reply(200, srv.sheet, "text/csv; charset=utf-8", [("ETag", srv.sheet_etag)])
+        if self.path.startswith("/_stats"):
+            return self._reply(200, json.dumps(srv.stats()).encode())
+        self._reply(404, b'{"ok":false,"error_code":404,"description":"Not Found"}')
+
+    def do_POST(self):
+        srv = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.path.startswith("/_reset"):
+            srv.reset()
+            return self._reply(200, b'{"ok":true}')
+        parts = self.path.strip("/").split("/")
+        if len(parts) != 2 or not parts[0].startswith("bot"):
+            return self._reply(404, b'{"ok":false,"error_code":404,"description":"Not Found"}')
+        method = parts[1]
+        if srv.latency_ms or srv.jitter_ms:
+            time.sleep(max(0.0, srv.latency_ms + srv.rnd.uniform(-srv.jitter_ms, srv.jitter_ms)) / 1000.0)
+        with srv.lock:
+            throttle = srv.rate_429 and srv.rnd.random() < srv.rate_429
+            if throttle:
+                srv.throttled += 1
+        if throttle:
+            return self._reply(429, json.dumps({"ok": False, "error_code": 429,
+                               "description": f"Too Many Requests: retry after {srv.retry_after}",
+                               "parameters": {"retry_after": srv.retry_after}}).encode())
+        try: payload = json.loads(body or b"{}")
+        except ValueError: payload = {}
+        now = time.time()
+        with srv.lock:
+            srv.calls[method] = srv.calls.get(method, 0) + 1
+            srv.bytes_in += len(body)
+            cid = payload.get("chat_id")
+            srv.chats[cid] = srv.chats.get(cid, 0) + 1
+            srv.first_at = srv.first_at or now
+            srv.last_at = now
+            mid = sum(srv.calls.values())
+        self._reply(200, json.dumps({"ok": True, "result": {"message_id": mid, "chat": {"id": cid}, "date": int(now)}}).encode())
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8081)
+    ap.add_argument("--latency-ms", type=float, default=0)
+    ap.add_argument("--jitter-ms", type=float, default=0)
+    ap.add_argument("--rate-429", type=float, default=0, help="fraction of calls answered 429")
+    ap.add_argument("--retry-after", type=int, default=1)
+    ap.add_argument("--categories", type=int, default=8)
+    ap.add_argument("--per-category", type=int, default=25)
+    a = ap.parse_args()
+    from bench.corpus import catalog_csv
+    srv = FakeTelegram((a.host, a.port), a.latency_ms, a.jitter_ms, a.rate_429, a.retry_after,
+                       catalog_csv(a.categories, a.per_category))
+    print(f"fake Bot API on {srv.url}  (TELEGRAM_API_BASE={srv.url}  SHEET_URL={srv.url}/sheet.csv)")
+    try: srv.serve_forever()
+    except KeyboardInterrupt: pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+# bench/journal_bench.py
+# Rows/second for UserStore.log_message: the old connect+insert+commit per call vs the
+# group-commit journal. Run: python bench/journal_bench.py [rows] [threads]
+import os, sys, time, sqlite3, tempfile, threading
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from storage.db import UserStore
+
+TMP = tempfile.mkdtemp()
+users = UserStore(os.path.join(TMP, "bench.sqlite3"))
+
+def per_call(chat_id, text, direction):
+    # the pre-journal implementation
+    with sqlite3.connect(users.path) as c:
+        c.execute("INSERT INTO messages(chat_id, text, direction) VALUES(?,?,?)", (chat_id, text, direction))
+
+def run(fn, rows, threads):
+    per = rows // threads
+    def work(t):
+        for i in range(per):
+            fn(t, f"message {i}", "in")
+    ts = [threading.Thread(target=work, args=(t,)) for t in range(threads)]
+    t0 = time.perf_counter()
+    for t in ts: t.start()
+    for t in ts: t.join()
+    users.messages.flush()
+    return per * threads / (time.perf_counter() - t0)
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    print(f"per-call : {run(per_call, rows, threads):10.0f} rows/s")
+    print(f"journal  : {run(users.log_message, rows, threads):10.0f} rows/s  {users.messages.stats()}")
+    print("stats    :", users.get_stats()["messages_total"], "rows committed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+# bench/load_test.py
+# End-to-end load test: app.py under gunicorn, a generated update corpus replayed against
+# /webhook/telegram at a fixed concurrency, and a local fake Bot API (bench/fake_telegram.py)
+# that also serves the catalog sheet. Reports throughput, p50/p95/p99 webhook latency,
+# Bot API calls and DB growth, and writes a JSON result that can be compared across commits.
+# Run: python bench/load_test.py [--users 500] [--concurrency 16] [--workers 2] [--async]
+#                                [--latency-ms 40] [--rate-429 0.01] [--out r.json] [--compare old.json]
+# Needs gunicorn (and the app's requirements) installed.
+import os, sys, json, time, socket, argparse, tempfile, threading, subprocess, http.client
+from datetime import datetime
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from bench.corpus import generate, catalog_csv, ADMIN_ID
+from bench.fake_telegram import FakeTelegram
+
+def free_port()->int:
+    s = socket.socket(); s.bind(("127.0.0.1", 0)); p = s.getsockname()[1]; s.close()
+    return p
+
+def pct(sorted_vals, p):
+    if not sorted_vals: return 0.0
+    return sorted_vals[min(len(sorted_vals) - 1, int(round(p / 100.0 * (len(sorted_vals) - 1))))]
+
+def db_bytes(tmp)->int:
+    return sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp) if ".sqlite" in f)
+
+def git_rev()->str:
+    try: return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception: return "?"
+
+class Target:
+    """gunicorn app:app on a temp data dir, pointed at the fake Bot API."""
+
+    def __init__(self, a, fake_url, tmp):
+        self.port = free_port()
+        self.url = f"127.0.0.1:{self.port}"
+        env = dict(os.environ,
+                   TELEGRAM_BOT_TOKEN="123456:bench", TELEGRAM_API_BASE=fake_url,
+                   PLAN=a.plan, SHEET_URL=f"{fake_url}/sheet.csv", CATALOG_REFRESH_SEC="0",
+                   ADMINS=str(ADMIN_ID), WEBHOOK_SECRET="", SHOW_PRODUCTS="1",
+                   ASYNC_UPDATES="1" if a.async_updates else "0",
+                   DATA_DB_FILE=os.path.join(tmp, "data.sqlite"), DB_PATH=os.path.join(tmp, "users.sqlite3"),
+                   SESSION_STORE="sqlite", PYTHONUNBUFFERED="1")
+        cmd = [sys.executable, "-m", "gunicorn", "app:app", "--preload", "-b", self.url,
+               "-w", str(a.workers), "--threads", str(a.threads), "--log-level", "warning"]
+        self.log = open(os.path.join(tmp, "gunicorn.log"), "w")
+        self.proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=self.log, stderr=subprocess.STDOUT)
+
+    def wait_ready(self, timeout=30):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError("gunicorn exited; see " + self.log.name)
+            try:
+                c = http.client.HTTPConnection(self.url, timeout=2)
+                c.request("GET", "/webhook/telegram"); c.getresponse().read(); c.close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError("gunicorn did not come up")
+
+    def stop(self):
+        self.proc.terminate()
+        try: self.proc.wait(timeout=30)
+        except subprocess.TimeoutExpired: self.proc.kill()
+        self.log.close()
+
+def post(conn, body:bytes):
+    conn.request("POST", "/webhook/telegram", body=body, headers={"Content-Type": "application/json"})
+    r = conn.getresponse(); r.read()
+    return r.status
+
+def replay(url, sessions, concurrency):
+    """Sessions are dealt to driver threads whole, so each chat's updates stay in order."""
+    lat, status, lock = [], {}, threading.Lock()
+    lanes = [sessions[i::concurrency] for i in range(concurrency)]
+
+    def drive(lane):
+        conn = http.client.HTTPConnection(url, timeout=60)
+        mine, codes = [], {}
+        for s in lane:
+            for u in s:
+                body = json.dumps(u, ensure_ascii=False).encode("utf-8")
+                t0 = time.perf_counter()
+                try:
+                    code = post(conn, body)
+                except (OSError, http.client.HTTPException):
+                    conn.close(); conn = http.client.HTTPConnection(url, timeout=60)
+                    code = "error"
+                mine.append(time.perf_counter() - t0)
+                codes[code] = codes.get(code, 0) + 1
+        conn.close()
+        with lock:
+            lat.extend(mine)
+            for k, v in codes.items(): status[str(k)] = status.get(str(k), 0) + v
+
+    ts = [threading.Thread(target=drive, args=(l,)) for l in lanes if l]
+    t0 = time.perf_counter()
+    for t in ts: t.start()
+    for t in ts: t.join()
+    return time.perf_counter() - t0, sorted(lat), status
+
+def wait_quiet(fake, idle=1.5, timeout=120):
+    """Wait until the app stopped sending (outbox drained)."""
+    deadline, last, since = time.time() + timeout, -1, time.time()
+    while time.time() < deadline:
+        st = fake.stats()
+        n = sum(st["calls"].values()) + st["throttled"]
+        if n != last:
+            last, since = n, time.time()
+        elif time.time() - since >= idle:
+            break
+        time.sleep(0.1)
+    return last
+
+def warm_up(url, fake):
+    # /sync as admin: loads the sheet into the DB before the timed run
+    u = {"update_id": 10**9, "message": {"message_id": 1, "date": 0, "text": "/sync force",
+         "chat": {"id": ADMIN_ID, "type": "private", "first_name": "admin"}}}
+    conn = http.client.HTTPConnection(url, timeout=60)
+    post(conn, json.dumps(u).encode()); conn.close()
+    deadline = time.time() + 60
+    while fake.total() < 1 and time.time() < deadline:
+        time.sleep(0.1)
+
+def compare(result, old_path):
+    old = json.load(open(old_path))
+    rows = [("throughput_ups", "updates/s"), ("latency_ms.p50", "p50 ms"), ("latency_ms.p95", "p95 ms"),
+            ("latency_ms.p99", "p99 ms"), ("db.growth_bytes", "DB growth B")]
+    def get(d, k):
+        for part in k.split("."): d = (d or {}).get(part)
+        return d
+    print(f"\ncompare with {old_path} ({old.get('commit')}):")
+    for k, label in rows:
+        a, b = get(old, k), get(result, k)
+        if isinstance(a, (int, float)) and isinstance(b, (int, float)) and a:
+            print(f"  {label:12s} {a:12.2f} -> {b:12.2f}  ({(b - a) / a * 100:+.1f}%)")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=500)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--categories", type=int, default=8)
+    ap.add_argument("--per-category", type=int, default=25)
+    ap.add_argument("--concurrency", type=int, default=16, help="parallel webhook connections")
+    ap.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    ap.add_argument("--threads", type=int, default=8, help="gunicorn threads per worker")
+    ap.add_argument("--plan", default="gold")
+    ap.add_argument("--async", dest="async_updates", action="store_true", help="ASYNC_UPDATES=1")
+    ap.add_argument("--latency-ms", type=float, default=40, help="fake Bot API latency")
+    ap.add_argument("--jitter-ms", type=float, default=10)
+    ap.add_argument("--rate-429", type=float, default=0.0)
+    ap.add_argument("--out", default=None, help="result JSON (default bench/results/<time>-<commit>.json)")
+    ap.add_argument("--compare", default=None, help="earlier result JSON to diff against")
+    a = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="jawab-load-")
+    fake = FakeTelegram(("127.0.0.1", free_port()), a.latency_ms, a.jitter_ms, a.rate_429,
+                        sheet_csv=catalog_csv(a.categories, a.per_category), seed=a.seed).start()
+    sessions = generate(a.users, a.seed, a.categories, a.per_category)
+    n_updates = sum(len(s) for s in sessions)
+    target = Target(a, fake.url, tmp)
+    try:
+        target.wait_ready()
+        warm_up(target.url, fake)
+        wait_quiet(fake)
+        fake.reset()
+        size0 = db_bytes(tmp)
+        print(f"replaying {n_updates} updates from {len(sessions)} sessions, concurrency {a.concurrency} ...")
+        elapsed, lat, status = replay(target.url, sessions, a.concurrency)
+        wait_quiet(fake)
+        api = fake.stats()
+        size1 = db_bytes(tmp)
+    finally:
+        target.stop()
+
+    ms = lambda v: round(v * 1000, 3)
+    result = {
+        "commit": git_rev(), "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+        "params": {k: v for k, v in vars(a).items() if k not in ("out", "compare")},
+        "updates": n_updates, "elapsed_s": round(elapsed, 3), "throughput_ups": round(n_updates / elapsed, 2),
+        "status": status,
+        "latency_ms": {"p50": ms(pct(lat, 50)), "p95": ms(pct(lat, 95)), "p99": ms(pct(lat, 99)),
+                       "max": ms(lat[-1] if lat else 0), "mean": ms(sum(lat) / len(lat) if lat else 0)},
+        "bot_api": {"calls": api["calls"], "throttled_429": api["throttled"], "bytes_in": api["bytes_in"],
+                    "per_update": round(sum(api["calls"].values()) / n_updates, 3),
+                    "drain_s": round(api["last_at"] - api["first_at"], 3) if api["first_at"] else 0},
+        "db": {"before_bytes": size0, "after_bytes": size1, "growth_bytes": size1 - size0,
+               "growth_per_update": round((size1 - size0) / n_updates, 1)},
+    }
+    out = a.out or os.path.join(ROOT, "bench", "results", f"{datetime.utcnow():%Y%m%d-%H%M%S}-{result['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(json.dumps({k: result[k] for k in ("throughput_ups", "latency_ms", "status", "bot_api", "db")}, indent=2))
+    print("saved", out)
+    if a.compare:
+        compare(result, a.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# bench/render_bench.py
+# Cost of producing one sendMessage body: rebuild keyboard + json.dumps (what requests' json=
+# does) vs a RenderCache hit that only splices the chat_id. Screens: a 4-row reply menu, a
+# category list page and a product page of a Persian catalog.
+# Run: python bench/render_bench.py [n_items]
+import os, sys, json, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bot.catalog import Catalog
+from bot.render_cache import RenderCache
+from bot import paging
+
+MENU = [["🛍 محصولات", "🧺 سبد خرید"], ["💵 قیمت‌ها", "ℹ️ درباره ما"], [{"text": "📞 ارسال شماره", "request_contact": True}], ["↩️ بازگشت"]]
+
+def menu():
+    return {"keyboard": [[c if isinstance(c, dict) else {"text": c} for c in r] for r in MENU], "resize_keyboard": True}
+
+def make_items(n):
+    return [{"sku": f"SKU{i:06d}", "category": f"دسته {i % 40}", "name": f"محصول شماره {i} شکلات تلخ",
+             "price": 1 + i % 97 * 0.25, "stock": i % 30, "is_available": 1} for i in range(n)]
+
+def per_call(fn, n=20000):
+    t0 = time.perf_counter()
+    for i in range(n): fn(i)
+    return (time.perf_counter() - t0) / n * 1e6
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    cat = Catalog(make_items(n), 1)
+    screens = {
+        "menu": lambda: ("یک گزینه را انتخاب کنید:", menu()),
+        "categories": lambda: ("Categories:", paging.category_list(cat, 0)[1]),
+        "products": lambda: (f"Products in {cat.categories[3]}:", paging.product_page(cat, 3, 1)[3]),
+    }
+    cache = RenderCache()
+    print(f"{n} items | per message body, µs")
+    for name, build in screens.items():
+        def rebuild(i):
+            text, kb = build()
+            return json.dumps({"chat_id": 1000 + i, "text": text, "reply_markup": kb}, allow_nan=False).encode("utf-8")
+        def cached(i):
+            return cache.get(("FA", name, cat.version), build).body(1000 + i)
+        assert json.loads(rebuild(0)) == json.loads(cached(0))
+        a, b = per_call(rebuild), per_call(cached)
+        print(f"{name:11s}: rebuild {a:7.2f} | cached {b:6.2f} | x{a / b:5.1f} | body {len(rebuild(0)):5d} -> {len(cached(0)):5d} bytes")
+    print(cache.stats())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# bench/router_bench.py
+# Micro-benchmark: per-message intent matching, old contains_any chain vs compiled IntentRouter.
+# Run: python bench/router_bench.py [n_categories]
+import os, sys, time, random
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bot.router import IntentRouter
+
+LANGS = ("FA", "EN", "AR")
+LABELS = {
+    "btn_products": ["🛍 محصولات", "🛍 Products", "🛍 المنتجات"],
+    "btn_cart": ["🧺 سبد خرید", "🧺 Cart", "🧺 سلة التسوق"],
+    "btn_order": ["✅ ثبت سفارش", "✅ Place order", "✅ تأكيد الطلب"],
+    "btn_prices": ["💵 قیمت‌ها", "💵 Prices", "💵 الأسعار"],
+    "btn_about": ["ℹ️ درباره ما", "ℹ️ About", "ℹ️ من نحن"],
+}
+# same order as app.intent_rules()
+RULES = [
+    ("products", LABELS["btn_products"] + ["محصول", "products", "المنتجات"]),
+    ("empty_cart", ["empty cart", "خالی"]),
+    ("cart", LABELS["btn_cart"] + ["سبد", "cart", "🧺"]),
+    ("checkout", LABELS["btn_order"] + ["ثبت سفارش", "place order", "confirm order"]),
+    ("prices", LABELS["btn_prices"] + ["price", "قیمت", "الأسعار"]),
+    ("about", LABELS["btn_about"] + ["about", "درباره", "من نحن"]),
+    ("support", ["پشتیبانی", "support", "الدعم"]),
+    ("back", ["back", "بازگشت", "رجوع"]),
+]
+
+def _label(key, lang):
+    return LABELS[key][LANGS.index(lang)]
+
+# the pre-router implementation (app.py before the router), kept here verbatim as the baseline
+def _legacy_normalize(txt):
+    if not txt: return ""
+    t = str(txt)
+    for emo in ["🧩","🤖","💵","ℹ️","📞","🛟","🗂","✅","❌","🧺","📍","🧹"]:
+        t = t.replace(emo, "")
+    t = " ".join(t.split()).strip().lower()
+    return t
+
+def _legacy_contains_any(text, needles):
+    t = _legacy_normalize(text)
+    for n in needles:
+        if not n: continue
+        if _legacy_normalize(n) in t: return True
+    return False
+
+def legacy_match(text, catalog, lang):
+    # the old if-chain of process_update: the user's language's buttons only, categories
+    # re-sorted per message, one contains_any per branch
+    tnorm = _legacy_normalize(text)
+    if _legacy_contains_any(text, [_label("btn_products", lang), "محصول", "products", "المنتجات"]):
+        return ("products", None)
+    cats = sorted(list({it.get("category") or "Uncategorized" for it in catalog}))
+    for c in cats:
+        if _legacy_normalize(c) == tnorm or _legacy_normalize(c) in tnorm or tnorm in _legacy_normalize(c):
+            return ("category", c)
+    if _legacy_contains_any(text, [_label("btn_cart", lang), "سبد", "cart", "🧺"]):
+        return ("cart", None)
+    if _legacy_contains_any(text, ["empty cart","خالی"]):
+        return ("empty_cart", None)
+    if text == _label("btn_order", lang) or _legacy_contains_any(text, ["ثبت سفارش","place order","confirm order"]):
+        return ("checkout", None)
+    if _legacy_contains_any(text, [_label("btn_prices", lang), "price","قیمت","الأسعار"]):
+        return ("prices", None)
+    if _legacy_contains_any(text, [_label("btn_about", lang), "about","درباره","من نحن"]):
+        return ("about", None)
+    if _legacy_contains_any(text, ["پشتیبانی","support","الدعم"]):
+        return ("support", None)
+    if _legacy_contains_any(text, ["back","بازگشت","رجوع"]):
+        return ("back", None)
+    return (None, None)
+
+def main():
+    n_cats = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    rnd = random.Random(7)
+    catalog = [{"category": f"Category {i} شکلات", "name": f"item {j}"} for i in range(n_cats) for j in range(5)]
+    router = IntentRouter(RULES, categories=[it["category"] for it in catalog])
+    texts = ["🧹 Empty cart", "سلام", "hello there", "3", "2)", "back", "support please"]
+    texts += [rnd.choice(catalog)["category"] for _ in range(20)] + ["Tehran, street " + str(i) for i in range(10)]
+    # (text, sender's language): button taps come in the sender's language
+    corpus = [(l, lang) for labels in LABELS.values() for l, lang in zip(labels, LANGS)]
+    corpus += [(t, LANGS[i % len(LANGS)]) for i, t in enumerate(texts)]
+    # known differences: the old chain matched its emoji-only "🧺" needle ("" after normalizing)
+    # in every text, so anything unmatched opened the cart, and "🧹 Empty cart" hit "cart" first
+    diff = [(t, legacy_match(t, catalog, lang), router.match(t)) for t, lang in corpus
+            if legacy_match(t, catalog, lang) != router.match(t)]
+    print(f"legacy/router differ on {len(diff)}/{len(corpus)} messages", *diff[-5:], sep="\n  ")
+    for name, fn in (("legacy", lambda t, lang: legacy_match(t, catalog, lang)), ("router", lambda t, lang: router.match(t))):
+        rounds = 200
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            for t, lang in corpus: fn(t, lang)
+        dt = time.perf_counter() - t0
+        print(f"{name:7s} {dt / (rounds * len(corpus)) * 1e6:8.2f} us/message  ({n_cats} categories)")
+    t0 = time.perf_counter()
+    IntentRouter(RULES, categories=[it["category"] for it in catalog])
+    print(f"compile {(time.perf_counter() - t0) * 1e3:8.2f} ms")
+
+if __name__ == "__main__":
+    main()
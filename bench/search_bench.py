@@ -0,0 +1,38 @@
+# bench/search_bench.py
+# Product search on a synthetic multilingual catalog: full build, incremental update after a
+# small change, and per-query latency for exact / prefix / typo / Persian / Arabic queries.
+# Run: python bench/search_bench.py [n_items]
+import os, sys, time, random
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bot.catalog import Catalog
+from bot.search import SearchIndex
+
+WORDS = ["chocolate", "dark", "milk", "coffee", "espresso", "arabica", "tea", "green", "honey", "almond",
+         "شکلات", "تلخ", "شیر", "قهوه", "چای", "سبز", "عسل", "بادام", "پسته", "زعفران",
+         "شوكولاتة", "حليب", "قهوة", "شاي", "أخضر", "عسل", "لوز", "فستق", "تمر", "هيل"]
+CATS = ["Sweets", "Coffee", "Tea", "Nuts", "شیرینی", "قهوه", "حلويات", "مكسرات"]
+QUERIES = ["chocolate", "choc", "choclate", "dark chocolate", "شکلات", "شكلات تلخ", "قهوة", "قهوه",
+           "زعفران", "فستق حلبي", "espreso", "zzz"]
+
+def make_items(n, seed=1):
+    rnd = random.Random(seed)
+    return [{"sku": f"S{i}", "category": rnd.choice(CATS), "is_available": 1, "price": 1,
+             "name": " ".join(rnd.sample(WORDS, 3)) + f" {rnd.randint(1, 999)}g"} for i in range(n)]
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    items = make_items(n)
+    ix = SearchIndex()
+    t0 = time.perf_counter(); r = ix.update(Catalog(items, 1))
+    print(f"build      : {n} items in {(time.perf_counter() - t0) * 1000:8.1f} ms  {r}")
+    for it in items[:100]: it["name"] += " new"
+    t0 = time.perf_counter(); r = ix.update(Catalog(items, 2))
+    print(f"update     : {(time.perf_counter() - t0) * 1000:8.1f} ms  {r}")
+    for q in QUERIES:
+        reps = 50
+        t0 = time.perf_counter()
+        for _ in range(reps): res = ix.search(q)
+        print(f"{q:16s}: {(time.perf_counter() - t0) / reps * 1000:7.2f} ms  top={[items[int(s[1:])]['name'] for s in res[:1]]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+# bench/snapshot_bench.py
+# Per-worker memory and lookup cost: in-process Catalog (list of dicts + indexes) vs the
+# mmap'd SnapshotCatalog. The snapshot's bytes sit in the shared page cache, so its Python
+# heap cost is what each extra gunicorn worker adds.
+# Run: python bench/snapshot_bench.py [n_items]
+import os, sys, time, tempfile, tracemalloc
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bot.catalog import Catalog
+from bot.snapshot import write_snapshot, SnapshotCatalog
+
+def make_items(n):
+    return [{"sku": f"SKU{i:06d}", "category": f"Category {i % 40}", "name": f"Product {i} name",
+             "price": 1 + i % 97 * 0.25, "stock": i % 30, "is_available": 1} for i in range(n)]
+
+def heap(build):
+    tracemalloc.start()
+    obj = build()
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, used
+
+def per_call(fn, n=20000):
+    t0 = time.perf_counter()
+    for i in range(n): fn(i)
+    return (time.perf_counter() - t0) / n * 1e6
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    path = os.path.join(tempfile.mkdtemp(), "bench.catalog")
+    write_snapshot(path, make_items(n), 1)
+    dicts, dict_mem = heap(lambda: Catalog(make_items(n), 1))
+    snap, snap_mem = heap(lambda: SnapshotCatalog(path))
+    print(f"{n} items | snapshot file {os.path.getsize(path) / 1e6:.1f} MB (shared)")
+    print(f"heap per worker : dicts {dict_mem / 1e6:8.1f} MB | snapshot {snap_mem / 1e6:8.3f} MB")
+    for name, c in (("dicts", dicts), ("snapshot", snap)):
+        get = per_call(lambda i: c.get(f"SKU{i * 7 % n:06d}"))
+        page = per_call(lambda i: c.products_in(f"Category {i % 40}")[:10], 5000)
+        print(f"{name:9s}: get {get:6.2f} µs | category page of 10 {page:6.2f} µs")
+
+if __name__ == "__main__":
+    main()
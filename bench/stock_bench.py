@@ -0,0 +1,55 @@
+# bench/stock_bench.py
+# Contention benchmark for storage.inventory: dozens of threads check out the same SKU at once.
+# Verifies nothing is oversold and reports checkouts/second.
+# Run: python bench/stock_bench.py [threads] [initial_stock] [attempts_per_thread]
+import os, sys, time, random, tempfile, threading
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from storage.pool import manager
+from storage.inventory import init_inventory_schema, hold_cart, commit_cart, OutOfStock
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 48
+    stock = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    attempts = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    pool = manager(os.path.join(tempfile.mkdtemp(), "stock.sqlite"))
+    c = pool.get()
+    c.execute("CREATE TABLE products (sku TEXT PRIMARY KEY, category TEXT, name TEXT, price REAL, stock INTEGER DEFAULT -1, is_available INTEGER DEFAULT 1)")
+    c.execute("INSERT INTO products (sku,name,price,stock) VALUES ('HOT','hot item',1,?), ('FREE','untracked',1,-1)", (stock,))
+    c.commit()
+    init_inventory_schema(c)
+    sold, refused, errors = [0], [0], []
+    lock = threading.Lock()
+
+    def buyer(t):
+        conn = pool.get()
+        rnd = random.Random(t)
+        for i in range(attempts):
+            qty = rnd.randint(1, 3)
+            cart = [{"sku": "HOT", "qty": qty}, {"sku": "FREE", "qty": 1}]
+            chat = f"{t}-{i}"
+            try:
+                hold_cart(conn, chat, cart, ttl=60)
+                conn.execute("BEGIN IMMEDIATE")
+                with conn:
+                    commit_cart(conn, chat, cart, order_id=t * 1000 + i)
+                with lock: sold[0] += qty
+            except OutOfStock:
+                with lock: refused[0] += 1
+            except Exception as e:
+                with lock: errors.append(repr(e))
+
+    ts = [threading.Thread(target=buyer, args=(t,)) for t in range(threads)]
+    t0 = time.perf_counter()
+    for t in ts: t.start()
+    for t in ts: t.join()
+    dt = time.perf_counter() - t0
+    left = c.execute("SELECT stock FROM products WHERE sku='HOT'").fetchone()[0]
+    committed = c.execute("SELECT COALESCE(SUM(qty),0) FROM stock_reservations WHERE sku='HOT' AND status='committed'").fetchone()[0]
+    print(f"threads={threads} attempts={threads * attempts} initial={stock}")
+    print(f"sold={sold[0]} committed={committed} left={left} refused={refused[0]} errors={len(errors)}")
+    print(f"consistent={sold[0] == committed == stock - left and left >= 0}")
+    print(f"{threads * attempts / dt:8.0f} checkouts/s ({dt:.2f}s)")
+    if errors: print("first error:", errors[0])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# bench/zones_bench.py
+# Location -> delivery zone: ZoneIndex grid lookup vs a linear scan over every zone (what a
+# plain list + point-in-polygon would do). Zones: a ring of irregular polygons around a city
+# center plus radius areas for outlying districts; points are spread over the whole area,
+# so some fall outside every zone.
+# Run: python bench/zones_bench.py [n_zones]
+import os, sys, math, time, random
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bot.zones import Zone, ZoneIndex
+
+LAT, LON = 35.70, 51.40
+
+def make_zones(n):
+    rnd = random.Random(7)
+    zones = []
+    for i in range(n):
+        if i % 4 == 3:
+            a, d = rnd.uniform(0, 2 * math.pi), rnd.uniform(0.15, 0.3)
+            zones.append(Zone(f"R{i}", 4, 20, center=(LAT + d * math.sin(a), LON + d * math.cos(a)), radius_km=rnd.uniform(2, 6)))
+            continue
+        cy, cx = LAT + rnd.uniform(-0.15, 0.15), LON + rnd.uniform(-0.15, 0.15)
+        pts = []
+        for k in range(24):   # star-ish outline
+            a, r = 2 * math.pi * k / 24, rnd.uniform(0.02, 0.05)
+            pts.append((cy + r * math.sin(a), cx + r * math.cos(a)))
+        zones.append(Zone(f"P{i}", 1 + i % 3, 10, poly=pts))
+    return zones
+
+def linear(zones, lat, lon):
+    for z in zones:
+        b = z.bbox
+        if b[0] <= lat <= b[2] and b[1] <= lon <= b[3] and z.contains(lat, lon):
+            return z
+    return None
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    zones = make_zones(n)
+    t0 = time.perf_counter()
+    idx = ZoneIndex(zones)
+    build_ms = (time.perf_counter() - t0) * 1000
+    rnd = random.Random(1)
+    pts = [(LAT + rnd.uniform(-0.35, 0.35), LON + rnd.uniform(-0.35, 0.35)) for _ in range(50000)]
+    assert all(idx.locate(*p) is linear(zones, *p) for p in pts[:5000])
+    res = {}
+    for name, fn in (("grid", idx.locate), ("linear", lambda a, b: linear(zones, a, b))):
+        t0 = time.perf_counter()
+        hits = sum(fn(a, b) is not None for a, b in pts)
+        res[name] = (time.perf_counter() - t0) / len(pts) * 1e6
+    print(f"{n} zones | build {build_ms:.1f} ms | {idx.stats()} | served {hits / len(pts):.0%}")
+    print(f"per lookup, µs: grid {res['grid']:.2f} | linear {res['linear']:.2f} | x{res['linear'] / res['grid']:.1f}")
+
+if __name__ == "__main__":
+    main()
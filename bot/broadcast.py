@@ -0,0 +1,109 @@
+# bot/broadcast.py
+# Broadcast runner: pages the audience with a keyset cursor, sends through the outbox (so the
+# global/per-chat rate limits still apply) with a bounded in-flight window, and checkpoints
+# the cursor + counters after every page. Sends are at-least-once: a crash mid-page resends
+# that page after restart. Users answering 403 are marked blocked and skipped next time.
+import os, time, socket, threading
+from bot.ratelimit import TokenBucket
+from storage.broadcasts import (claim_broadcast, checkpoint_broadcast, finish_broadcast,
+                                broadcast_status, latest_broadcast)
+
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "25"))      # msg/s; leaves headroom under the 30/s global cap
+BROADCAST_WINDOW = int(os.getenv("BROADCAST_WINDOW", "50"))    # max sends in flight
+BROADCAST_PAGE = int(os.getenv("BROADCAST_PAGE", "200"))
+BROADCAST_LEASE = float(os.getenv("BROADCAST_LEASE_SEC", "120"))
+PAGE_TIMEOUT = 300.0
+LEASE_MARGIN = 0.8   # checkpoint (renewing the lease) before this share of it has passed
+
+class _Page:
+    def __init__(self, n):
+        self.left = n
+        self.sent = self.failed = 0
+        self.blocked = []
+        self.cv = threading.Condition()
+
+    def result(self, chat_id, status, body):
+        with self.cv:
+            if status is not None and status < 400:
+                self.sent += 1
+            elif status == 403:
+                self.blocked.append(chat_id)
+            else:
+                self.failed += 1
+            self.left -= 1
+            self.cv.notify_all()
+
+class BroadcastRunner:
+    """send_fn(chat_id, text, on_result) -> bool (False = not queued); users: the shop's UserStore."""
+
+    def __init__(self, send_fn, users, rate:float=BROADCAST_RATE, window:int=BROADCAST_WINDOW,
+                 page_size:int=BROADCAST_PAGE, lease:float=BROADCAST_LEASE):
+        self.send_fn, self.users = send_fn, users
+        self.rate, self.window, self.page_size, self.lease = rate, window, page_size, lease
+        self.live = {}   # job_id -> {"rate": msg/s in this process, "since": ts}
+
+    def owner(self):
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def tick(self)->int:
+        """Run the claimable job (if any) to completion. Returns messages attempted."""
+        job = claim_broadcast(self.users.conn, self.owner(), self.lease)
+        return self.run(job) if job else 0
+
+    def run(self, job)->int:
+        owner, cursor, done = self.owner(), job["cursor"] or 0, 0
+        bucket = TokenBucket(self.rate, max(1, int(self.rate)))
+        slots = threading.BoundedSemaphore(self.window)
+        t0 = time.time()
+        leased = time.monotonic()   # tick() just claimed / renewed the lease
+        while True:
+            if broadcast_status(self.users.conn, job["id"]) != "running":
+                break
+            ids = self.users.page_user_ids(cursor, self.page_size, job["lang"], job["source"])
+            if not ids:
+                finish_broadcast(self.users.conn, job["id"], "done")
+                break
+            # a slow page must not outlive the lease: another worker would claim the job and resend
+            # it. Stop sending / waiting in time to checkpoint (which renews the lease) before then.
+            deadline = leased + self.lease * LEASE_MARGIN
+            page = _Page(len(ids))
+            queued = 0
+            for cid in ids:
+                if not slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                    break   # outbox stalled: checkpoint what went out, the rest is the next page
+                wait = bucket.reserve(time.monotonic()) - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                def cb(status, body, cid=cid):
+                    slots.release()
+                    page.result(cid, status, body)
+                if not self.send_fn(cid, job["text"], cb):
+                    cb(None, None)
+                queued += 1
+            with page.cv:
+                page.left -= len(ids) - queued
+                page.cv.wait_for(lambda: page.left <= 0, timeout=max(0.0, min(PAGE_TIMEOUT, deadline - time.monotonic())))
+                sent, failed, blocked = page.sent, page.failed, list(page.blocked)
+            self.users.mark_blocked(blocked)
+            if queued:
+                cursor = ids[queued - 1]
+            done += queued
+            self.live[job["id"]] = {"rate": done / max(time.time() - t0, 1e-6), "since": t0}
+            status = checkpoint_broadcast(self.users.conn, job["id"], owner, cursor, sent, failed, len(blocked), self.lease)
+            leased = time.monotonic()
+            if status != "running":
+                break
+        self.live.pop(job["id"], None)
+        return done
+
+def progress(users, job=None)->dict|None:
+    """Latest job with throughput and ETA (for /broadcast status)."""
+    job = job or latest_broadcast(users.conn)
+    if not job:
+        return None
+    processed = job["sent"] + job["failed"] + job["blocked"]
+    elapsed = max((job["finished_at"] or job["updated_at"] or time.time()) - job["started_at"], 1e-6)
+    rate = processed / elapsed
+    remaining = users.count_user_ids(job["cursor"] or 0, job["lang"], job["source"]) if job["status"] == "running" else 0
+    return dict(job, processed=processed, rate=rate, remaining=remaining,
+                eta_sec=(remaining / rate) if rate > 0 and remaining else 0)
@@ -0,0 +1,41 @@
+# bot/catalog.py
+# Immutable, versioned in-memory catalog with precomputed indexes.
+# A new Catalog is built off to the side on each load/sync and published by rebinding one
+# global, so readers holding the old object keep a consistent view until they are done.
+# version: the DB catalog generation (>= 1, shared by all workers), ENV_VERSION for the
+# static ENV product list, -1 for the empty placeholder.
+
+ENV_VERSION = 0
+
+class Catalog:
+    """items: list of dicts {sku,category,name,price,stock,is_available}."""
+
+    def __init__(self, items=(), version:int=ENV_VERSION):
+        self.version = version
+        self.items = tuple(items)
+        self.by_sku = {}
+        self.by_category = {}   # category -> available products, in source order
+        for it in self.items:
+            self.by_sku[it["sku"]] = it
+            if it.get("is_available", 1):
+                self.by_category.setdefault(it.get("category") or "Uncategorized", []).append(it)
+        self.categories = sorted({it.get("category") or "Uncategorized" for it in self.items})
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def get(self, sku):
+        return self.by_sku.get(sku)
+
+    def products_in(self, category)->list:
+        return self.by_category.get(category, [])
+
+    def set_stock(self, sku, stock):
+        it = self.by_sku.get(sku)
+        if it is not None:
+            it["stock"] = stock
+
+EMPTY = Catalog((), version=-1)
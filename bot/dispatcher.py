@@ -0,0 +1,117 @@
+# bot/dispatcher.py
+# Asynchronous update processing: the webhook enqueues, a pool of workers handles.
+# Updates are sharded by chat_id onto per-worker queues, so one chat is always served
+# by the same worker (in order) while different chats run in parallel.
+import os, time, queue, atexit, threading
+from bot.log import get_logger
+
+log = get_logger("updates")
+
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", "4"))
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", "500"))   # per worker
+UPDATE_FLUSH_TIMEOUT = float(os.getenv("UPDATE_FLUSH_TIMEOUT", "20"))
+
+def update_chat_id(update:dict):
+    for key in ("message", "edited_message", "channel_post"):
+        chat = (update.get(key) or {}).get("chat") or {}
+        if chat.get("id") is not None:
+            return chat["id"]
+    cq = update.get("callback_query") or {}
+    chat = (cq.get("message") or {}).get("chat") or {}
+    if chat.get("id") is not None:
+        return chat["id"]
+    return (cq.get("from") or {}).get("id")
+
+class Dispatcher:
+    def __init__(self, handler, workers:int=UPDATE_WORKERS, queue_size:int=UPDATE_QUEUE_SIZE):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in range(self.workers)]
+        self._lock = threading.Lock()
+        self._pid = None
+        self.counters = {"accepted": 0, "shed": 0, "processed": 0, "errors": 0}
+
+    # started lazily so each gunicorn worker (forked after --preload) gets its own threads
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self.queues = [queue.Queue(maxsize=self.queue_size) for _ in range(self.workers)]
+            for i, q in enumerate(self.queues):
+                threading.Thread(target=self._run, args=(q,), name=f"updates-{i}", daemon=True).start()
+            self._pid = os.getpid()
+
+    def _count(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    def submit(self, update:dict)->bool:
+        """Queue an update on its chat's shard. False = shard full, caller should shed."""
+        self._ensure_started()
+        cid = update_chat_id(update)
+        q = self.queues[hash(str(cid)) % self.workers]
+        try:
+            q.put_nowait(update)
+        except queue.Full:
+            self._count("shed")
+            return False
+        self._count("accepted")
+        return True
+
+    def _run(self, q):
+        while True:
+            update = q.get()
+            if update is None:   # close()
+                q.task_done()
+                return
+            try:
+                self.handler(update)
+                self._count("processed")
+            except Exception:
+                self._count("errors")
+                log.exception("update worker error")
+            finally:
+                q.task_done()
+
+    def flush(self, timeout:float=UPDATE_FLUSH_TIMEOUT)->bool:
+        if self._pid != os.getpid():
+            return True
+        deadline = time.monotonic() + timeout
+        while any(q.unfinished_tasks for q in self.queues):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def close(self, timeout:float=UPDATE_FLUSH_TIMEOUT)->bool:
+        """Finish queued updates (up to timeout), stop the workers and forget this dispatcher."""
+        drained = self.flush(timeout)
+        if self._pid == os.getpid():
+            for q in self.queues:
+                q.put(None)
+        if self in _DISPATCHERS:
+            _DISPATCHERS.remove(self)
+        return drained
+
+    def stats(self)->dict:
+        with self._lock:
+            c = dict(self.counters)
+        c["queue_depth"] = sum(q.qsize() for q in self.queues)
+        c["workers"] = self.workers
+        return c
+
+_DISPATCHERS = []
+
+def make_dispatcher(handler, **kw)->Dispatcher:
+    d = Dispatcher(handler, **kw)
+    _DISPATCHERS.append(d)
+    return d
+
+@atexit.register
+def _flush_on_exit():
+    for d in _DISPATCHERS:
+        if not d.flush():
+            log.error("exit with pending updates", extra={"queue_depth": d.stats()["queue_depth"]})
@@ -0,0 +1,107 @@
+# bot/log.py
+# Structured logging. Request threads only format the message and enqueue the record; one
+# background thread per process writes JSON lines. Modules log through
+# logging.getLogger("jawab.<part>"); setup() hangs a single queue handler on "jawab".
+#   LOG_LEVEL   INFO by default; DEBUG enables the per-update trace records
+#   LOG_SAMPLE  fraction of updates traced at DEBUG (0 = off: one comparison in the hot path)
+#   LOG_FORMAT  json | text
+# Warnings and errors (with tracebacks) are always written. A full queue drops records
+# (counted) instead of blocking a request. Bot tokens (they sit in every Bot API URL) are
+# masked in tracebacks; pass other text that may hold a URL through redact().
+import os, re, sys, json, queue, random, atexit, logging, traceback
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = (os.getenv("LOG_LEVEL") or "INFO").upper()
+LOG_SAMPLE = float(os.getenv("LOG_SAMPLE", "0"))
+LOG_FORMAT = (os.getenv("LOG_FORMAT") or "json").lower()
+LOG_QUEUE = int(os.getenv("LOG_QUEUE", "10000"))
+
+_TOKEN_RE = re.compile(r"bot\d+:[\w-]+")
+
+def redact(text)->str:
+    """str(text) with Bot API tokens masked: .../bot<redacted>/sendMessage"""
+    return _TOKEN_RE.sub("bot<redacted>", str(text))
+
+_STD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+class JsonFormatter(logging.Formatter):
+    def format(self, r):
+        d = {"ts": round(r.created, 3), "level": r.levelname.lower(), "logger": r.name, "msg": r.getMessage()}
+        for k, v in r.__dict__.items():
+            if k not in _STD_ATTRS:
+                d[k] = v
+        return json.dumps(d, ensure_ascii=False, default=str)
+
+class TextFormatter(logging.Formatter):
+    def format(self, r):
+        extra = " ".join(f"{k}={v}" for k, v in r.__dict__.items() if k not in _STD_ATTRS and k != "exc")
+        line = f"{r.levelname[0]} {r.name}: {r.getMessage()}" + (f" {extra}" if extra else "")
+        return line + ("\n" + r.exc if getattr(r, "exc", None) else "")
+
+class AsyncHandler(QueueHandler):
+    """Bounded queue + listener thread, (re)started lazily per process (gunicorn forks after --preload)."""
+
+    def __init__(self, target:logging.Handler, maxsize:int=LOG_QUEUE):
+        super().__init__(queue.Queue(maxsize))
+        self.target, self.maxsize = target, maxsize
+        self.listener = None
+        self.dropped = 0
+        self._pid = None
+
+    def prepare(self, record):
+        # keep the traceback as its own field instead of folding it into msg
+        if record.exc_info:
+            record.exc = redact("".join(traceback.format_exception(*record.exc_info)).rstrip())
+            record.exc_info = None
+        record.msg, record.args = record.getMessage(), None
+        return record
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():   # emit() runs under the handler lock
+            self.queue = queue.Queue(self.maxsize)
+            self.listener = QueueListener(self.queue, self.target)
+            self.listener.start()
+            self._pid = os.getpid()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        """Drain and stop the writer (at exit)."""
+        if self.listener and self._pid == os.getpid():
+            self.listener.stop()
+            self.listener, self._pid = None, None
+        if self.dropped:
+            sys.stderr.write(f"log: {self.dropped} records dropped (queue full)\n")
+
+HANDLER = None
+
+def setup()->AsyncHandler:
+    global HANDLER
+    if HANDLER is None:
+        out = logging.StreamHandler(sys.stdout)
+        out.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+        HANDLER = AsyncHandler(out)
+        root = logging.getLogger("jawab")
+        root.addHandler(HANDLER)
+        root.setLevel(LOG_LEVEL)
+        root.propagate = False
+    return HANDLER
+
+def get_logger(name:str)->logging.Logger:
+    setup()
+    return logging.getLogger("jawab." + name)
+
+def sample()->bool:
+    """True for a LOG_SAMPLE fraction of calls."""
+    return LOG_SAMPLE >= 1 or (LOG_SAMPLE > 0 and random.random() < LOG_SAMPLE)
+
+def tracing(logger:logging.Logger)->bool:
+    """Per-update DEBUG trace configured at all? Evaluate once, then gate each record on sample()."""
+    return LOG_SAMPLE > 0 and logger.isEnabledFor(logging.DEBUG)
+
+@atexit.register
+def _stop_on_exit():
+    if HANDLER:
+        HANDLER.stop()
@@ -0,0 +1,172 @@
+# bot/metrics.py
+# Prometheus text exposition without a client library. Hot paths only touch their own
+# thread's shard (no lock, no shared cache line); /metrics merges the shards when scraped.
+# Values are per process: with several gunicorn workers each scrape sees one worker
+# (the `pid` label tells them apart). Per-shop series carry a `tenant` label ("" = the
+# process's own shop), so tenants served by one worker never share a series.
+import os, time, bisect, threading
+from bot.log import get_logger
+
+log = get_logger("metrics")
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _esc(v):
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_esc(v)}"' for n, v in zip(names, values)] + [f'{n}="{_esc(v)}"' for n, v in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _num(v):
+    if v == float("inf"): return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+class _Sharded:
+    """Per-thread dicts {label_values: state}; only the owning thread writes its dict."""
+
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()   # only taken when a thread creates its shard
+
+    def _shard(self)->dict:
+        d = getattr(self._local, "d", None)
+        if d is None:
+            d = self._local.d = {}
+            with self._lock:
+                self._shards.append(d)
+        return d
+
+    def _snapshot(self):
+        with self._lock:
+            shards = list(self._shards)
+        return [list(d.items()) for d in shards]
+
+class Counter(_Sharded):
+    kind = "counter"
+
+    def inc(self, n=1, *labels):
+        d = self._shard()
+        d[labels] = d.get(labels, 0) + n
+
+    def collect(self)->dict:
+        out = {}
+        for items in self._snapshot():
+            for k, v in items:
+                out[k] = out.get(k, 0) + v
+        return out
+
+    def render(self, pid):
+        return [f"{self.name}{_labels(self.labels, k, pid)} {_num(v)}" for k, v in sorted(self.collect().items())]
+
+class Histogram(_Sharded):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        d = self._shard()
+        s = d.get(labels)
+        if s is None:
+            s = d[labels] = [0] * (len(self.buckets) + 1) + [0.0]   # per-bucket counts, +Inf, sum
+        s[bisect.bisect_left(self.buckets, value)] += 1
+        s[-1] += value
+
+    def time(self, *labels):
+        return _Timer(self, labels)
+
+    def collect(self)->dict:
+        """{labels: (cumulative bucket counts incl. +Inf, sum)}"""
+        merged = {}
+        for items in self._snapshot():
+            for k, s in items:
+                s = list(s)
+                m = merged.get(k)
+                if m is None:
+                    merged[k] = s
+                else:
+                    for i, v in enumerate(s):
+                        m[i] += v
+        out = {}
+        for k, s in merged.items():
+            cum, acc = [], 0
+            for c in s[:-1]:
+                acc += c; cum.append(acc)
+            out[k] = (cum, s[-1])
+        return out
+
+    def render(self, pid):
+        lines = []
+        for k, (cum, total) in sorted(self.collect().items()):
+            for le, c in zip(self.buckets + (float("inf"),), cum):
+                lines.append(f"{self.name}_bucket{_labels(self.labels, k, pid + (('le', _num(le)),))} {c}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, k, pid)} {total!r}")
+            lines.append(f"{self.name}_count{_labels(self.labels, k, pid)} {cum[-1]}")
+        return lines
+
+class _Timer:
+    __slots__ = ("h", "labels", "t0")
+
+    def __init__(self, h, labels):
+        self.h, self.labels = h, labels
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.h.observe(time.perf_counter() - self.t0, *self.labels)
+
+class Callback:
+    """Gauge (or externally kept counter) read at scrape time: fn() -> number | {label_values: number}."""
+
+    def __init__(self, name, help, fn, labels=(), kind="gauge"):
+        self.name, self.help, self.fn, self.labels, self.kind = name, help, fn, tuple(labels), kind
+
+    def render(self, pid):
+        try:
+            v = self.fn()
+        except Exception:
+            log.exception("metrics callback error", extra={"metric": self.name})
+            return []
+        if v is None:
+            return []
+        items = v.items() if isinstance(v, dict) else [((), v)]
+        return [f"{self.name}{_labels(self.labels, k if isinstance(k, tuple) else (k,), pid)} {_num(x)}" for k, x in items]
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.by_name = {}
+
+    def _add(self, m):
+        # one series per name: a second registration would silently merge or shadow the first
+        if m.name in self.by_name:
+            raise ValueError(f"metric {m.name} already registered")
+        self.by_name[m.name] = m
+        self.metrics.append(m)
+        return m
+
+    def counter(self, name, help, labels=())->Counter:
+        return self._add(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS)->Histogram:
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name, help, fn, labels=(), kind="gauge")->Callback:
+        return self._add(Callback(name, help, fn, labels, kind))
+
+    def render(self)->str:
+        pid = (("pid", os.getpid()),)
+        out = []
+        for m in self.metrics:
+            out.append(f"# HELP {m.name} {m.help}")
+            out.append(f"# TYPE {m.name} {m.kind}")
+            out.extend(m.render(pid))
+        return "\n".join(out) + "\n"
+
+METRICS = Registry()
@@ -0,0 +1,239 @@
+# bot/outbound.py
+# Outbound Bot API delivery: a bounded in-process queue drained by a small worker pool.
+# All workers share one keep-alive requests.Session, so handlers only enqueue and return.
+# Every call goes through the RateLimiter: messages are parked until their slot instead of
+# blocking a worker. Each chat maps to one worker shard and items are ordered by
+# (send_at, seq), so one chat's messages keep their order even across 429 / 5xx retries.
+# One outbox per shop (bot token): its own limiter, workers and `tenant` metrics label.
+import os, time, heapq, random, atexit, threading
+import requests
+from requests.adapters import HTTPAdapter
+from bot.ratelimit import RateLimiter
+from bot.metrics import METRICS
+from bot.log import get_logger, redact
+
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "4"))
+OUTBOX_MAXSIZE = int(os.getenv("OUTBOX_MAXSIZE", "1000"))
+OUTBOX_PUT_TIMEOUT = float(os.getenv("OUTBOX_PUT_TIMEOUT", "2"))   # backpressure: how long a producer may wait
+OUTBOX_FLUSH_TIMEOUT = float(os.getenv("OUTBOX_FLUSH_TIMEOUT", "10"))
+OUTBOX_MAX_RETRIES = int(os.getenv("OUTBOX_MAX_RETRIES", "3"))      # 5xx / network errors
+HTTP_TIMEOUT = float(os.getenv("OUTBOX_HTTP_TIMEOUT", "10"))
+
+log = get_logger("outbox")
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+API_SECONDS = METRICS.histogram("jawab_bot_api_seconds", "Bot API call latency", ("tenant", "method"))
+API_RESPONSES = METRICS.counter("jawab_bot_api_responses_total", "Bot API responses by status (error = no response)", ("tenant", "method", "status"))
+
+def make_session(pool_size:int=10)->requests.Session:
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+class _Shard:
+    def __init__(self):
+        self.heap = []                 # (send_at, seq, chat_id, url, payload, attempt, on_result)
+        self.cv = threading.Condition()
+
+class Outbox:
+    """Bounded, rate-limited send queue. workers=0 sends inline (debug / single-shot scripts)."""
+
+    def __init__(self, workers:int=OUTBOX_WORKERS, maxsize:int=OUTBOX_MAXSIZE,
+                 put_timeout:float=OUTBOX_PUT_TIMEOUT, timeout:float=HTTP_TIMEOUT,
+                 limiter:RateLimiter|None=None, max_retries:int=OUTBOX_MAX_RETRIES, tenant:str=""):
+        self.tenant = tenant
+        self.workers = max(0, workers)
+        self.maxsize = maxsize
+        self.put_timeout = put_timeout
+        self.timeout = timeout
+        self.limiter = limiter or RateLimiter()
+        self.max_retries = max_retries
+        self.shards = [_Shard() for _ in range(max(1, self.workers))]
+        self.session = make_session(max(1, self.workers))
+        self._lock = threading.Lock()
+        self._space = threading.Condition(self._lock)
+        self._pending = 0
+        self._seq = 0
+        self._pid = None
+        self._closed = False
+        self.counters = {"enqueued": 0, "sent": 0, "failed": 0, "dropped": 0,
+                         "throttled": 0, "retried": 0, "latency_sum": 0.0, "latency_max": 0.0}
+
+    # threads do not survive gunicorn's fork after --preload, so start them lazily per process
+    def _ensure_started(self):
+        if self.workers == 0 or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self.session = make_session(self.workers)
+            self.shards = [_Shard() for _ in range(self.workers)]
+            self._pending = 0
+            for i, sh in enumerate(self.shards):
+                threading.Thread(target=self._run, args=(sh,), name=f"outbox-{i}", daemon=True).start()
+            self._pid = os.getpid()
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.counters[key] += n
+
+    def _shard(self, chat_id)->_Shard:
+        return self.shards[hash(str(chat_id)) % len(self.shards)]
+
+    def submit(self, url, payload, on_result=None, chat_id=None)->bool:
+        """Enqueue one Bot API call. Returns False when the queue stayed full (message dropped).
+        payload is a dict, or ready JSON bytes (render cache) with chat_id passed alongside.
+        on_result(status_code, body_dict_or_None) is called from the worker once delivery ends."""
+        if not url:
+            return False
+        if isinstance(payload, dict):
+            chat_id = payload.get("chat_id")
+        if self.workers == 0 or self._closed:   # closed: late sends of an evicted tenant go inline
+            self._deliver(chat_id, url, payload, 0, on_result)
+            return True
+        self._ensure_started()
+        with self._space:
+            if not self._space.wait_for(lambda: self._pending < self.maxsize, timeout=self.put_timeout):
+                self.counters["dropped"] += 1
+                log.warning("outbox full, message dropped", extra={"chat_id": chat_id})
+                return False
+            self._pending += 1
+            self._seq += 1
+            seq = self._seq
+            self.counters["enqueued"] += 1
+        now = time.monotonic()
+        send_at = self.limiter.reserve(chat_id, now)
+        if send_at > now:
+            self._count("throttled")
+        self._push(chat_id, (send_at, seq, chat_id, url, payload, 0, on_result))
+        return True
+
+    def _push(self, chat_id, item):
+        sh = self._shard(chat_id)
+        with sh.cv:
+            heapq.heappush(sh.heap, item)
+            sh.cv.notify()
+
+    def _done(self):
+        with self._space:
+            self._pending -= 1
+            self._space.notify_all()
+
+    def _deliver(self, chat_id, url, payload, attempt, on_result):
+        """-> None when finished (sent or given up), or a delay in seconds to retry after."""
+        t0 = time.perf_counter()
+        status, body, retry_in = None, None, None
+        try:
+            if isinstance(payload, (bytes, bytearray)):
+                r = self.session.post(url, data=payload, headers=JSON_HEADERS, timeout=self.timeout)
+            else:
+                r = self.session.post(url, json=payload, timeout=self.timeout)
+            status = r.status_code
+            try: body = r.json()
+            except ValueError: body = None
+            if status == 429:
+                retry_in = float(((body or {}).get("parameters") or {}).get("retry_after") or 1)
+            elif status >= 500:
+                retry_in = -1
+            elif status >= 400:
+                log.warning("bot api error", extra={"chat_id": chat_id, "status": status, "body": r.text[:200]})
+        except Exception as e:
+            log.warning("bot api request failed", extra={"chat_id": chat_id, "error": redact(e), "attempt": attempt})
+            retry_in = -1
+        dt = time.perf_counter() - t0
+        method = url.rsplit("/", 1)[-1]
+        API_SECONDS.observe(dt, self.tenant, method)
+        API_RESPONSES.inc(1, self.tenant, method, str(status or "error"))
+        with self._lock:
+            self.counters["latency_sum"] += dt
+            if dt > self.counters["latency_max"]:
+                self.counters["latency_max"] = dt
+        if retry_in is not None:
+            # 429 follows retry_after (more patience); 5xx / network: exponential backoff with jitter
+            if attempt < (self.max_retries * 3 if status == 429 else self.max_retries):
+                if retry_in < 0:
+                    retry_in = min(30.0, 0.5 * (2 ** attempt)) * random.uniform(0.5, 1.5)
+                return retry_in
+            self._count("dropped")
+            log.error("giving up on message", extra={"chat_id": chat_id, "status": status, "attempts": attempt + 1})
+        else:
+            self._count("sent" if status is not None and status < 400 else "failed")
+        if on_result:
+            try: on_result(status, body)
+            except Exception: log.exception("outbox callback error")
+        return None
+
+    def _run(self, sh:_Shard):
+        while True:
+            with sh.cv:
+                while True:
+                    if self._closed and not sh.heap:
+                        return
+                    now = time.monotonic()
+                    if sh.heap and sh.heap[0][0] <= now:
+                        item = heapq.heappop(sh.heap)
+                        break
+                    sh.cv.wait(timeout=(sh.heap[0][0] - now) if sh.heap else None)
+            send_at, seq, chat_id, url, payload, attempt, on_result = item
+            retry_in = None
+            try:
+                retry_in = self._deliver(chat_id, url, payload, attempt, on_result)
+            finally:
+                if retry_in is not None:
+                    # keep seq: later messages for this chat are deferred too and stay behind it
+                    until = time.monotonic() + retry_in
+                    self.limiter.defer(chat_id, until, global_too=chat_id is None)
+                    self._count("retried")
+                    with sh.cv:
+                        heapq.heappush(sh.heap, (until, seq, chat_id, url, payload, attempt + 1, on_result))
+                        for i, it in enumerate(sh.heap):
+                            if it[2] == chat_id and it[0] < until:
+                                sh.heap[i] = (until,) + it[1:]
+                        heapq.heapify(sh.heap)
+                        sh.cv.notify()
+                else:
+                    self._done()
+
+    def flush(self, timeout:float=OUTBOX_FLUSH_TIMEOUT)->bool:
+        """Wait until queued messages are delivered (or timeout). True when fully drained."""
+        if self.workers == 0 or self._pid != os.getpid():
+            return True
+        deadline = time.monotonic() + timeout
+        with self._space:
+            return self._space.wait_for(lambda: self._pending == 0, timeout=max(0.0, deadline - time.monotonic()))
+
+    def close(self, timeout:float=OUTBOX_FLUSH_TIMEOUT)->bool:
+        """Drain (up to timeout), let the workers exit once their shard is empty, forget this outbox."""
+        drained = self.flush(timeout)
+        self._closed = True
+        if self in _OUTBOXES:
+            _OUTBOXES.remove(self)
+        for sh in self.shards:
+            with sh.cv:
+                sh.cv.notify_all()
+        return drained
+
+    def stats(self)->dict:
+        with self._lock:
+            c = dict(self.counters)
+            c["queue_depth"] = self._pending
+        done = c["sent"] + c["failed"] + c["retried"]
+        latency_sum = c.pop("latency_sum")
+        c["latency_avg_ms"] = round(latency_sum / done * 1000, 2) if done else 0.0
+        c["latency_max_ms"] = round(c.pop("latency_max") * 1000, 2)
+        return c
+
+_OUTBOXES = []
+
+def make_outbox(**kw)->Outbox:
+    ob = Outbox(**kw)
+    _OUTBOXES.append(ob)
+    return ob
+
+@atexit.register
+def _flush_on_exit():
+    for ob in list(_OUTBOXES):
+        if not ob.flush():
+            log.error("exit with unsent messages", extra={"tenant": ob.tenant, "queue_depth": ob.stats()["queue_depth"]})
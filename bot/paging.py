@@ -0,0 +1,79 @@
+# bot/paging.py
+# Inline-keyboard browsing: category list and per-category product pages, navigated with
+# callback_query + editMessageText instead of a new message per step.
+# callback_data is compact (Telegram allows 64 bytes): "<kind>.<version>.<a>.<b>" with
+# base-36 numbers, e.g. "p.1z.3.2" = products page 2 of category #3 in catalog version 71.
+#   l.<ver>.<page>           category list page
+#   p.<ver>.<cat>.<page>     product page of category <cat> (index in catalog.categories)
+#   a.<ver>.<cat>.<idx>      add product <idx> of that category to the cart
+#   n.<ver>                  page indicator (answered, nothing edited)
+# Pages are slices of the catalog's precomputed per-category ordering, so every SKU is
+# reachable and a page costs O(page size).
+import math
+
+PAGE_SIZE = 8
+
+def _b36(n:int)->str:
+    n = int(n)
+    if n < 0: return "-" + _b36(-n)
+    s = ""
+    while True:
+        n, r = divmod(n, 36)
+        s = "0123456789abcdefghijklmnopqrstuvwxyz"[r] + s
+        if not n: return s
+
+def encode(kind:str, version:int, *nums)->str:
+    return ".".join([kind, _b36(version)] + [_b36(x) for x in nums])
+
+KINDS = ("l", "p", "a", "n")
+
+def decode(data:str):
+    """-> (kind, version, [nums]) or None for foreign / malformed data."""
+    try:
+        kind, *rest = (data or "").split(".")
+        if kind not in KINDS:
+            return None
+        vals = [int(x, 36) for x in rest]
+        return (kind, vals[0], vals[1:]) if vals else None
+    except ValueError:
+        return None
+
+def pages(n:int, size:int=PAGE_SIZE)->int:
+    return max(1, math.ceil(n / size))
+
+def _nav(kind, version, prefix, page, total):
+    if total <= 1:
+        return []
+    row = []
+    if page > 0:
+        row.append({"text": "‹", "callback_data": encode(kind, version, *prefix, page - 1)})
+    row.append({"text": f"{page + 1}/{total}", "callback_data": encode("n", version)})   # no-op
+    if page < total - 1:
+        row.append({"text": "›", "callback_data": encode(kind, version, *prefix, page + 1)})
+    return [row]
+
+def category_list(catalog, page:int=0, size:int=PAGE_SIZE):
+    """-> (page, inline_keyboard). Two categories per row."""
+    cats = catalog.categories
+    total = pages(len(cats), size)
+    page = min(max(0, page), total - 1)
+    buttons = [{"text": c, "callback_data": encode("p", catalog.version, page * size + i, 0)}
+               for i, c in enumerate(cats[page * size:(page + 1) * size])]
+    rows = [buttons[i:i + 2] for i in range(0, len(buttons), 2)]
+    return page, {"inline_keyboard": rows + _nav("l", catalog.version, (), page, total)}
+
+def product_page(catalog, cat_idx:int, page:int=0, size:int=PAGE_SIZE, label=None, back_label="⬅️"):
+    """-> (category, page, n_products, inline_keyboard) or None if the category is gone."""
+    if not 0 <= cat_idx < len(catalog.categories):
+        return None
+    cat = catalog.categories[cat_idx]
+    prods = catalog.products_in(cat)
+    total = pages(len(prods), size)
+    page = min(max(0, page), total - 1)
+    # numbered across the whole category, so typing the number still picks the same product
+    label = label or (lambda n, p: f"{n}) {p.get('name')} — ${float(p.get('price') or 0):.2f}")
+    rows = [[{"text": label(page * size + i + 1, p), "callback_data": encode("a", catalog.version, cat_idx, page * size + i)}]
+            for i, p in enumerate(prods[page * size:(page + 1) * size])]
+    rows += _nav("p", catalog.version, (cat_idx,), page, total)
+    rows.append([{"text": back_label, "callback_data": encode("l", catalog.version, cat_idx // size)}])
+    return cat, page, len(prods), {"inline_keyboard": rows}
@@ -0,0 +1,85 @@
+# bot/ratelimit.py
+# Telegram-aware send scheduling. Instead of sleeping, a reservation returns the earliest
+# time (time.monotonic()) a message may go out, so the outbox can park it and keep sending
+# to other chats. Per-chat buckets use GCRA (virtual scheduling): `burst` sends back to back,
+# then one every 1/rate seconds; the global cap is a per-second budget.
+import os, threading
+
+RATE_GLOBAL = float(os.getenv("TG_RATE_GLOBAL", "30"))           # msg/s across all chats
+RATE_CHAT = float(os.getenv("TG_RATE_CHAT", "1"))                # msg/s per private chat
+RATE_GROUP = float(os.getenv("TG_RATE_GROUP_PER_MIN", "20")) / 60.0   # per group chat
+BURST_CHAT = int(os.getenv("TG_BURST_CHAT", "3"))
+MAX_CHAT_BUCKETS = 10000
+
+class TokenBucket:
+    def __init__(self, rate:float, burst:int=1):
+        self.interval = 1.0 / rate
+        self.tau = (max(1, burst) - 1) * self.interval
+        self.tat = 0.0   # theoretical arrival time of the next conforming send
+
+    def reserve(self, now:float)->float:
+        tat = max(self.tat, now)
+        send_at = max(now, tat - self.tau)
+        self.tat = tat + self.interval
+        return send_at
+
+    def defer(self, until:float):
+        """Push the bucket out (e.g. after a 429 retry_after): no burst credit before `until`, and the
+        retried message keeps the slot at `until` itself."""
+        self.tat = max(self.tat, until + self.tau + self.interval)
+
+class WindowBudget:
+    """At most `rate` sends per one-second window, booked at each send's own time. Unlike one
+    GCRA timeline, a send reserved far ahead (a throttled or 429-deferred chat) only uses up
+    its own window instead of pushing every other chat behind it."""
+    def __init__(self, rate:float):
+        self.cap = max(1, int(rate))
+        self.windows = {}   # int(second) -> sends booked
+        self.blocked_until = 0.0
+        self._prune_at = 64
+
+    def reserve(self, at:float, now:float)->float:
+        at = max(at, self.blocked_until)
+        w = int(at)
+        while self.windows.get(w, 0) >= self.cap:
+            w += 1
+        self.windows[w] = self.windows.get(w, 0) + 1
+        if len(self.windows) > self._prune_at:
+            self.windows = {k: v for k, v in self.windows.items() if k >= int(now)}
+            self._prune_at = max(64, 2 * len(self.windows))
+        return max(at, float(w))
+
+    def defer(self, until:float):
+        self.blocked_until = max(self.blocked_until, until)
+
+class RateLimiter:
+    def __init__(self, rate_global:float=RATE_GLOBAL, rate_chat:float=RATE_CHAT, rate_group:float=RATE_GROUP,
+                 burst_chat:int=BURST_CHAT):
+        self.global_budget = WindowBudget(rate_global)
+        self.rate_chat, self.rate_group, self.burst_chat = rate_chat, rate_group, burst_chat
+        self.chats = {}
+        self._lock = threading.Lock()
+
+    def _chat_bucket(self, chat_id, now):
+        b = self.chats.get(chat_id)
+        if b is None:
+            if len(self.chats) >= MAX_CHAT_BUCKETS:
+                # drop idle buckets (their next slot is already in the past)
+                self.chats = {k: v for k, v in self.chats.items() if v.tat > now}
+            group = isinstance(chat_id, int) and chat_id < 0 or str(chat_id).startswith("-")
+            b = TokenBucket(self.rate_group if group else self.rate_chat, self.burst_chat)
+            self.chats[chat_id] = b
+        return b
+
+    def reserve(self, chat_id, now:float)->float:
+        """Earliest monotonic time this chat may receive its next message."""
+        with self._lock:
+            at = self._chat_bucket(chat_id, now).reserve(now) if chat_id is not None else now
+            return self.global_budget.reserve(at, now)
+
+    def defer(self, chat_id, until:float, global_too:bool=False):
+        with self._lock:
+            if chat_id is not None:
+                self._chat_bucket(chat_id, until).defer(until)
+            if global_too:
+                self.global_budget.defer(until)
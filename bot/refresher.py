@@ -0,0 +1,83 @@
+# bot/refresher.py
+# Periodic background refresh (stale-while-revalidate): the current value keeps being served
+# while `fn` fetches a new one; failures back off exponentially with jitter.
+import os, time, random, threading
+from datetime import datetime
+from bot.log import get_logger
+
+log = get_logger("refresher")
+
+class Refresher:
+    """fn() -> item count. interval <= 0 disables the schedule (kick() still runs it once)."""
+
+    def __init__(self, name, fn, interval:float, backoff_base:float=5.0, backoff_max:float=600.0):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._stopped = False
+        self.failures = 0
+        self.state = {"last_success": None, "last_duration_ms": None, "items": None,
+                      "last_error": None, "failures": 0, "next_run_in": None, "running": False}
+
+    # lazily per process: threads started before gunicorn forks (--preload) do not survive
+    def start(self):
+        if self._pid == os.getpid() or self._stopped:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._wake = threading.Event()
+            threading.Thread(target=self._run, name=f"refresh-{self.name}", daemon=True).start()
+            self._pid = os.getpid()
+
+    def kick(self):
+        """Ask for a refresh now (non-blocking). Ignored while backing off after failures."""
+        self.start()
+        if self.failures == 0:
+            self._wake.set()
+
+    def _delay(self):
+        if self.failures == 0:
+            return self.interval if self.interval > 0 else None
+        cap = min(self.backoff_max, self.backoff_base * (2 ** (self.failures - 1)))
+        return cap * random.uniform(0.5, 1.0)
+
+    def run_once(self):
+        t0 = time.perf_counter()
+        self.state["running"] = True
+        try:
+            n = self.fn()
+            self.failures = 0
+            self.state.update(last_success=datetime.utcnow().isoformat(), items=n, last_error=None)
+        except Exception as e:
+            self.failures += 1
+            self.state["last_error"] = str(e)[:300]
+            log.warning("refresh failed", extra={"job": self.name, "error": str(e), "failures": self.failures})
+        finally:
+            self.state["running"] = False
+            self.state["last_duration_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+            self.state["failures"] = self.failures
+
+    def stop(self):
+        """End the schedule for good (tenant eviction); a run in progress finishes first."""
+        self._stopped = True
+        self._wake.set()
+
+    def _run(self):
+        delay = 0   # first refresh right after start
+        while True:
+            self.state["next_run_in"] = delay
+            self._wake.wait(timeout=delay)
+            self._wake.clear()
+            if self._stopped:
+                return
+            self.run_once()
+            delay = self._delay()
+
+    def stats(self)->dict:
+        return dict(self.state, interval=self.interval)
@@ -0,0 +1,57 @@
+# bot/render_cache.py
+# Ready-to-send JSON for screens that only change with language, ENV or catalog version
+# (welcome, menu, prices/about, support, category and product pages). A screen is built and
+# serialized once; each send only splices the chat_id (and message_id for edits) in front:
+#   b'{"chat_id":123,' + b'"text":"...","reply_markup":{...}}'
+# Keys carry the catalog version and the cache is cleared whenever a catalog is installed.
+import json, threading
+from collections import OrderedDict
+
+class Fragment:
+    __slots__ = ("text", "tail")
+
+    def __init__(self, text, keyboard=None, **extra):
+        self.text = text
+        body = {"text": text}
+        if keyboard:
+            body["reply_markup"] = keyboard
+        body.update(extra)
+        self.tail = json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")[1:]   # without "{"
+
+    def body(self, chat_id, message_id=None)->bytes:
+        head = b'{"chat_id":' + json.dumps(chat_id).encode() + b","
+        if message_id is not None:
+            head += b'"message_id":' + json.dumps(message_id).encode() + b","
+        return head + self.tail
+
+class RenderCache:
+    def __init__(self, max_entries:int=2048):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()   # key -> Fragment (LRU)
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key, build)->Fragment:
+        """build() -> (text, keyboard); only called on a miss."""
+        with self._lock:
+            f = self.entries.get(key)
+            if f is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return f
+        text, keyboard = build()
+        f = Fragment(text, keyboard)
+        with self._lock:
+            self.misses += 1
+            self.entries[key] = f
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return f
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+    def stats(self)->dict:
+        with self._lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
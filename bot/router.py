@@ -0,0 +1,123 @@
+# bot/router.py
+# Compiled intent router: every button label / keyword / category name is normalized once
+# and compiled into an Aho-Corasick automaton, so one pass over the incoming text finds
+# the highest-priority intent (same "needle in text" semantics as the old contains_any chain).
+import re, bisect
+
+_EMOJIS = ["🧩","🤖","💵","ℹ️","📞","🛟","🗂","✅","❌","🧺","📍","🧹"]
+_EMOJI_RE = re.compile("|".join(re.escape(e) for e in _EMOJIS))
+
+# normalize and strip emojis for matching
+def normalize_text(txt):
+    if not txt: return ""
+    return " ".join(_EMOJI_RE.sub("", str(txt)).split()).lower()
+
+class _AhoCorasick:
+    """Multi-pattern matcher; reports the lowest rank among all patterns found in the text."""
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.best = [None]   # (rank, payload) of the best pattern ending here, incl. via fail links
+
+    def add(self, pattern, rank, payload):
+        s = 0
+        for ch in pattern:
+            nxt = self.goto[s].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[s][ch] = nxt
+                self.goto.append({}); self.fail.append(0); self.best.append(None)
+            s = nxt
+        if self.best[s] is None or rank < self.best[s][0]:
+            self.best[s] = (rank, payload)
+
+    def build(self):
+        order = list(self.goto[0].values())
+        i = 0
+        while i < len(order):
+            s = order[i]; i += 1
+            for ch, nxt in self.goto[s].items():
+                order.append(nxt)
+                f = self.fail[s]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0) if self.goto[f].get(ch, 0) != nxt else 0
+                fb = self.best[self.fail[nxt]]
+                if fb is not None and (self.best[nxt] is None or fb[0] < self.best[nxt][0]):
+                    self.best[nxt] = fb
+        return self
+
+    def search(self, text):
+        goto, fail, best = self.goto, self.fail, self.best
+        s = 0; found = None
+        for ch in text:
+            while s and ch not in goto[s]:
+                s = fail[s]
+            s = goto[s].get(ch, 0)
+            b = best[s]
+            if b is not None and (found is None or b[0] < found[0]):
+                found = b
+        return found
+
+class IntentRouter:
+    """rules: [(intent, [needles...]), ...] in priority order.
+    Categories are matched at `category_rank` (position in `rules`), first sorted name wins,
+    using the old test: name == text or name in text or text in name."""
+
+    def __init__(self, rules, categories=(), category_rank:int=1):
+        self.categories = sorted(set(categories))
+        self.exact = {}
+        ac = _AhoCorasick()
+        rank = 0
+        for pos, (intent, needles) in enumerate(rules):
+            if pos == category_rank:
+                rank = self._add_categories(ac, rank)
+            for n in needles:
+                nn = normalize_text(n)
+                if not nn: continue   # emoji-only needles normalize to "" and must not match everything
+                ac.add(nn, rank, (intent, None))
+                self.exact[nn] = None
+            rank += 1
+        if category_rank >= len(rules):
+            rank = self._add_categories(ac, rank)
+        self.ac = ac.build()
+        # fast path for taps on a button: the full text is a known needle
+        for nn in self.exact:
+            self.exact[nn] = self.ac.search(nn)
+
+    def _add_categories(self, ac, rank):
+        self._cat_rank = rank
+        names = []
+        for i, c in enumerate(self.categories):
+            nc = normalize_text(c)
+            names.append(nc)
+            if nc:
+                # sub-rank by sorted position keeps "first category wins"
+                ac.add(nc, rank + i / (len(self.categories) + 1), ("category", c))
+        # "text in name": one C-level find over all names joined in sorted order
+        self._cat_blob = "\x00".join(names)
+        self._cat_starts = []
+        pos = 0
+        for nc in names:
+            self._cat_starts.append(pos); pos += len(nc) + 1
+        return rank + 1
+
+    def _category_containing(self, t):
+        if not t or "\x00" in t: return None
+        at = self._cat_blob.find(t)
+        if at < 0: return None
+        return bisect.bisect_right(self._cat_starts, at) - 1
+
+    def match(self, text):
+        """-> (intent, arg) or (None, None). arg is the category name for intent 'category'."""
+        t = normalize_text(text)
+        if not t:
+            return (None, None)
+        hit = self.exact.get(t) or self.ac.search(t)
+        idx = self._category_containing(t) if self.categories else None
+        if idx is not None:
+            r = self._cat_rank + idx / (len(self.categories) + 1)
+            if hit is None or r < hit[0]:
+                hit = (r, ("category", self.categories[idx]))
+        return hit[1] if hit else (None, None)
@@ -0,0 +1,227 @@
+# bot/search.py
+# Free-text product search over names and categories (FA / AR / EN).
+# Text is folded once (Arabic/Persian letter variants unified, diacritics and tatweel
+# stripped, Persian/Arabic digits -> ASCII, lower case) and split into words.
+#   words    -> inverted index word -> SKUs (name and category postings kept apart)
+#   trigrams -> vocabulary words, for typos and partial words ("choclate", "شکلا")
+# Queries touch the vocabulary, never the products, so a 50k-SKU catalog answers in ~ms.
+# update() diffs against the indexed catalog and only re-indexes changed products.
+import re, heapq, bisect, threading, unicodedata
+
+_FOLD = str.maketrans({
+    "\u064a": "\u06cc", "\u0649": "\u06cc", "\u0626": "\u06cc",   # ي ى ئ -> ی
+    "\u0643": "\u06a9",                                         # ك -> ک
+    "\u0629": "\u0647", "\u06c0": "\u0647", "\u0624": "\u0648",   # ة ۀ -> ه, ؤ -> و
+    "\u0623": "\u0627", "\u0625": "\u0627", "\u0622": "\u0627", "\u0671": "\u0627",   # أ إ آ ٱ -> ا
+    "\u200c": " ", "\u200d": "", "\u0640": "",                   # ZWNJ, ZWJ, tatweel
+    **{chr(0x06F0 + i): str(i) for i in range(10)},             # Persian digits
+    **{chr(0x0660 + i): str(i) for i in range(10)},             # Arabic-Indic digits
+})
+_MARKS = re.compile("[\u064b-\u065f\u0670\u06d6-\u06ed]")   # harakat, superscript alef, Quranic marks
+_WORD = re.compile(r"\w+")
+
+def fold(text)->str:
+    if not text: return ""
+    t = unicodedata.normalize("NFKC", str(text)).translate(_FOLD)
+    return _MARKS.sub("", t).lower()
+
+def words(text)->list:
+    return _WORD.findall(fold(text))
+
+def trigrams(word)->set:
+    w = f" {word} "
+    return {w[i:i + 3] for i in range(len(w) - 2)}
+
+# per query word: exact > prefix > fuzzy; name hits count more than category hits
+EXACT, PREFIX, FUZZY = 3.0, 2.0, 1.5
+CATEGORY_WEIGHT = 0.5
+FUZZY_MIN = 0.45        # trigram Jaccard similarity
+MAX_EXPANSIONS = 50     # vocabulary words tried per query word
+
+class SearchIndex:
+    def __init__(self):
+        self.docs = {}       # sku -> (name words, category words)
+        self.raw = {}        # sku -> (name, category) as indexed: unchanged products skip re-tokenizing
+        self.name_post = {}  # word -> set(sku)
+        self.cat_post = {}   # word -> set(sku)
+        self.titles = {}     # name words -> set(sku): exact-title hits without scanning candidates
+        self.grams = {}      # trigram -> set(word)
+        self.vocab = []      # sorted vocabulary (prefix search)
+        self._vocab_dirty = False
+        self.order = {}      # sku -> position in catalog (tie-break)
+        self.version = None
+        self._lock = threading.Lock()
+
+    # ---- indexing
+    def _add_word(self, post, other, w, sku):
+        s = post.get(w)
+        if s is None:
+            s = post[w] = set()
+            if w not in other:   # new to the vocabulary
+                for g in trigrams(w):
+                    self.grams.setdefault(g, set()).add(w)
+                self._vocab_dirty = True
+        s.add(sku)
+
+    def _drop_word(self, post, w, sku):
+        s = post.get(w)
+        if s is None: return
+        s.discard(sku)
+        if not s:
+            del post[w]
+            if w not in self.name_post and w not in self.cat_post:
+                for g in trigrams(w):
+                    gs = self.grams.get(g)
+                    if gs is not None:
+                        gs.discard(w)
+                        if not gs: del self.grams[g]
+                self._vocab_dirty = True
+
+    def _index(self, sku, name, category):
+        nw, cw = tuple(dict.fromkeys(words(name))), tuple(dict.fromkeys(words(category)))
+        self.docs[sku] = (nw, cw)
+        self.titles.setdefault(nw, set()).add(sku)
+        for w in nw: self._add_word(self.name_post, self.cat_post, w, sku)
+        for w in cw: self._add_word(self.cat_post, self.name_post, w, sku)
+
+    def _unindex(self, sku):
+        nw, cw = self.docs.pop(sku)
+        t = self.titles.get(nw)
+        if t is not None:
+            t.discard(sku)
+            if not t: del self.titles[nw]
+        for w in nw: self._drop_word(self.name_post, w, sku)
+        for w in cw: self._drop_word(self.cat_post, w, sku)
+
+    def update(self, catalog)->dict:
+        """Bring the index in line with `catalog` (iterable of product dicts, with .version)."""
+        with self._lock:
+            seen, added, changed = set(), 0, 0
+            order = {}
+            for pos, it in enumerate(catalog):
+                if not it.get("is_available", 1):
+                    continue
+                sku = it["sku"]
+                seen.add(sku)
+                order[sku] = pos
+                raw = (it.get("name"), it.get("category"))
+                if self.raw.get(sku) == raw:
+                    continue
+                self.raw[sku] = raw
+                old = self.docs.get(sku)
+                if old is not None:
+                    self._unindex(sku); changed += 1
+                else:
+                    added += 1
+                self._index(sku, it.get("name"), it.get("category"))
+            removed = [s for s in self.docs if s not in seen]
+            for s in removed:
+                self._unindex(s)
+                self.raw.pop(s, None)
+            self.order = order
+            if self._vocab_dirty:
+                self.vocab = sorted(set(self.name_post) | set(self.cat_post))
+                self._vocab_dirty = False
+            self.version = getattr(catalog, "version", None)
+            return {"added": added, "changed": changed, "removed": len(removed), "docs": len(self.docs)}
+
+    def ensure(self, catalog):
+        """Re-index lazily when the catalog version moved (first search after a sync)."""
+        if self.version != getattr(catalog, "version", None) or not self.docs and len(catalog):
+            self.update(catalog)
+
+    # ---- querying
+    def _expand(self, q):
+        """-> {vocab word: weight} for one query word."""
+        out = {}
+        if q in self.name_post or q in self.cat_post:
+            out[q] = EXACT
+        i = bisect.bisect_left(self.vocab, q)
+        n = 0
+        while i < len(self.vocab) and self.vocab[i].startswith(q) and n < MAX_EXPANSIONS:
+            w = self.vocab[i]
+            if w != q:
+                out[w] = max(out.get(w, 0), PREFIX); n += 1
+            i += 1
+        if len(q) >= 3 and len(out) < MAX_EXPANSIONS:
+            qg = trigrams(q)
+            counts = {}
+            for g in qg:
+                for w in self.grams.get(g, ()):
+                    counts[w] = counts.get(w, 0) + 1
+            for w, c in sorted(counts.items(), key=lambda x: -x[1])[:MAX_EXPANSIONS * 4]:
+                sim = c / (len(qg) + len(w) - c)   # Jaccard; a padded word has ~len(w) trigrams
+                if sim >= FUZZY_MIN and w not in out:
+                    out[w] = FUZZY * sim
+        return out
+
+    def search(self, query, limit:int=10)->list:
+        """-> SKUs ranked by (query words matched, score, phrase match, catalog order)."""
+        qs = list(dict.fromkeys(words(query)))
+        if not qs:
+            return []
+        with self._lock:   # update() mutates the postings in place
+            return self._rank(qs, limit)
+
+    def _best(self, q)->dict:
+        """sku -> best weight for one query word. Lowest weights first, so dict.update (C speed)
+        leaves every SKU with its highest weight."""
+        tiers = []
+        for w, wt in self._expand(q).items():
+            if w in self.name_post: tiers.append((wt, self.name_post[w]))
+            if w in self.cat_post: tiers.append((wt * CATEGORY_WEIGHT, self.cat_post[w]))
+        tiers.sort(key=lambda t: t[0])
+        best = {}
+        for wt, skus in tiers:
+            best.update(dict.fromkeys(skus, wt))
+        return best
+
+    def _phrase(self, qs, sku)->int:
+        """Tie-break on word order in the name: 0 the exact title, 1 the query words adjacent and
+        in order, 2 in order, 3 otherwise (or matched only by prefix / typo / category)."""
+        nw = self.docs[sku][0]
+        if nw == qs:
+            return 0
+        pos = [nw.index(q) if q in nw else -1 for q in qs]
+        if -1 in pos or pos != sorted(pos):
+            return 3
+        return 1 if pos[-1] - pos[0] == len(pos) - 1 else 2
+
+    def _rank(self, qs, limit):
+        qs = tuple(qs)
+        bests = [self._best(q) for q in qs]
+        # products matching every word outrank the rest; usually they alone fill the page
+        full = set(bests[0]).intersection(*bests[1:]) if len(bests) > 1 else bests[0]
+        if len(bests) == 1:
+            return self._top(qs, limit, bests[0])
+        if len(full) >= limit:
+            return self._top(qs, limit, {sku: sum(b[sku] for b in bests) for sku in full})
+        matched, score = {}, {}
+        for b in bests:
+            for sku, v in b.items():
+                matched[sku] = matched.get(sku, 0) + 1
+                score[sku] = score.get(sku, 0) + v
+        return self._top(qs, limit, score, matched)
+
+    def _top(self, qs, limit, score, matched=None):
+        """Best `limit` of score's SKUs. The phrase tie-break only reorders the page plus the
+        products tied with its last entry; a one-word query can only be reordered by exact titles."""
+        order, phrase = self.order, self._phrase
+        if matched is None:
+            top = heapq.nsmallest(limit, score, key=lambda s: (-score[s], order.get(s, 0)))
+            if not top: return top
+            if len(qs) == 1:
+                exact = self.titles.get(qs, ())
+                pool = set(top).union(s for s in exact if s in score)
+                phrase = lambda qs, s: s not in exact
+            else:
+                v = score[top[-1]]
+                pool = [s for s, x in score.items() if x >= v]
+            key = lambda s: (-score[s], phrase(qs, s), order.get(s, 0))
+        else:
+            top = heapq.nsmallest(limit, score, key=lambda s: (-matched[s], -score[s], order.get(s, 0)))
+            if not top: return top
+            m, v = matched[top[-1]], score[top[-1]]
+            pool = [s for s, x in score.items() if matched[s] > m or matched[s] == m and x >= v]
+            key = lambda s: (-matched[s], -score[s], phrase(qs, s), order.get(s, 0))
+        return heapq.nsmallest(limit, pool, key=key)
@@ -0,0 +1,132 @@
+# bot/sheet_sync.py
+# Incremental Google Sheet -> products sync.
+# - conditional GET (ETag / Last-Modified remembered in sync_state)
+# - CSV parsed as a stream straight off the socket
+# - rows staged in a TEMP table in chunks, diffed against products by content hash in SQL,
+#   and only the inserts / updates / deletes are applied, in one transaction
+# - the sheet's stock column is the owner's count (sheet_stock); live stock keeps the bot's
+#   holds and orders on top of it (storage/inventory.py rebase_stock)
+# Python memory stays bounded by the chunk size, not the sheet size.
+import io, csv, time, hashlib
+import requests
+from storage.inventory import rebase_stock
+
+CHUNK = 1000
+
+def init_sync_schema(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT)")
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(products)").fetchall()]
+    if "content_hash" not in cols:
+        conn.execute("ALTER TABLE products ADD COLUMN content_hash TEXT")
+    if "sheet_stock" not in cols:
+        conn.execute("ALTER TABLE products ADD COLUMN sheet_stock INTEGER")
+    if "stock_base_at" not in cols:
+        conn.execute("ALTER TABLE products ADD COLUMN stock_base_at REAL")
+    conn.commit()
+
+def _state_get(conn, key):
+    row = conn.execute("SELECT value FROM sync_state WHERE key=?", (key,)).fetchone()
+    return row[0] if row else None
+
+def catalog_generation(conn)->int:
+    """Bumped in the same transaction as every applied change; workers compare it to their copy."""
+    v = _state_get(conn, "catalog_gen")
+    return int(v) if v else 1
+
+def _safe_float(x, default=0.0):
+    try: return float(x)
+    except: return default
+
+def parse_row(row:dict):
+    """Sheet row -> product tuple (sku,category,name,price,stock,is_available,content_hash) or None."""
+    # expected keys: sku, category, item_name or name, price, is_available, stock
+    sku = (row.get("sku") or row.get("id") or "").strip()
+    cat = (row.get("category") or "").strip()
+    name = (row.get("item_name") or row.get("name") or "").strip()
+    price = _safe_float(row.get("price") or row.get("price_usd") or 0)
+    avail = str(row.get("is_available") or "1").strip().lower() in ["1","true","yes","available"]
+    try:
+        stock = int(row.get("stock")) if row.get("stock") not in (None,"") else -1
+    except:
+        stock = -1
+    if not name:
+        return None
+    item = (sku or name, cat or "Uncategorized", name, price, stock if stock >= 0 else -1, 1 if avail else 0)
+    h = hashlib.sha1("\x1f".join(map(str, item[1:])).encode("utf-8")).hexdigest()[:20]
+    return item + (h,)
+
+def apply_rows(conn, rows)->dict:
+    """Stage parsed tuples from the iterable `rows`, diff against products and apply the delta."""
+    conn.execute("""CREATE TEMP TABLE IF NOT EXISTS sheet_rows (
+        sku TEXT PRIMARY KEY, category TEXT, name TEXT, price REAL,
+        stock INTEGER, is_available INTEGER, content_hash TEXT)""")
+    conn.execute("DELETE FROM temp.sheet_rows")
+    batch = []
+    for it in rows:
+        batch.append(it)
+        if len(batch) >= CHUNK:
+            conn.executemany("INSERT OR REPLACE INTO temp.sheet_rows VALUES (?,?,?,?,?,?,?)", batch)
+            batch = []
+    if batch:
+        conn.executemany("INSERT OR REPLACE INTO temp.sheet_rows VALUES (?,?,?,?,?,?,?)", batch)
+    total = conn.execute("SELECT COUNT(*) FROM temp.sheet_rows").fetchone()[0]
+    conn.commit()   # staging only touched the temp db; the download never holds the write lock
+    if total == 0:
+        raise RuntimeError("sheet returned no products; refusing to wipe the catalog")
+    conn.execute("BEGIN IMMEDIATE")   # read-then-write: a deferred upgrade fails with "database is locked"
+    try:
+        added = conn.execute("""SELECT COUNT(*) FROM temp.sheet_rows s
+            WHERE NOT EXISTS (SELECT 1 FROM products p WHERE p.sku=s.sku)""").fetchone()[0]
+        changed = conn.execute("""SELECT COUNT(*) FROM temp.sheet_rows s JOIN products p ON p.sku=s.sku
+            WHERE p.content_hash IS NOT s.content_hash""").fetchone()[0]
+        removed = conn.execute("""SELECT COUNT(*) FROM products
+            WHERE sku NOT IN (SELECT sku FROM temp.sheet_rows)""").fetchone()[0]
+        if removed:
+            conn.execute("DELETE FROM products WHERE sku NOT IN (SELECT sku FROM temp.sheet_rows)")
+        if added or changed:
+            # only new / edited rows are written; a new sheet count restarts what orders are subtracted from
+            conn.execute("""DELETE FROM temp.sheet_rows WHERE EXISTS (SELECT 1 FROM products p
+                WHERE p.sku = temp.sheet_rows.sku AND p.content_hash IS temp.sheet_rows.content_hash)""")
+            conn.execute("""INSERT INTO products (sku,category,name,price,stock,is_available,content_hash,sheet_stock,stock_base_at)
+                SELECT sku,category,name,price,stock,is_available,content_hash,stock,? FROM temp.sheet_rows WHERE true
+                ON CONFLICT(sku) DO UPDATE SET category=excluded.category, name=excluded.name, price=excluded.price,
+                    is_available=excluded.is_available, content_hash=excluded.content_hash,
+                    stock_base_at=CASE WHEN products.sheet_stock IS excluded.sheet_stock THEN products.stock_base_at
+                                       ELSE excluded.stock_base_at END,
+                    sheet_stock=excluded.sheet_stock""", (time.time(),))
+            rebase_stock(conn, "SELECT sku FROM temp.sheet_rows")
+        if added or changed or removed:
+            conn.execute("INSERT OR REPLACE INTO sync_state (key,value) VALUES ('catalog_gen', ?)",
+                         (str(catalog_generation(conn) + 1),))
+        conn.execute("DELETE FROM temp.sheet_rows")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return {"total": total, "added": added, "changed": changed, "removed": removed}
+
+def sync_sheet(conn, url, force:bool=False, timeout:float=15)->dict:
+    t0 = time.perf_counter()
+    headers = {}
+    if not force:
+        etag = _state_get(conn, "sheet_etag")
+        lm = _state_get(conn, "sheet_last_modified")
+        if etag: headers["If-None-Match"] = etag
+        if lm: headers["If-Modified-Since"] = lm
+    with requests.get(url, headers=headers, stream=True, timeout=timeout) as r:
+        if r.status_code == 304:
+            return {"not_modified": True, "total": None, "added": 0, "changed": 0, "removed": 0,
+                    "elapsed": time.perf_counter() - t0}
+        r.raise_for_status()
+        r.raw.decode_content = True
+        r.raw.auto_close = False   # urllib3 2.x closes a Content-Length body at EOF, under the wrapper
+        text = io.TextIOWrapper(r.raw, encoding="utf-8-sig", newline="")
+        rows = (it for it in map(parse_row, csv.DictReader(text)) if it)
+        res = apply_rows(conn, rows)
+        etag, lm = r.headers.get("ETag"), r.headers.get("Last-Modified")
+    conn.executemany("INSERT OR REPLACE INTO sync_state (key,value) VALUES (?,?)",
+                     [("sheet_etag", etag or ""), ("sheet_last_modified", lm or "")])
+    conn.commit()
+    res["not_modified"] = False
+    res["elapsed"] = time.perf_counter() - t0
+    return res
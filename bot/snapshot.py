@@ -0,0 +1,191 @@
+# bot/snapshot.py
+# Catalog published as one versioned binary file that every gunicorn worker mmaps read-only:
+# the pages live once in the OS page cache instead of as a list of dicts per worker, and a
+# sync in one worker reaches the others as soon as they notice the new file.
+#
+# Layout (little-endian):
+#   header   MAGIC, version q, n_items I, n_cats I, rows/cats/sku-index/strings offsets 4×I
+#   rows     n_items × ROW: sku(off,len) name(off,len) cat_idx price stock available
+#            grouped by category (sorted), available rows first, then source order,
+#            so products_in() is one contiguous slice
+#   cats     n_cats × CAT: name(off,len) first_row n_available
+#   sku idx  n_items × u32 row numbers sorted by sku bytes (binary search)
+#   strings  UTF-8 string table
+# Files are written to a temp name and os.replace()d, so a mapped file is never modified;
+# readers still holding the previous catalog keep a consistent (old) view.
+import os, mmap, time, struct, threading
+from bot.log import get_logger
+
+log = get_logger("snapshot")
+
+MAGIC = b"JWCAT01\0"
+HEADER = struct.Struct("<8sqIIIIII")
+ROW = struct.Struct("<IIIIIdqB3x")
+CAT = struct.Struct("<IIII")
+U32 = struct.Struct("<I")
+
+def _strings():
+    buf, seen = bytearray(), {}
+    def add(s):
+        b = (s or "").encode("utf-8")
+        ref = seen.get(b)
+        if ref is None:
+            ref = seen[b] = (len(buf), len(b))
+            buf.extend(b)
+        return ref
+    return buf, add
+
+def write_snapshot(path:str, items, version:int)->int:
+    """items: iterable of dicts {sku,category,name,price,stock,is_available}. Returns item count."""
+    items = list(items)
+    cats = sorted({it.get("category") or "Uncategorized" for it in items})
+    cat_idx = {c: i for i, c in enumerate(cats)}
+    order = sorted(range(len(items)), key=lambda i: (cat_idx[items[i].get("category") or "Uncategorized"],
+                                                     0 if items[i].get("is_available", 1) else 1, i))
+    strings, add = _strings()
+    rows, cat_first, cat_avail = bytearray(), [None] * len(cats), [0] * len(cats)
+    skus = []
+    for r, i in enumerate(order):
+        it = items[i]
+        ci = cat_idx[it.get("category") or "Uncategorized"]
+        if cat_first[ci] is None: cat_first[ci] = r
+        avail = 1 if it.get("is_available", 1) else 0
+        cat_avail[ci] += avail
+        so, sl = add(str(it["sku"]))
+        no, nl = add(it.get("name"))
+        stock = it.get("stock")
+        rows += ROW.pack(so, sl, no, nl, ci, float(it.get("price") or 0), int(stock if stock is not None else -1), avail)
+        skus.append((str(it["sku"]).encode("utf-8"), r))
+    cat_tab = bytearray()
+    for ci, c in enumerate(cats):
+        co, cl = add(c)
+        cat_tab += CAT.pack(co, cl, cat_first[ci] or 0, cat_avail[ci])
+    sku_idx = b"".join(U32.pack(r) for _, r in sorted(skus))
+    rows_off = HEADER.size
+    cats_off = rows_off + len(rows)
+    idx_off = cats_off + len(cat_tab)
+    str_off = idx_off + len(sku_idx)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, version, len(items), len(cats), rows_off, cats_off, idx_off, str_off))
+        f.write(rows); f.write(cat_tab); f.write(sku_idx); f.write(strings)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return len(items)
+
+class _Products:
+    """Lazy view of one category's available rows (len / index / slice / iterate)."""
+    __slots__ = ("snap", "start", "n")
+
+    def __init__(self, snap, start, n):
+        self.snap, self.start, self.n = snap, start, n
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.snap._row(self.start + j) for j in range(*i.indices(self.n))]
+        if i < 0: i += self.n
+        if not 0 <= i < self.n: raise IndexError(i)
+        return self.snap._row(self.start + i)
+
+    def __iter__(self):
+        return (self.snap._row(self.start + j) for j in range(self.n))
+
+class SnapshotCatalog:
+    """Same read interface as bot.catalog.Catalog, backed by a read-only mmap. Products come
+    back as fresh dicts; set_stock() keeps a small per-process overlay for live stock counts."""
+
+    def __init__(self, path:str):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.version, self.n, n_cats, self.rows_off, cats_off, self.idx_off, self.str_off = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a catalog snapshot")
+        self.stock = {}
+        self.categories, self._cats = [], {}
+        for ci in range(n_cats):
+            no, nl, first, n_avail = CAT.unpack_from(self.mm, cats_off + ci * CAT.size)
+            name = self._str(no, nl)
+            self.categories.append(name)
+            self._cats[name] = (first, n_avail)
+
+    def _str(self, off, ln):
+        return self.mm[self.str_off + off:self.str_off + off + ln].decode("utf-8")
+
+    def _row(self, r):
+        so, sl, no, nl, ci, price, stock, avail = ROW.unpack_from(self.mm, self.rows_off + r * ROW.size)
+        sku = self._str(so, sl)
+        return {"sku": sku, "category": self.categories[ci], "name": self._str(no, nl), "price": price,
+                "stock": self.stock.get(sku, stock), "is_available": avail}
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        return (self._row(r) for r in range(self.n))
+
+    def _find(self, sku)->int:
+        key = str(sku).encode("utf-8")
+        lo, hi = 0, self.n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            r = U32.unpack_from(self.mm, self.idx_off + mid * 4)[0]
+            so, sl = struct.unpack_from("<II", self.mm, self.rows_off + r * ROW.size)
+            k = self.mm[self.str_off + so:self.str_off + so + sl]
+            if k < key: lo = mid + 1
+            elif k > key: hi = mid
+            else: return r
+        return -1
+
+    def get(self, sku):
+        r = self._find(sku) if sku is not None else -1
+        return self._row(r) if r >= 0 else None
+
+    def products_in(self, category):
+        first, n = self._cats.get(category, (0, 0))
+        return _Products(self, first, n)
+
+    def set_stock(self, sku, stock):
+        self.stock[sku] = stock
+
+class SnapshotStore:
+    """Publishes snapshots and hands out the current mapping; a changed file (new inode) is
+    remapped on the next current() after at most `check_every` seconds."""
+
+    def __init__(self, path:str, check_every:float=1.0):
+        self.path = path
+        self.check_every = check_every
+        self._snap = None
+        self._sig = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def publish(self, items, version:int)->int:
+        d = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(d, exist_ok=True)
+        n = write_snapshot(self.path, items, version)
+        self.current(force=True)
+        return n
+
+    def current(self, force:bool=False)->SnapshotCatalog|None:
+        now = time.monotonic()
+        if not force and now - self._checked < self.check_every:
+            return self._snap
+        with self._lock:
+            self._checked = now
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                return self._snap
+            sig = (st.st_ino, st.st_mtime_ns, st.st_size)
+            if sig != self._sig:
+                try:
+                    self._snap = SnapshotCatalog(self.path)
+                    self._sig = sig
+                except (OSError, ValueError, struct.error) as e:
+                    # half-visible or foreign file: keep serving the mapping we have
+                    log.warning("snapshot map failed", extra={"error": str(e)})
+            return self._snap
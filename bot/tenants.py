@@ -0,0 +1,230 @@
+# bot/tenants.py
+# Multi-tenant mode: many shops (bot token, plan, sheet, admins, texts) served by one process.
+# A shop is app.Shop: config, SQLite files, outbox, sessions, catalog, caches and background
+# jobs, passed explicitly to every handler. Each tenant's Shop is built from a tenant-scoped
+# environment dict (tenant_environ), never from os.environ itself:
+#   - shop settings (SHOP_KEYS / SHOP_PREFIXES) never leak in from the process environment
+#   - DATA_DB_FILE / DB_PATH default to data/tenants/<name>/ (one SQLite file set per shop)
+#   - tuning knobs (OUTBOX_*, UPDATE_WORKERS, ...) are inherited unless the config overrides them
+# Tenants load on their first update and are evicted when idle or when more than
+# `max_loaded` are resident (LRU): shop.close() stops their threads and flushes their state.
+#
+# Config: TENANTS_CONFIG=path/to/tenants.json
+#   {"defaults": {"PLAN": "silver"}, "tenants": {"shop1": {"TELEGRAM_BOT_TOKEN": "...", "ADMINS": "1,2", ...}}}
+# or TENANTS_CONFIG=db: table `tenants` (name, config JSON, enabled) in the main DB; a row named
+# "*" holds the defaults. Keys are the usual env names; "enabled": false disables a tenant.
+import os, re, json, time, threading
+from collections import OrderedDict
+from bot.log import get_logger
+
+log = get_logger("tenants")
+
+TENANTS_DIR = os.getenv("TENANTS_DIR", os.path.join("data", "tenants"))
+TENANT_IDLE_SEC = float(os.getenv("TENANT_IDLE_SEC", "900"))
+TENANTS_MAX_LOADED = int(os.getenv("TENANTS_MAX_LOADED", "50"))
+TENANT_CLOSE_GRACE = float(os.getenv("TENANT_CLOSE_GRACE_SEC", "5"))   # let in-flight updates finish
+
+SHOP_KEYS = {"TELEGRAM_BOT_TOKEN", "ADMINS", "PLAN", "SHEET_URL", "WEBHOOK_SECRET", "SHOW_PRODUCTS",
+             "BRAND_NAME", "DEFAULT_LANG", "DATA_DB_FILE", "SESSION_DB_FILE", "CATALOG_SNAPSHOT_FILE",
+             "DB_PATH", "METRICS_TOKEN", "ADMIN_TOKEN", "PRODUCTS", "DELIVERY_ZONES"}
+SHOP_PREFIXES = ("PRODUCTS_", "WELCOME_", "ABOUT", "PRICES", "SUPPORT_", "CONTENT_", "APP_", "BTN_PRODUCTS_",
+                 "CATALOG_TITLE_", "TENANT")
+# many mostly idle shops: small thread pools unless configured otherwise
+TENANT_BASE = {"OUTBOX_WORKERS": "1", "UPDATE_WORKERS": "1"}
+NAME_RE = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+def tenant_environ(name:str, cfg:dict, base_dir:str=TENANTS_DIR)->dict:
+    env = dict(TENANT_BASE)
+    env.update((k, v) for k, v in os.environ.items() if k not in SHOP_KEYS and not k.startswith(SHOP_PREFIXES))
+    home = os.path.join(base_dir, name)
+    env.update(DATA_DB_FILE=os.path.join(home, "data.sqlite"), DB_PATH=os.path.join(home, "users.sqlite3"))
+    env.update((str(k), "" if v is None else str(v)) for k, v in cfg.items() if k != "enabled")
+    return env
+
+class TenantConfigs:
+    """name -> settings (defaults merged in) from a JSON file or the `tenants` table.
+    Re-read at most every `check_every` seconds, so edits apply without a restart."""
+
+    def __init__(self, source:str, conn_fn=None, check_every:float=5.0):
+        self.source = source
+        self.conn_fn = conn_fn
+        self.check_every = check_every
+        self._configs = {}
+        self._sig = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        if source == "db":
+            with conn_fn() as c:
+                c.execute("""CREATE TABLE IF NOT EXISTS tenants (
+                    name TEXT PRIMARY KEY,
+                    config TEXT NOT NULL DEFAULT '{}',
+                    enabled INTEGER NOT NULL DEFAULT 1)""")
+
+    def _read(self):
+        if self.source == "db":
+            rows = self.conn_fn().execute("SELECT name, config, enabled FROM tenants").fetchall()
+            raw = {r[0]: dict(json.loads(r[1] or "{}"), enabled=bool(r[2])) for r in rows}
+            defaults = raw.pop("*", {})
+        else:
+            st = os.stat(self.source)
+            sig = (st.st_ino, st.st_mtime_ns, st.st_size)
+            if sig == self._sig:
+                return None
+            with open(self.source, encoding="utf-8") as f:
+                doc = json.load(f)
+            self._sig = sig
+            raw, defaults = doc.get("tenants") or {}, doc.get("defaults") or {}
+        defaults = {k: v for k, v in defaults.items() if k != "enabled"}
+        return {n: dict(defaults, **c) for n, c in raw.items() if c.get("enabled", True) is not False}
+
+    def all(self)->dict:
+        now = time.monotonic()
+        if now - self._checked >= self.check_every:
+            with self._lock:
+                if now - self._checked >= self.check_every:
+                    try:
+                        fresh = self._read()
+                        if fresh is not None:
+                            self._configs = fresh
+                    except (OSError, ValueError) as e:
+                        # keep serving the last good config
+                        log.warning("tenant config read failed", extra={"source": self.source, "error": str(e)})
+                    # only now: concurrent first callers wait for the read instead of seeing no tenants
+                    self._checked = now
+        return self._configs
+
+    def get(self, name):
+        return self.all().get(name)
+
+class _Tenant:
+    __slots__ = ("name", "cfg", "shop", "loaded_at", "last_used", "updates")
+
+    def __init__(self, name, cfg, shop):
+        self.name, self.cfg, self.shop = name, cfg, shop
+        self.loaded_at = self.last_used = time.monotonic()
+        self.updates = 0
+
+class _Loading:
+    """Once-guard for a tenant being built: later callers wait on `done` instead of building it too."""
+    __slots__ = ("done", "tenant")
+
+    def __init__(self):
+        self.done, self.tenant = threading.Event(), None
+
+class TenantRegistry:
+    """factory(name, env) -> shop (anything with .close()), built on a tenant's first update."""
+
+    def __init__(self, configs:TenantConfigs, factory, idle_sec:float=TENANT_IDLE_SEC, max_loaded:int=TENANTS_MAX_LOADED,
+                 base_dir:str=TENANTS_DIR, sweep_every:float=30.0):
+        self.configs = configs
+        self.factory = factory
+        self.idle_sec = idle_sec
+        self.max_loaded = max(1, max_loaded)
+        self.base_dir = base_dir
+        self.sweep_every = sweep_every
+        self.loaded = OrderedDict()   # name -> _Tenant, least recently used first
+        self.loading = {}             # name -> _Loading while its shop is being built
+        self._lock = threading.Lock()
+        self._swept = time.monotonic()
+        self.counters = {"loads": 0, "load_errors": 0, "evictions": 0}
+
+    def get(self, name:str):
+        """-> the tenant's shop (loaded on demand), or None for unknown / disabled names."""
+        if not NAME_RE.fullmatch(name or ""):
+            return None
+        cfg = self.configs.get(name)
+        with self._lock:
+            t = self.loaded.get(name)
+            if t is not None and t.cfg != cfg:
+                self._evict(name, "config")   # edited or removed: next update loads the new config
+                t = None
+            if cfg is None:
+                return None
+            if t is not None:
+                return self._touch(t).shop
+            pending = self.loading.get(name)
+            first = pending is None
+            if first:
+                pending = self.loading[name] = _Loading()
+        if not first:
+            # a burst of first updates builds the shop once; the others wait for that build only
+            pending.done.wait()
+            return pending.tenant.shop if pending.tenant else None
+        # built outside the registry lock: a slow shop start does not stall the other tenants
+        t = self._load(name, cfg)
+        with self._lock:
+            self.loading.pop(name, None)
+            self.counters["loads" if t else "load_errors"] += 1
+            if t is not None:
+                self.loaded[name] = t
+                self._touch(t)
+        pending.tenant = t
+        pending.done.set()
+        return t.shop if t else None
+
+    def _touch(self, t):
+        self.loaded.move_to_end(t.name)
+        t.last_used = time.monotonic()
+        t.updates += 1
+        self._maybe_sweep(t.last_used)
+        return t
+
+    def _load(self, name, cfg):
+        t0 = time.perf_counter()
+        try:
+            shop = self.factory(name, tenant_environ(name, cfg, self.base_dir))
+        except Exception:
+            log.exception("tenant load failed", extra={"tenant": name})
+            return None
+        log.info("tenant loaded", extra={"tenant": name, "ms": round((time.perf_counter() - t0) * 1000, 1),
+                                         "loaded": len(self.loaded) + 1})
+        return _Tenant(name, cfg, shop)
+
+    def _evict(self, name, reason):
+        t = self.loaded.pop(name, None)
+        if t is None:
+            return
+        self.counters["evictions"] += 1
+        log.info("tenant evicted", extra={"tenant": name, "reason": reason, "updates": t.updates})
+        threading.Thread(target=self._close, args=(t,), name=f"tenant-close-{name}", daemon=True).start()
+
+    def _close(self, t):
+        time.sleep(TENANT_CLOSE_GRACE)
+        try:
+            t.shop.close()
+        except Exception:
+            log.exception("tenant close failed", extra={"tenant": t.name})
+
+    def _maybe_sweep(self, now):
+        while len(self.loaded) > self.max_loaded:
+            self._evict(next(iter(self.loaded)), "lru")
+        if now - self._swept >= self.sweep_every:
+            self._sweep_idle(now)
+
+    def _sweep_idle(self, now):
+        self._swept = now
+        for name in [n for n, t in self.loaded.items() if now - t.last_used > self.idle_sec]:
+            self._evict(name, "idle")
+
+    def sweep(self)->int:
+        """Evict idle tenants (also run periodically, so a silent process still frees them)."""
+        with self._lock:
+            self._sweep_idle(time.monotonic())
+            return len(self.loaded)
+
+    def close_all(self):
+        with self._lock:
+            tenants = list(self.loaded.values())
+            self.loaded.clear()
+        for t in tenants:
+            t.shop.close()
+
+    def shops(self)->list:
+        with self._lock:
+            return [t.shop for t in self.loaded.values()]
+
+    def stats(self)->dict:
+        now = time.monotonic()
+        with self._lock:
+            loaded = {n: {"idle_sec": round(now - t.last_used, 1), "updates": t.updates} for n, t in self.loaded.items()}
+        return dict(self.counters, configured=len(self.configs.all()), loaded=loaded)
@@ -0,0 +1,185 @@
+# bot/zones.py
+# Delivery zones: polygons or radius areas, each with a delivery fee and a minimum order.
+# A shared location resolves through a uniform lat/lon grid: every cell lists the zones that
+# touch it, in priority order (file order: put inner / cheaper zones first), flagged "full"
+# when the zone covers the whole cell. Most lookups are one dict hit plus, at zone borders, a
+# point-in-polygon or haversine test on one or two candidates.
+#
+# Sources (DELIVERY_ZONES): a local .json / .geojson / .csv file or an http(s) URL (e.g. a
+# Google Sheet published as CSV).
+#   JSON    [{"name": "Center", "fee": 1.5, "min_order": 10, "polygon": [[lat, lon], ...]},
+#            {"name": "North", "fee": 3, "center": [lat, lon], "radius_km": 6}]
+#   GeoJSON FeatureCollection of Polygon / Point features (properties: name, fee, min_order,
+#           radius_km for points); coordinates are [lon, lat] as usual
+#   CSV     name,fee,min_order,lat,lon,radius_km,polygon   polygon = "lat lon; lat lon; ..."
+import io, csv, json, math
+
+CELL_DEG = 0.01          # ~1.1 km of latitude
+MAX_CELLS = 200000       # per zone; bigger zones get a coarser grid
+EARTH_KM = 6371.0088
+
+def _f(x, default=0.0):
+    try: return float(x)
+    except (TypeError, ValueError): return default
+
+def haversine_km(lat1, lon1, lat2, lon2)->float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((p2 - p1) / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_KM * math.asin(min(1.0, math.sqrt(a)))
+
+class Zone:
+    __slots__ = ("name", "fee", "min_order", "poly", "center", "radius_km", "bbox")
+
+    def __init__(self, name, fee=0.0, min_order=0.0, poly=None, center=None, radius_km=0.0):
+        self.name, self.fee, self.min_order = name, float(fee), float(min_order)
+        self.poly = [(float(a), float(b)) for a, b in poly] if poly else None
+        self.center = (float(center[0]), float(center[1])) if center else None
+        self.radius_km = float(radius_km)
+        if self.poly:
+            if len(self.poly) < 3:
+                raise ValueError(f"zone {name!r}: polygon needs 3+ points")
+            lats, lons = [p[0] for p in self.poly], [p[1] for p in self.poly]
+            self.bbox = (min(lats), min(lons), max(lats), max(lons))
+        elif self.center and self.radius_km > 0:
+            dlat = math.degrees(self.radius_km / EARTH_KM)
+            dlon = dlat / max(math.cos(math.radians(self.center[0])), 1e-6)
+            self.bbox = (self.center[0] - dlat, self.center[1] - dlon, self.center[0] + dlat, self.center[1] + dlon)
+        else:
+            raise ValueError(f"zone {name!r}: needs a polygon or center + radius_km")
+
+    def contains(self, lat, lon)->bool:
+        if self.poly is None:
+            return haversine_km(lat, lon, *self.center) <= self.radius_km
+        inside, pts = False, self.poly
+        j = len(pts) - 1
+        for i in range(len(pts)):   # ray casting, lat as y / lon as x
+            yi, xi = pts[i]; yj, xj = pts[j]
+            if (yi > lat) != (yj > lat) and lon < (xj - xi) * (lat - yi) / (yj - yi) + xi:
+                inside = not inside
+            j = i
+        return inside
+
+    def _cover(self, lat0, lon0, lat1, lon1):
+        """Cell [lat0,lat1]x[lon0,lon1] -> "full", "part" or None (disjoint)."""
+        if self.poly is None:
+            c = self.center
+            near = haversine_km(min(max(c[0], lat0), lat1), min(max(c[1], lon0), lon1), *c)
+            if near > self.radius_km:
+                return None
+            far = max(haversine_km(a, b, *c) for a in (lat0, lat1) for b in (lon0, lon1))
+            return "full" if far <= self.radius_km else "part"
+        pts = self.poly
+        for i in range(len(pts)):
+            if _seg_hits_rect(pts[i - 1], pts[i], lat0, lon0, lat1, lon1):
+                return "part"
+        # no edge crosses the cell: it is entirely inside or entirely outside
+        return "full" if self.contains((lat0 + lat1) / 2, (lon0 + lon1) / 2) else None
+
+def _seg_hits_rect(p, q, lat0, lon0, lat1, lon1)->bool:
+    """Liang-Barsky clip of segment p-q against the rectangle."""
+    t0, t1 = 0.0, 1.0
+    dy, dx = q[0] - p[0], q[1] - p[1]
+    for d, lo, hi, v in ((dy, lat0, lat1, p[0]), (dx, lon0, lon1, p[1])):
+        if d == 0:
+            if v < lo or v > hi:
+                return False
+            continue
+        a, b = (lo - v) / d, (hi - v) / d
+        if a > b: a, b = b, a
+        t0, t1 = max(t0, a), min(t1, b)
+        if t0 > t1:
+            return False
+    return True
+
+class ZoneIndex:
+    def __init__(self, zones=(), cell_deg:float=CELL_DEG):
+        self.zones = list(zones)
+        cell = cell_deg
+        for z in self.zones:   # keep the cell count of the largest zone bounded
+            la0, lo0, la1, lo1 = z.bbox
+            while ((la1 - la0) / cell + 1) * ((lo1 - lo0) / cell + 1) > MAX_CELLS:
+                cell *= 2
+        self.cell = cell
+        grid = {}
+        for z in self.zones:
+            la0, lo0, la1, lo1 = z.bbox
+            for gy in range(math.floor(la0 / cell), math.floor(la1 / cell) + 1):
+                for gx in range(math.floor(lo0 / cell), math.floor(lo1 / cell) + 1):
+                    cover = z._cover(gy * cell, gx * cell, (gy + 1) * cell, (gx + 1) * cell)
+                    if cover:
+                        grid.setdefault((gy, gx), []).append((z, cover == "full"))
+        # a full cover hides every lower-priority zone in that cell
+        for key, lst in grid.items():
+            for i, (_, full) in enumerate(lst):
+                if full:
+                    del lst[i + 1:]
+                    break
+            grid[key] = tuple(lst)
+        self.grid = grid
+
+    def __len__(self):
+        return len(self.zones)
+
+    def locate(self, lat, lon)->Zone|None:
+        """First zone (priority order) containing the point, or None when nobody delivers there."""
+        for z, full in self.grid.get((math.floor(lat / self.cell), math.floor(lon / self.cell)), ()):
+            if full or z.contains(lat, lon):
+                return z
+        return None
+
+    def stats(self)->dict:
+        return {"zones": len(self.zones), "cells": len(self.grid), "cell_deg": self.cell}
+
+# ---- loading
+def _from_dict(d):
+    if d.get("polygon"):
+        return Zone(d.get("name") or "zone", _f(d.get("fee")), _f(d.get("min_order")), poly=d["polygon"])
+    center = d.get("center") or (d.get("lat"), d.get("lon"))
+    return Zone(d.get("name") or "zone", _f(d.get("fee")), _f(d.get("min_order")),
+                center=center if all(v not in (None, "") for v in center) else None, radius_km=_f(d.get("radius_km")))
+
+def _from_geojson(doc):
+    out = []
+    for ft in doc.get("features") or []:
+        g, p = ft.get("geometry") or {}, dict(ft.get("properties") or {})
+        if g.get("type") == "Polygon":
+            p["polygon"] = [(lat, lon) for lon, lat, *_ in g["coordinates"][0]]   # outer ring
+        elif g.get("type") == "Point":
+            p["center"] = (g["coordinates"][1], g["coordinates"][0])
+        else:
+            continue
+        out.append(_from_dict(p))
+    return out
+
+def _from_csv(text):
+    out = []
+    for row in csv.DictReader(io.StringIO(text)):
+        row = {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+        if not row.get("name"):
+            continue
+        if row.get("polygon"):
+            row["polygon"] = [tuple(map(float, pt.replace(",", " ").split()[:2])) for pt in row["polygon"].split(";") if pt.strip()]
+        out.append(_from_dict(row))
+    return out
+
+def parse_zones(text:str, kind:str="json")->list:
+    if kind == "csv":
+        return _from_csv(text)
+    doc = json.loads(text)
+    if isinstance(doc, dict) and doc.get("type") == "FeatureCollection":
+        return _from_geojson(doc)
+    return [_from_dict(d) for d in (doc.get("zones") if isinstance(doc, dict) else doc)]
+
+def load_zones(source:str, timeout:float=20)->list:
+    """Zones from a file path or an http(s) URL (CSV unless the name ends in .json / .geojson)."""
+    if source.startswith(("http://", "https://")):
+        import requests   # only URL sources need it
+        r = requests.get(source, timeout=timeout)
+        r.raise_for_status()
+        r.encoding = r.encoding or "utf-8"
+        path, text = source.split("?")[0], r.text
+    else:
+        path = source
+        with open(source, encoding="utf-8") as f:
+            text = f.read()
+    return parse_zones(text, "json" if path.lower().endswith((".json", ".geojson")) else "csv")
@@ -0,0 +1,90 @@
+# storage/broadcasts.py
+# Broadcast jobs, checkpointed in the users DB so a restart resumes where it stopped.
+# A job is run by whichever process holds its lease; a dead owner's lease simply expires.
+# conn_fn: the shop's pooled connection getter (UserStore.conn).
+import time
+
+def init_broadcasts(conn_fn):
+    with conn_fn() as c:
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS broadcasts(
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            text        TEXT,
+            lang        TEXT,
+            source      TEXT,
+            status      TEXT DEFAULT 'running',   -- running | done | cancelled
+            cursor      INTEGER DEFAULT 0,        -- last chat_id fully processed (keyset)
+            total       INTEGER DEFAULT 0,
+            sent        INTEGER DEFAULT 0,
+            failed      INTEGER DEFAULT 0,
+            blocked     INTEGER DEFAULT 0,
+            created_by  TEXT,
+            started_at  REAL,
+            updated_at  REAL,
+            finished_at REAL,
+            lease_owner TEXT,
+            lease_until REAL
+        )
+        """)
+        c.execute("CREATE INDEX IF NOT EXISTS idx_broadcasts_status ON broadcasts(status)")
+
+def _row(c, sql, args=()):
+    cur = c.execute(sql, args)
+    r = cur.fetchone()
+    return dict(zip([d[0] for d in cur.description], r)) if r else None
+
+def create_broadcast(conn_fn, text:str, lang:str|None, source:str|None, created_by:str, total:int)->int:
+    now = time.time()
+    with conn_fn() as c:
+        cur = c.execute("""INSERT INTO broadcasts(text,lang,source,total,created_by,started_at,updated_at)
+                           VALUES(?,?,?,?,?,?,?)""", (text, lang, source, total, created_by, now, now))
+        return cur.lastrowid
+
+def claim_broadcast(conn_fn, owner:str, lease_sec:float)->dict|None:
+    """Take (or keep) the lease on the oldest running job."""
+    now = time.time()
+    c = conn_fn()
+    c.execute("BEGIN IMMEDIATE")
+    with c:
+        c.execute("""UPDATE broadcasts SET lease_owner=?, lease_until=?
+                     WHERE id = (SELECT id FROM broadcasts WHERE status='running'
+                                 AND (lease_until IS NULL OR lease_until < ? OR lease_owner = ?)
+                                 ORDER BY id LIMIT 1)""", (owner, now + lease_sec, now, owner))
+        return _row(c, "SELECT * FROM broadcasts WHERE status='running' AND lease_owner=? ORDER BY id LIMIT 1", (owner,))
+
+def checkpoint_broadcast(conn_fn, job_id:int, owner:str, cursor:int, sent:int, failed:int, blocked:int, lease_sec:float)->str:
+    """Add this page's counts, advance the cursor, renew the lease. Returns the current status."""
+    now = time.time()
+    with conn_fn() as c:
+        c.execute("""UPDATE broadcasts SET cursor=?, sent=sent+?, failed=failed+?, blocked=blocked+?,
+                     updated_at=?, lease_until=? WHERE id=? AND lease_owner=?""",
+                  (cursor, sent, failed, blocked, now, now + lease_sec, job_id, owner))
+        r = c.execute("SELECT status FROM broadcasts WHERE id=?", (job_id,)).fetchone()
+    return r[0] if r else "cancelled"
+
+def broadcast_status(conn_fn, job_id:int)->str|None:
+    with conn_fn() as c:
+        r = c.execute("SELECT status FROM broadcasts WHERE id=?", (job_id,)).fetchone()
+    return r[0] if r else None
+
+def finish_broadcast(conn_fn, job_id:int, status:str="done"):
+    now = time.time()
+    with conn_fn() as c:
+        c.execute("UPDATE broadcasts SET status=?, finished_at=?, updated_at=?, lease_until=NULL WHERE id=? AND status='running'",
+                  (status, now, now, job_id))
+
+def cancel_broadcast(conn_fn, job_id:int|None=None)->int|None:
+    """Cancel job `job_id` (default: the latest) if it is still running. Returns its id or None."""
+    job = get_broadcast(conn_fn, job_id) if job_id else latest_broadcast(conn_fn)
+    if not job or job["status"] != "running":
+        return None
+    finish_broadcast(conn_fn, job["id"], "cancelled")
+    return job["id"]
+
+def latest_broadcast(conn_fn)->dict|None:
+    with conn_fn() as c:
+        return _row(c, "SELECT * FROM broadcasts ORDER BY id DESC LIMIT 1")
+
+def get_broadcast(conn_fn, job_id:int)->dict|None:
+    with conn_fn() as c:
+        return _row(c, "SELECT * FROM broadcasts WHERE id=?", (job_id,))
@@ -1,125 +1,247 @@
 # storage/db.py
-import os
-import sqlite3
+import os, threading
+from datetime import datetime
+from storage.pool import manager, release
+from storage.journal import make_journal
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DEFAULT_DB = os.path.join(BASE_DIR, "data", "jawab.sqlite3")
 DB_PATH = os.environ.get("DB_PATH", DEFAULT_DB)
 DEFAULT_LANG = (os.environ.get("DEFAULT_LANG") or "FA").upper()
+# messages journal: group commit every N ms or M rows; full ring -> "drop" or "block"
+MSG_FLUSH_MS = int(os.environ.get("MSG_FLUSH_MS", "200"))
+MSG_BATCH_ROWS = int(os.environ.get("MSG_BATCH_ROWS", "500"))
+MSG_BUFFER = int(os.environ.get("MSG_BUFFER", "10000"))
+MSG_POLICY = (os.environ.get("MSG_POLICY") or "drop").lower()
+
+class UserStore:
+    """Users, messages log and broadcast jobs of one shop (one SQLite file)."""
+
+    def __init__(self, path:str=DB_PATH, default_lang:str=DEFAULT_LANG):
+        self.path = path
+        self.default_lang = (default_lang or "FA").upper()
+        self._pool = manager(path)
+        # messages: buffered in the journal, group-committed by its flusher thread
+        self.messages = make_journal(self.conn, "INSERT INTO messages(chat_id, text, direction, ts) VALUES(?,?,?,?)",
+                                     maxlen=MSG_BUFFER, flush_ms=MSG_FLUSH_MS, batch_rows=MSG_BATCH_ROWS, policy=MSG_POLICY)
+        self.init_db()
+
+    # pooled: one tuned connection per thread/process; `with conn() as c` still commits/rolls back
+    def conn(self):
+        return self._pool.get()
+
+    def close(self):
+        """Flush the journal and forget this file's pooled connections (evicted tenant)."""
+        self.messages.close()
+        release(self.path)
+
+    def init_db(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self.conn() as c:
+            # users
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS users(
+                chat_id     INTEGER PRIMARY KEY,
+                name        TEXT,
+                lang        TEXT DEFAULT 'FA',
+                source      TEXT,
+                phone       TEXT,
+                created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """)
+            # messages
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS messages(
+                id      INTEGER PRIMARY KEY AUTOINCREMENT,
+                chat_id INTEGER,
+                direction TEXT,
+                text    TEXT,
+                ts      TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """)
+            # orders
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS orders(
+                id      INTEGER PRIMARY KEY AUTOINCREMENT,
+                chat_id INTEGER,
+                item    TEXT,
+                qty     INTEGER DEFAULT 1,
+                price   TEXT,
+                status  TEXT DEFAULT 'new',
+                ts      TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """)
+
+            c.execute("CREATE INDEX IF NOT EXISTS idx_messages_chat_ts ON messages(chat_id, ts)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_users_lang ON users(lang)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_orders_chat_ts ON orders(chat_id, ts)")
+
+            # ستون های قدیمی را در صورت نبود اضافه کن
+            cols = [r[1] for r in c.execute("PRAGMA table_info(users)").fetchall()]
+            if "source" not in cols:
+                c.execute("ALTER TABLE users ADD COLUMN source TEXT")
+            if "phone" not in cols:
+                c.execute("ALTER TABLE users ADD COLUMN phone TEXT")
+            if "blocked_at" not in cols:
+                c.execute("ALTER TABLE users ADD COLUMN blocked_at TIMESTAMP")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_users_source ON users(source)")
+
+    # ---- users
+    def upsert_user(self, chat_id:int, name:str|None):
+        with self.conn() as c:
+            c.execute("""
+            INSERT INTO users(chat_id, name) VALUES(?,?)
+            ON CONFLICT(chat_id) DO UPDATE SET name=excluded.name
+            """, (chat_id, name or ""))
+
+    def get_user_lang(self, chat_id:int)->str:
+        with self.conn() as c:
+            row = c.execute("SELECT lang FROM users WHERE chat_id=?", (chat_id,)).fetchone()
+        return row[0] if row and row[0] else self.default_lang
+
+    def set_user_lang(self, chat_id:int, lang:str):
+        with self.conn() as c:
+            c.execute("""
+            INSERT INTO users(chat_id, lang) VALUES(?,?)
+            ON CONFLICT(chat_id) DO UPDATE SET lang=excluded.lang
+            """, (chat_id, (lang or self.default_lang).upper()))
+
+    def set_user_source(self, chat_id:int, source:str):
+        if not source: return
+        with self.conn() as c:
+            c.execute("""
+            INSERT INTO users(chat_id, source) VALUES(?,?)
+            ON CONFLICT(chat_id) DO UPDATE SET source=excluded.source
+            """, (chat_id, source[:64]))
+
+    def set_user_phone(self, chat_id:int, phone:str):
+        if not phone: return
+        with self.conn() as c:
+            c.execute("UPDATE users SET phone=? WHERE chat_id=?", (phone, chat_id))
+
+    def get_user_phone(self, chat_id:int)->str|None:
+        with self.conn() as c:
+            row = c.execute("SELECT phone FROM users WHERE chat_id=?", (chat_id,)).fetchone()
+        return row[0] if row and row[0] else None
+
+    # ---- messages
+    def log_message(self, chat_id:int, text:str, direction:str):
+        # buffered; ts is taken now (same format as CURRENT_TIMESTAMP), not at commit time
+        self.messages.append((chat_id, text or "", direction, datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")))
+
+    def get_stats(self)->dict:
+        self.messages.flush()   # count what was logged so far, not only what the flusher already committed
+        with self.conn() as c:
+            users_total = c.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+            msgs_total  = c.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+            msgs_24h    = c.execute("SELECT COUNT(*) FROM messages WHERE ts >= datetime('now','-1 day')").fetchone()[0]
+            langs       = c.execute("SELECT lang, COUNT(*) FROM users GROUP BY lang").fetchall()
+        return {"users_total":users_total,"messages_total":msgs_total,"messages_24h":msgs_24h,"langs":{k or "FA":v for k,v in langs}}
+
+    def list_user_ids(self, limit:int=200)->list[int]:
+        with self.conn() as c:
+            rows = c.execute("SELECT chat_id FROM users ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [r[0] for r in rows]
+
+    def _audience(self, after:int, lang:str|None, source:str|None):
+        sql, args = " FROM users WHERE chat_id > ? AND blocked_at IS NULL", [after]
+        if lang:
+            sql += " AND lang = ?"; args.append(lang.upper())
+        if source:
+            sql += " AND source = ?"; args.append(source)
+        return sql, args
+
+    def page_user_ids(self, after:int=0, limit:int=200, lang:str|None=None, source:str|None=None)->list[int]:
+        """Keyset page: ids strictly after `after`, ascending; skips users who blocked the bot."""
+        sql, args = self._audience(after, lang, source)
+        with self.conn() as c:
+            rows = c.execute("SELECT chat_id" + sql + " ORDER BY chat_id LIMIT ?", args + [limit]).fetchall()
+        return [r[0] for r in rows]
+
+    def count_user_ids(self, after:int=0, lang:str|None=None, source:str|None=None)->int:
+        sql, args = self._audience(after, lang, source)
+        with self.conn() as c:
+            return c.execute("SELECT COUNT(*)" + sql, args).fetchone()[0]
+
+    def mark_blocked(self, chat_ids:list[int]):
+        if not chat_ids: return
+        with self.conn() as c:
+            c.executemany("UPDATE users SET blocked_at=CURRENT_TIMESTAMP WHERE chat_id=?", [(i,) for i in chat_ids])
+
+    def unmark_blocked(self, chat_id:int):
+        with self.conn() as c:
+            c.execute("UPDATE users SET blocked_at=NULL WHERE chat_id=? AND blocked_at IS NOT NULL", (chat_id,))
+
+    # ---- orders
+    def create_order(self, chat_id:int, item:str, qty:int=1, price:str="")->int:
+        with self.conn() as c:
+            cur = c.execute("INSERT INTO orders(chat_id,item,qty,price) VALUES(?,?,?,?)",
+                            (chat_id, item, qty, price))
+            return cur.lastrowid
+
+# ---------------- default store ----------------
+# The module-level API of the single-shop days: thin wrappers over one UserStore at DB_PATH,
+# opened on first use. app.py's own shop (SHOP) uses this same store.
+_DEFAULT = None
+_DEFAULT_LOCK = threading.Lock()
+
+def default_store()->UserStore:
+    global _DEFAULT
+    if _DEFAULT is None:
+        with _DEFAULT_LOCK:
+            if _DEFAULT is None:
+                _DEFAULT = UserStore(DB_PATH, DEFAULT_LANG)
+    return _DEFAULT
+
+def __getattr__(name):
+    if name == "MESSAGES":
+        return default_store().messages
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def _conn():
-    return sqlite3.connect(DB_PATH)
+    return default_store().conn()
 
 def init_db():
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    with _conn() as c:
-        # users
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS users(
-            chat_id     INTEGER PRIMARY KEY,
-            name        TEXT,
-            lang        TEXT DEFAULT 'FA',
-            source      TEXT,
-            phone       TEXT,
-            created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        # messages
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS messages(
-            id      INTEGER PRIMARY KEY AUTOINCREMENT,
-            chat_id INTEGER,
-            direction TEXT,
-            text    TEXT,
-            ts      TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        # orders
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS orders(
-            id      INTEGER PRIMARY KEY AUTOINCREMENT,
-            chat_id INTEGER,
-            item    TEXT,
-            qty     INTEGER DEFAULT 1,
-            price   TEXT,
-            status  TEXT DEFAULT 'new',
-            ts      TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-
-        c.execute("CREATE INDEX IF NOT EXISTS idx_messages_chat_ts ON messages(chat_id, ts)")
-        c.execute("CREATE INDEX IF NOT EXISTS idx_users_lang ON users(lang)")
-        c.execute("CREATE INDEX IF NOT EXISTS idx_orders_chat_ts ON orders(chat_id, ts)")
-
-        # ستون های قدیمی را در صورت نبود اضافه کن
-        cols = [r[1] for r in c.execute("PRAGMA table_info(users)").fetchall()]
-        if "source" not in cols:
-            c.execute("ALTER TABLE users ADD COLUMN source TEXT")
-        if "phone" not in cols:
-            c.execute("ALTER TABLE users ADD COLUMN phone TEXT")
-
-# ---- users
+    default_store().init_db()
+
 def upsert_user(chat_id:int, name:str|None):
-    with _conn() as c:
-        c.execute("""
-        INSERT INTO users(chat_id, name) VALUES(?,?)
-        ON CONFLICT(chat_id) DO UPDATE SET name=excluded.name
-        """, (chat_id, name or ""))
+    default_store().upsert_user(chat_id, name)
 
 def get_user_lang(chat_id:int)->str:
-    with _conn() as c:
-        row = c.execute("SELECT lang FROM users WHERE chat_id=?", (chat_id,)).fetchone()
-    return row[0] if row and row[0] else DEFAULT_LANG
+    return default_store().get_user_lang(chat_id)
 
 def set_user_lang(chat_id:int, lang:str):
-    with _conn() as c:
-        c.execute("""
-        INSERT INTO users(chat_id, lang) VALUES(?,?)
-        ON CONFLICT(chat_id) DO UPDATE SET lang=excluded.lang
-        """, (chat_id, (lang or DEFAULT_LANG).upper()))
+    default_store().set_user_lang(chat_id, lang)
 
 def set_user_source(chat_id:int, source:str):
-    if not source: return
-    with _conn() as c:
-        c.execute("""
-        INSERT INTO users(chat_id, source) VALUES(?,?)
-        ON CONFLICT(chat_id) DO UPDATE SET source=excluded.source
-        """, (chat_id, source[:64]))
+    default_store().set_user_source(chat_id, source)
 
 def set_user_phone(chat_id:int, phone:str):
-    if not phone: return
-    with _conn() as c:
-        c.execute("UPDATE users SET phone=? WHERE chat_id=?", (phone, chat_id))
+    default_store().set_user_phone(chat_id, phone)
 
 def get_user_phone(chat_id:int)->str|None:
-    with _conn() as c:
-        row = c.execute("SELECT phone FROM users WHERE chat_id=?", (chat_id,)).fetchone()
-    return row[0] if row and row[0] else None
+    return default_store().get_user_phone(chat_id)
 
-# ---- messages
 def log_message(chat_id:int, text:str, direction:str):
-    with _conn() as c:
-        c.execute("INSERT INTO messages(chat_id, text, direction) VALUES(?,?,?)",
-                  (chat_id, text or "", direction))
+    default_store().log_message(chat_id, text, direction)
 
 def get_stats()->dict:
-    with _conn() as c:
-        users_total = c.execute("SELECT COUNT(*) FROM users").fetchone()[0]
-        msgs_total  = c.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
-        msgs_24h    = c.execute("SELECT COUNT(*) FROM messages WHERE ts >= datetime('now','-1 day')").fetchone()[0]
-        langs       = c.execute("SELECT lang, COUNT(*) FROM users GROUP BY lang").fetchall()
-    return {"users_total":users_total,"messages_total":msgs_total,"messages_24h":msgs_24h,"langs":{k or "FA":v for k,v in langs}}
+    return default_store().get_stats()
 
 def list_user_ids(limit:int=200)->list[int]:
-    with _conn() as c:
-        rows = c.execute("SELECT chat_id FROM users ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
-    return [r[0] for r in rows]
+    return default_store().list_user_ids(limit)
 
-# ---- orders
-def create_order(chat_id:int, item:str, qty:int=1, price:str="")->int:
-    with _conn() as c:
-        cur = c.execute("INSERT INTO orders(chat_id,item,qty,price) VALUES(?,?,?,?)",
-                        (chat_id, item, qty, price))
-        return cur.lastrowid
+def page_user_ids(after:int=0, limit:int=200, lang:str|None=None, source:str|None=None)->list[int]:
+    return default_store().page_user_ids(after, limit, lang, source)
+
+def count_user_ids(after:int=0, lang:str|None=None, source:str|None=None)->int:
+    return default_store().count_user_ids(after, lang, source)
 
-init_db()
+def mark_blocked(chat_ids:list[int]):
+    default_store().mark_blocked(chat_ids)
+
+def unmark_blocked(chat_id:int):
+    default_store().unmark_blocked(chat_id)
+
+def create_order(chat_id:int, item:str, qty:int=1, price:str="")->int:
+    return default_store().create_order(chat_id, item, qty, price)
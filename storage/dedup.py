@@ -0,0 +1,73 @@
+# storage/dedup.py
+# update_id de-duplication: Telegram redelivers updates when the webhook is slow or fails.
+# A bounded in-process LRU answers repeats without I/O; the authoritative check is an
+# INSERT OR IGNORE into processed_updates, which is atomic across gunicorn workers.
+import time, threading
+from collections import OrderedDict
+
+class UpdateDeduper:
+    def __init__(self, conn_fn, bot:str, max_entries:int=10000, ttl:float=86400, sweep_every:int=1000):
+        self.conn_fn = conn_fn
+        self.bot = bot or "-"
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.sweep_every = sweep_every
+        self.recent = OrderedDict()   # update_id -> seen_at (oldest first)
+        self._lock = threading.Lock()
+        self._claims = 0
+        self.counters = {"claimed": 0, "duplicates": 0, "released": 0}
+
+    def init_schema(self):
+        c = self.conn_fn()
+        c.execute("""CREATE TABLE IF NOT EXISTS processed_updates (
+            bot TEXT, update_id INTEGER, seen_at REAL,
+            PRIMARY KEY (bot, update_id)) WITHOUT ROWID""")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_processed_updates_seen ON processed_updates(seen_at)")
+        c.commit()
+
+    def _remember(self, update_id, now):
+        self.recent[update_id] = now
+        while len(self.recent) > self.max_entries:
+            self.recent.popitem(last=False)
+
+    def claim(self, update_id)->bool:
+        """True the first time an update_id is seen (process it), False for a redelivery."""
+        if update_id is None:
+            return True
+        now = time.time()
+        with self._lock:
+            if update_id in self.recent:
+                self.counters["duplicates"] += 1
+                return False
+        c = self.conn_fn()
+        with c:
+            fresh = c.execute("INSERT OR IGNORE INTO processed_updates (bot, update_id, seen_at) VALUES (?,?,?)",
+                              (self.bot, update_id, now)).rowcount == 1
+        with self._lock:
+            self._remember(update_id, now)
+            self.counters["claimed" if fresh else "duplicates"] += 1
+            self._claims += 1
+            sweep = self._claims % self.sweep_every == 0
+        if sweep:
+            self.sweep(now)
+        return fresh
+
+    def forget(self, update_id):
+        """Undo a claim (e.g. the update was shed and Telegram must be allowed to redeliver it)."""
+        if update_id is None:
+            return
+        with self._lock:
+            self.recent.pop(update_id, None)
+            self.counters["released"] += 1
+        c = self.conn_fn()
+        with c:
+            c.execute("DELETE FROM processed_updates WHERE bot=? AND update_id=?", (self.bot, update_id))
+
+    def sweep(self, now:float|None=None):
+        c = self.conn_fn()
+        with c:
+            c.execute("DELETE FROM processed_updates WHERE seen_at < ?", ((now or time.time()) - self.ttl,))
+
+    def stats(self)->dict:
+        with self._lock:
+            return dict(self.counters, cached=len(self.recent))
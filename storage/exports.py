@@ -0,0 +1,72 @@
+# storage/exports.py
+# Streaming order export (CSV / NDJSON, optionally gzip'd) for /admin/orders.* and /export.
+# Rows are read in keyset batches (id > last_id ORDER BY id LIMIT n): every batch is its own
+# short read, so a million-row export holds no long transaction (WAL checkpoints and writers
+# keep going) and memory stays at one batch + one encoder buffer.
+# The date range is turned into an id range once through idx_orders_created_at.
+import io, csv, json, zlib
+from datetime import datetime
+
+COLUMNS = ("id", "created_at", "status", "chat_id", "contact_name", "contact_phone", "address_text",
+           "location_lat", "location_lon", "delivery_zone", "delivery_fee", "total", "items_json")
+BATCH = 1000
+
+def _ts(x):
+    return x.isoformat() if isinstance(x, datetime) else x
+
+def iter_orders(conn, since=None, until=None, status=None, batch:int=BATCH):
+    """Yield order rows as tuples (COLUMNS order) for created_at in [since, until), ordered by id."""
+    where, args = ["created_at >= ?", "created_at < ?"], [_ts(since) or "", _ts(until) or "\uffff"]
+    if status:
+        where.append("status = ?"); args.append(status)
+    # id bounds from the created_at index; ids grow with created_at, the filter keeps it exact
+    lo, hi = conn.execute("SELECT MIN(id), MAX(id) FROM orders WHERE created_at >= ? AND created_at < ?", args[:2]).fetchone()
+    if lo is None:
+        return
+    sql = f"SELECT {','.join(COLUMNS)} FROM orders WHERE id > ? AND id <= ? AND {' AND '.join(where)} ORDER BY id LIMIT ?"
+    last = lo - 1
+    while True:
+        rows = conn.execute(sql, [last, hi] + args + [batch]).fetchall()
+        for r in rows:
+            yield tuple(r)
+        if len(rows) < batch:
+            return
+        last = rows[-1][0]
+
+def csv_chunks(rows, flush_every:int=500):
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(COLUMNS)
+    for i, r in enumerate(rows, start=1):
+        w.writerow(r)
+        if i % flush_every == 0:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0); buf.truncate()
+    yield buf.getvalue().encode("utf-8")
+
+def ndjson_chunks(rows, flush_every:int=500):
+    out = []
+    for r in rows:
+        d = dict(zip(COLUMNS, r))
+        try: d["items"] = json.loads(d.pop("items_json") or "[]")
+        except ValueError: d["items"] = []
+        out.append(json.dumps(d, ensure_ascii=False))
+        if len(out) >= flush_every:
+            yield ("\n".join(out) + "\n").encode("utf-8")
+            out = []
+    if out:
+        yield ("\n".join(out) + "\n").encode("utf-8")
+
+def gzip_chunks(chunks, level:int=6):
+    z = zlib.compressobj(level, zlib.DEFLATED, 31)   # wbits 31 = gzip container
+    for c in chunks:
+        data = z.compress(c)
+        if data:
+            yield data
+    yield z.flush()
+
+def export_chunks(conn, fmt:str="csv", gz:bool=False, **filters):
+    """-> iterator of bytes. fmt: csv | ndjson."""
+    rows = iter_orders(conn, **filters)
+    chunks = ndjson_chunks(rows) if fmt == "ndjson" else csv_chunks(rows)
+    return gzip_chunks(chunks) if gz else chunks
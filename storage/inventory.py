@@ -0,0 +1,121 @@
+# storage/inventory.py
+# Atomic stock reservation. Every tracked line of a cart is taken with a conditional
+#   UPDATE products SET stock = stock - ? WHERE sku = ? AND stock >= ?
+# inside one IMMEDIATE transaction per cart: either the whole cart is reserved or nothing is.
+# stock = -1 means "not tracked" (unlimited) and is never decremented.
+# A checkout first places a *hold* (expires if the user walks away); placing the order turns
+# the hold into a committed reservation in the order's own transaction.
+# A sheet sync never writes `stock` directly: it sets products.sheet_stock (the owner's count)
+# and rebase_stock() derives stock = sheet_stock - held - committed since that count was set.
+import time
+
+class OutOfStock(Exception):
+    def __init__(self, sku, available):
+        super().__init__(f"out of stock: {sku} (available {available})")
+        self.sku = sku
+        self.available = available
+
+def init_inventory_schema(conn):
+    conn.execute("""CREATE TABLE IF NOT EXISTS stock_reservations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chat_id TEXT,
+        sku TEXT,
+        qty INTEGER,
+        status TEXT,          -- held | committed | released | expired
+        order_id INTEGER,
+        expires_at REAL,
+        created_at REAL
+    )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_resv_chat_status ON stock_reservations(chat_id, status)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_resv_status_exp ON stock_reservations(status, expires_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_resv_sku_status ON stock_reservations(sku, status)")
+    conn.commit()
+
+def _cart_lines(items):
+    # merge duplicate SKUs so each is decremented once
+    lines = {}
+    for it in items:
+        lines[it["sku"]] = lines.get(it["sku"], 0) + int(it.get("qty", 1))
+    return lines
+
+def _release_held(conn, chat_id, status="released"):
+    rows = conn.execute("SELECT id, sku, qty FROM stock_reservations WHERE chat_id=? AND status='held'",
+                        (str(chat_id),)).fetchall()
+    if rows:
+        conn.executemany("UPDATE products SET stock = stock + ? WHERE sku = ? AND stock >= 0",
+                         [(r[2], r[1]) for r in rows])
+        conn.executemany("UPDATE stock_reservations SET status=? WHERE id=?", [(status, r[0]) for r in rows])
+    return [r[1] for r in rows]
+
+def _take(conn, chat_id, lines, status, expires_at, order_id=None):
+    now = time.time()
+    taken = []
+    for sku, qty in lines.items():
+        cur = conn.execute("UPDATE products SET stock = stock - ? WHERE sku = ? AND stock >= 0 AND stock >= ?",
+                           (qty, sku, qty))
+        if cur.rowcount == 1:
+            taken.append((str(chat_id), sku, qty, status, order_id, expires_at, now))
+            continue
+        row = conn.execute("SELECT stock FROM products WHERE sku=?", (sku,)).fetchone()
+        if row is not None and row[0] is not None and row[0] >= 0:
+            raise OutOfStock(sku, row[0])
+        # unknown SKU (ENV catalog) or untracked stock: nothing to reserve
+    if taken:
+        conn.executemany("""INSERT INTO stock_reservations (chat_id,sku,qty,status,order_id,expires_at,created_at)
+            VALUES (?,?,?,?,?,?,?)""", taken)
+    return [t[1] for t in taken]
+
+def hold_cart(conn, chat_id, items, ttl:float)->list:
+    """Reserve the cart for `ttl` seconds (replacing any earlier hold). Raises OutOfStock.
+    Returns the SKUs whose stock changed."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        touched = _release_held(conn, chat_id)
+        touched += _take(conn, chat_id, _cart_lines(items), "held", time.time() + ttl)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return touched
+
+def commit_cart(conn, chat_id, items, order_id)->list:
+    """Inside the order's (already IMMEDIATE) transaction: swap the hold for a committed reservation.
+    Re-taking from scratch means an expired or missing hold is handled the same way. Raises OutOfStock."""
+    touched = _release_held(conn, chat_id)
+    touched += _take(conn, chat_id, _cart_lines(items), "committed", None, order_id)
+    return touched
+
+def release_cart(conn, chat_id)->list:
+    conn.execute("BEGIN IMMEDIATE")
+    with conn:
+        return _release_held(conn, chat_id)
+
+def expire_holds(conn, now:float|None=None)->list:
+    """Give back stock of abandoned checkouts. Returns the SKUs whose stock changed."""
+    now = now or time.time()
+    conn.execute("BEGIN IMMEDIATE")   # read-then-write: take the write lock up front
+    with conn:
+        rows = conn.execute("SELECT id, sku, qty FROM stock_reservations WHERE status='held' AND expires_at < ?",
+                            (now,)).fetchall()
+        if rows:
+            conn.executemany("UPDATE products SET stock = stock + ? WHERE sku = ? AND stock >= 0",
+                             [(r[2], r[1]) for r in rows])
+            conn.executemany("UPDATE stock_reservations SET status='expired' WHERE id=? AND status='held'",
+                             [(r[0],) for r in rows])
+    return [r[1] for r in rows]
+
+def rebase_stock(conn, skus_sql:str):
+    """Recompute stock of the SKUs selected by `skus_sql` from their sheet count, inside the
+    caller's transaction. Orders committed before the count was set are assumed to be in it."""
+    has_resv = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='stock_reservations'").fetchone()
+    taken = """COALESCE((SELECT SUM(r.qty) FROM stock_reservations r WHERE r.sku = products.sku
+        AND (r.status = 'held' OR (r.status = 'committed' AND r.created_at >= products.stock_base_at))), 0)""" if has_resv else "0"
+    conn.execute(f"""UPDATE products SET stock = CASE WHEN sheet_stock IS NULL OR sheet_stock < 0 THEN -1
+                     ELSE MAX(sheet_stock - {taken}, 0) END WHERE sku IN ({skus_sql})""")
+
+def current_stock(conn, skus)->dict:
+    skus = list(set(skus))
+    if not skus:
+        return {}
+    q = ",".join("?" * len(skus))
+    return dict(conn.execute(f"SELECT sku, stock FROM products WHERE sku IN ({q})", skus).fetchall())
@@ -0,0 +1,113 @@
+# storage/journal.py
+# Group-commit writer for high-volume append-only rows (the messages log).
+# append() only touches an in-memory ring; a flusher thread commits batches with executemany
+# every `flush_ms` or as soon as `batch_rows` rows are waiting - one fsync per batch instead of
+# one per message. When the ring is full the policy decides: "drop" (count and discard the new
+# row) or "block" (wait up to `block_timeout` for the flusher, then drop).
+import os, atexit, logging, threading
+from collections import deque
+
+log = logging.getLogger("jawab.journal")   # configured by bot.log
+
+class Journal:
+    def __init__(self, conn_fn, sql:str, maxlen:int=10000, flush_ms:int=200, batch_rows:int=500,
+                 policy:str="drop", block_timeout:float=1.0):
+        self.conn_fn = conn_fn
+        self.sql = sql
+        self.maxlen = maxlen
+        self.flush_s = flush_ms / 1000.0
+        self.batch_rows = batch_rows
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.buf = deque()
+        self._cv = threading.Condition()
+        self._flush_lock = threading.Lock()   # one committer at a time (flusher vs explicit flush)
+        self._pid = None
+        self._closed = False
+        self.counters = {"appended": 0, "written": 0, "dropped": 0, "batches": 0, "errors": 0}
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._cv:
+            if self._pid == os.getpid():
+                return
+            self.buf = deque()
+            threading.Thread(target=self._run, name="journal-flush", daemon=True).start()
+            self._pid = os.getpid()
+
+    def append(self, row:tuple)->bool:
+        self._ensure_started()
+        with self._cv:
+            if len(self.buf) >= self.maxlen:
+                if self.policy == "block":
+                    self._cv.notify_all()
+                    self._cv.wait_for(lambda: len(self.buf) < self.maxlen, timeout=self.block_timeout)
+                if len(self.buf) >= self.maxlen:
+                    self.counters["dropped"] += 1
+                    return False
+            self.buf.append(row)
+            self.counters["appended"] += 1
+            if len(self.buf) >= self.batch_rows:
+                self._cv.notify_all()
+        return True
+
+    def _take(self):
+        with self._cv:
+            rows = list(self.buf)
+            self.buf.clear()
+            self._cv.notify_all()   # wake producers blocked on a full ring
+        return rows
+
+    def flush(self)->int:
+        """Commit everything buffered so far (readers call this before counting)."""
+        if self._pid != os.getpid():
+            return 0
+        with self._flush_lock:
+            rows = self._take()
+            if not rows:
+                return 0
+            try:
+                with self.conn_fn() as c:
+                    c.executemany(self.sql, rows)
+            except Exception as e:
+                with self._cv:
+                    self.counters["errors"] += 1
+                    self.counters["dropped"] += len(rows)
+                log.error("journal flush error", extra={"error": str(e)})
+                return 0
+            with self._cv:
+                self.counters["written"] += len(rows)
+                self.counters["batches"] += 1
+            return len(rows)
+
+    def _run(self):
+        while not self._closed:
+            with self._cv:
+                self._cv.wait_for(lambda: len(self.buf) >= self.batch_rows or self._closed, timeout=self.flush_s)
+            self.flush()
+
+    def close(self):
+        """Final flush; the flusher thread exits and the journal is no longer flushed at exit."""
+        with self._cv:
+            self._closed = True
+            self._cv.notify_all()
+        self.flush()
+        if self in _JOURNALS:
+            _JOURNALS.remove(self)
+
+    def stats(self)->dict:
+        with self._cv:
+            return dict(self.counters, pending=len(self.buf))
+
+_JOURNALS = []
+
+def make_journal(conn_fn, sql, **kw)->Journal:
+    j = Journal(conn_fn, sql, **kw)
+    _JOURNALS.append(j)
+    return j
+
+@atexit.register
+def _flush_on_exit():
+    for j in _JOURNALS:
+        j.flush()
@@ -0,0 +1,60 @@
+# storage/order_items.py
+# Normalized order lines: one row per cart item, written in the order's transaction, so
+# per-SKU / per-category sales are plain indexed SQL instead of json.loads over every order.
+from datetime import datetime
+
+def init_order_items_schema(conn):
+    conn.execute("""CREATE TABLE IF NOT EXISTS order_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id INTEGER NOT NULL,
+        sku TEXT,
+        name TEXT,
+        category TEXT,
+        qty INTEGER NOT NULL DEFAULT 1,
+        unit_price REAL NOT NULL DEFAULT 0,
+        created_at TEXT
+    )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items(order_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_order_items_created_sku ON order_items(created_at, sku)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_order_items_created_cat ON order_items(created_at, category)")
+    conn.commit()
+    # one-time migration of orders written before this table existed
+    if not conn.execute("SELECT 1 FROM order_items LIMIT 1").fetchone() and \
+       conn.execute("SELECT 1 FROM orders LIMIT 1").fetchone():
+        migrate_items_json(conn)
+
+def migrate_items_json(conn)->int:
+    """Explode orders.items_json into order_items for orders that have no lines yet (in SQL)."""
+    with conn:
+        cur = conn.execute("""INSERT INTO order_items (order_id,sku,name,category,qty,unit_price,created_at)
+            SELECT o.id, json_extract(j.value,'$.sku'), json_extract(j.value,'$.name'), p.category,
+                   COALESCE(json_extract(j.value,'$.qty'),1), COALESCE(json_extract(j.value,'$.price'),0), o.created_at
+            FROM orders o
+            JOIN json_each(CASE WHEN json_valid(o.items_json) THEN o.items_json ELSE '[]' END) j
+            LEFT JOIN products p ON p.sku = json_extract(j.value,'$.sku')
+            WHERE NOT EXISTS (SELECT 1 FROM order_items x WHERE x.order_id = o.id)""")
+    return cur.rowcount
+
+def record_items(conn, order_id:int, created_at:str, items, category_of=None):
+    """Call inside the order's transaction. category_of(sku) -> category name (snapshot)."""
+    conn.executemany("""INSERT INTO order_items (order_id,sku,name,category,qty,unit_price,created_at)
+        VALUES (?,?,?,?,?,?,?)""",
+        [(order_id, it.get("sku"), it.get("name"), category_of(it.get("sku")) if category_of else None,
+          int(it.get("qty", 1)), float(it.get("price") or 0), created_at) for it in items])
+
+def top_skus(conn, since:datetime, until:datetime, limit:int=10, category:str|None=None)->list[dict]:
+    sql = """SELECT sku, MAX(name), MAX(category), SUM(qty), SUM(qty*unit_price), COUNT(DISTINCT order_id)
+             FROM order_items WHERE created_at >= ? AND created_at < ?"""
+    args = [since.isoformat(), until.isoformat()]
+    if category:
+        sql += " AND category = ?"; args.append(category)
+    sql += " GROUP BY sku ORDER BY SUM(qty) DESC, SUM(qty*unit_price) DESC LIMIT ?"
+    args.append(limit)
+    return [{"sku": r[0], "name": r[1], "category": r[2], "units": r[3], "revenue": float(r[4] or 0), "orders": r[5]}
+            for r in conn.execute(sql, args).fetchall()]
+
+def top_categories(conn, since:datetime, until:datetime, limit:int=10)->list[dict]:
+    rows = conn.execute("""SELECT COALESCE(category,'Uncategorized'), SUM(qty), SUM(qty*unit_price), COUNT(DISTINCT order_id)
+        FROM order_items WHERE created_at >= ? AND created_at < ?
+        GROUP BY 1 ORDER BY SUM(qty) DESC LIMIT ?""", (since.isoformat(), until.isoformat(), limit)).fetchall()
+    return [{"category": r[0], "units": r[1], "revenue": float(r[2] or 0), "orders": r[3]} for r in rows]
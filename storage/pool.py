@@ -0,0 +1,63 @@
+# storage/pool.py
+# One SQLite connection manager for app.py and storage/db.py.
+# - one connection per (process, thread): nothing is shared across threads, and a connection
+#   opened before gunicorn forks (--preload) is never reused in the child
+# - WAL + synchronous=NORMAL + mmap + busy_timeout on every connection
+# - Python's per-connection prepared-statement cache is sized up; since connections live as
+#   long as their thread, statements are prepared once per thread instead of once per call
+import os, sqlite3, threading
+
+SQLITE_MMAP_MB = int(os.getenv("SQLITE_MMAP_MB", "64"))
+SQLITE_BUSY_MS = int(os.getenv("SQLITE_BUSY_MS", "5000"))
+SQLITE_STMT_CACHE = int(os.getenv("SQLITE_STMT_CACHE", "256"))
+
+def tune(conn):
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_MS}")
+    conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_MB * 1024 * 1024}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+class ConnectionManager:
+    def __init__(self, path:str, row_factory=None):
+        self.path = path
+        self.row_factory = row_factory
+        self._local = threading.local()
+
+    def connect(self)->sqlite3.Connection:
+        """A fresh tuned connection (not tracked); callers own and close it."""
+        d = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(d, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=SQLITE_BUSY_MS / 1000.0,
+                               cached_statements=SQLITE_STMT_CACHE)
+        if self.row_factory:
+            conn.row_factory = self.row_factory
+        return tune(conn)
+
+    def get(self)->sqlite3.Connection:
+        loc = self._local
+        if getattr(loc, "pid", None) != os.getpid():
+            # first use in this thread, or we are a forked child holding the parent's handle
+            loc.conn = self.connect()
+            loc.pid = os.getpid()
+        return loc.conn
+
+_MANAGERS = {}
+_lock = threading.Lock()
+
+def manager(path:str, row_factory=None)->ConnectionManager:
+    key = (os.path.abspath(path), row_factory)
+    m = _MANAGERS.get(key)
+    if m is None:
+        with _lock:
+            m = _MANAGERS.setdefault(key, ConnectionManager(path, row_factory))
+    return m
+
+def release(path:str):
+    """Forget the managers of `path` (evicted tenant DB): each thread's connection is closed
+    when its thread-local goes away with the manager."""
+    p = os.path.abspath(path)
+    with _lock:
+        for key in [k for k in _MANAGERS if k[0] == p]:
+            del _MANAGERS[key]
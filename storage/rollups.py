@@ -0,0 +1,82 @@
+# storage/rollups.py
+# Pre-aggregated sales totals for /report.
+# create_order_db() bumps one hourly and one daily row in the same transaction as the order,
+# so a report over any range reads at most ~48 hourly rows for the ragged edges plus one row
+# per full day - independent of how many orders exist.
+# Backfill existing orders: python -m storage.rollups [path/to/data.sqlite]
+import sys, sqlite3
+from datetime import datetime, timedelta
+
+def init_rollup_schema(conn):
+    conn.execute("""CREATE TABLE IF NOT EXISTS sales_hourly (
+        bucket TEXT PRIMARY KEY,      -- YYYY-MM-DDTHH (UTC)
+        orders INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        items INTEGER NOT NULL DEFAULT 0)""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS sales_daily (
+        day TEXT PRIMARY KEY,         -- YYYY-MM-DD (UTC)
+        orders INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        items INTEGER NOT NULL DEFAULT 0)""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders(created_at)")
+    conn.commit()
+    # first run on a DB that already has orders: build the rollups once
+    has_orders = conn.execute("SELECT 1 FROM orders LIMIT 1").fetchone()
+    has_rollups = conn.execute("SELECT 1 FROM sales_daily LIMIT 1").fetchone()
+    if has_orders and not has_rollups:
+        backfill(conn)
+
+def record_order(conn, created_at:str, total:float, items:int):
+    """Call inside the order's transaction (no commit here). created_at: UTC isoformat."""
+    for sql, key in (("INSERT INTO sales_hourly (bucket,orders,revenue,items) VALUES (?,1,?,?) "
+                      "ON CONFLICT(bucket) DO UPDATE SET orders=orders+1, revenue=revenue+excluded.revenue, items=items+excluded.items",
+                      created_at[:13]),
+                     ("INSERT INTO sales_daily (day,orders,revenue,items) VALUES (?,1,?,?) "
+                      "ON CONFLICT(day) DO UPDATE SET orders=orders+1, revenue=revenue+excluded.revenue, items=items+excluded.items",
+                      created_at[:10])):
+        conn.execute(sql, (key, total or 0.0, items or 0))
+
+def backfill(conn)->int:
+    """Rebuild both rollup tables from orders. Returns the number of orders aggregated."""
+    item_qty = "(SELECT COALESCE(SUM(COALESCE(json_extract(value,'$.qty'),1)),0) FROM json_each(o.items_json))"
+    with conn:
+        conn.execute("DELETE FROM sales_hourly")
+        conn.execute("DELETE FROM sales_daily")
+        conn.execute(f"""INSERT INTO sales_hourly (bucket,orders,revenue,items)
+            SELECT substr(created_at,1,13), COUNT(*), COALESCE(SUM(total),0), SUM({item_qty})
+            FROM orders o WHERE created_at IS NOT NULL AND json_valid(items_json) GROUP BY 1""")
+        conn.execute("""INSERT INTO sales_daily (day,orders,revenue,items)
+            SELECT substr(bucket,1,10), SUM(orders), SUM(revenue), SUM(items) FROM sales_hourly GROUP BY 1""")
+    return conn.execute("SELECT COALESCE(SUM(orders),0) FROM sales_daily").fetchone()[0]
+
+def _sum(conn, table, col, lo, hi):
+    r = conn.execute(f"SELECT COALESCE(SUM(orders),0), COALESCE(SUM(revenue),0), COALESCE(SUM(items),0) "
+                     f"FROM {table} WHERE {col} >= ? AND {col} < ?", (lo, hi)).fetchone()
+    return r[0], r[1], r[2]
+
+def range_summary(conn, since:datetime, until:datetime)->dict:
+    """Totals for [since, until) at hour granularity (UTC)."""
+    start = since.replace(minute=0, second=0, microsecond=0)
+    end = until.replace(minute=0, second=0, microsecond=0)
+    if end < until: end += timedelta(hours=1)
+    first_day = start.replace(hour=0)
+    if first_day < start: first_day += timedelta(days=1)
+    last_day = end.replace(hour=0)
+    parts = []
+    if first_day < last_day:
+        parts.append(_sum(conn, "sales_daily", "day", first_day.strftime("%Y-%m-%d"), last_day.strftime("%Y-%m-%d")))
+        head, tail = (start, first_day), (last_day, end)
+    else:
+        head, tail = (start, end), None
+    H = "%Y-%m-%dT%H"
+    for rng in (head, tail):
+        if rng and rng[0] < rng[1]:
+            parts.append(_sum(conn, "sales_hourly", "bucket", rng[0].strftime(H), rng[1].strftime(H)))
+    return {"orders": sum(p[0] for p in parts), "revenue": float(sum(p[1] for p in parts)),
+            "items": sum(p[2] for p in parts)}
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "data.sqlite"
+    c = sqlite3.connect(path)
+    init_rollup_schema(c)
+    print("backfilled", backfill(c), "orders into", path)
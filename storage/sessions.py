@@ -0,0 +1,229 @@
+# storage/sessions.py
+# Pluggable session state (carts, flow context, phones) so several gunicorn workers can share it.
+#   memory : plain per-process dicts (the original behaviour)
+#   sqlite : WAL-backed table shared by every worker, with
+#            - an in-process read-through cache, invalidated by PRAGMA data_version
+#              (changes whenever another connection commits)
+#            - write-behind: writes land in a dirty map, a flusher thread commits them in batches
+#            - TTL expiry per namespace (abandoned carts disappear)
+import os, json, time, atexit, logging, sqlite3, threading
+from storage.pool import tune
+
+log = logging.getLogger("jawab.sessions")   # configured by bot.log
+
+SESSION_FLUSH_MS = int(os.getenv("SESSION_FLUSH_MS", "50"))
+SESSION_SWEEP_SEC = int(os.getenv("SESSION_SWEEP_SEC", "300"))
+
+_MISSING = object()
+_DELETED = object()
+
+class Namespace:
+    """dict-like view (get / [] / pop / in) over one namespace of a store."""
+
+    def __init__(self, store, ns):
+        self.store, self.ns = store, ns
+
+    def get(self, key, default=None):
+        v = self.store.get(self.ns, key)
+        return default if v is _MISSING else v
+
+    def __getitem__(self, key):
+        v = self.store.get(self.ns, key)
+        if v is _MISSING: raise KeyError(key)
+        return v
+
+    def __setitem__(self, key, value):
+        self.store.set(self.ns, key, value)
+
+    def __contains__(self, key):
+        return self.store.get(self.ns, key) is not _MISSING
+
+    def pop(self, key, default=None):
+        v = self.store.get(self.ns, key)
+        if v is _MISSING: return default
+        self.store.delete(self.ns, key)
+        return v
+
+    def __len__(self):
+        return self.store.count(self.ns)
+
+class MemorySessionStore:
+    def __init__(self):
+        self.data = {}
+
+    def namespace(self, ns, ttl:float=0)->Namespace:
+        self.data.setdefault(ns, {})
+        return Namespace(self, ns)
+
+    def get(self, ns, key):
+        return self.data[ns].get(key, _MISSING)
+
+    def set(self, ns, key, value):
+        self.data[ns][key] = value
+
+    def delete(self, ns, key):
+        self.data[ns].pop(key, None)
+
+    def count(self, ns)->int:
+        return len(self.data[ns])
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self in _STORES:
+            _STORES.remove(self)
+
+class SqliteSessionStore:
+    def __init__(self, path:str, flush_ms:int=SESSION_FLUSH_MS):
+        self.path = path
+        self.flush_s = flush_ms / 1000.0
+        self.ttls = {}
+        self.cache = {}      # (ns,key) -> (value | _MISSING, expires_at)
+        self.dirty = {}      # (ns,key) -> value | _DELETED, not yet committed
+        self._lock = threading.RLock()
+        self._pid = None
+        self._conn = None
+        self._data_version = None
+        self._last_sweep = 0.0
+        self._closed = False
+
+    # connection + flusher are per process (gunicorn forks after --preload)
+    def _ensure(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # one connection guarded by self._lock (autocommit; flush() manages its own transaction)
+            self._conn = tune(sqlite3.connect(self.path, check_same_thread=False, isolation_level=None))
+            self._conn.execute("""CREATE TABLE IF NOT EXISTS sessions (
+                ns TEXT, key TEXT, value TEXT, updated_at REAL,
+                PRIMARY KEY (ns, key))""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_ns_updated ON sessions(ns, updated_at)")
+            self.cache, self.dirty, self._data_version = {}, {}, None
+            threading.Thread(target=self._run, name="session-flush", daemon=True).start()
+            self._pid = os.getpid()
+
+    def namespace(self, ns, ttl:float=0)->Namespace:
+        """ttl seconds since last write; 0 = keep forever."""
+        self.ttls[ns] = ttl
+        return Namespace(self, ns)
+
+    def _expires(self, ns, written_at):
+        ttl = self.ttls.get(ns, 0)
+        return written_at + ttl if ttl else float("inf")
+
+    def _validate_cache(self):
+        dv = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if dv != self._data_version:
+            self.cache.clear()
+            self._data_version = dv
+
+    def get(self, ns, key):
+        self._ensure()
+        k = (ns, key)
+        with self._lock:
+            v = self.dirty.get(k, _MISSING)
+            if v is not _MISSING:
+                return _MISSING if v is _DELETED else v
+            self._validate_cache()
+            now = time.time()
+            hit = self.cache.get(k)
+            if hit is not None:
+                # same expiry rule as count(): an entry outlives its TTL in neither
+                return hit[0] if hit[1] >= now else _MISSING
+            row = self._conn.execute("SELECT value, updated_at FROM sessions WHERE ns=? AND key=?", (ns, key)).fetchone()
+            if row and self._expires(ns, row[1]) >= now:
+                v = json.loads(row[0])
+                self.cache[k] = (v, self._expires(ns, row[1]))
+            else:
+                self.cache[k] = (_MISSING, float("inf"))
+            return v
+
+    def set(self, ns, key, value):
+        self._ensure()
+        with self._lock:
+            self.dirty[(ns, key)] = value
+            self.cache[(ns, key)] = (value, self._expires(ns, time.time()))
+
+    def delete(self, ns, key):
+        self._ensure()
+        with self._lock:
+            self.dirty[(ns, key)] = _DELETED
+            self.cache[(ns, key)] = (_MISSING, float("inf"))
+
+    def count(self, ns)->int:
+        self._ensure()   # a freshly forked worker may not have touched the store yet
+        self.flush()
+        ttl = self.ttls.get(ns, 0)
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions WHERE ns=? AND updated_at >= ?",
+                                      (ns, time.time() - ttl if ttl else 0)).fetchone()[0]
+
+    def flush(self):
+        if self._pid != os.getpid():
+            return
+        with self._lock:
+            if not self.dirty:
+                return
+            batch, self.dirty = self.dirty, {}
+            now = time.time()
+            ups = [(ns, key, json.dumps(v, ensure_ascii=False), now) for (ns, key), v in batch.items() if v is not _DELETED]
+            dels = [(ns, key) for (ns, key), v in batch.items() if v is _DELETED]
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                if ups:
+                    self._conn.executemany("INSERT OR REPLACE INTO sessions (ns,key,value,updated_at) VALUES (?,?,?,?)", ups)
+                if dels:
+                    self._conn.executemany("DELETE FROM sessions WHERE ns=? AND key=?", dels)
+                self._conn.execute("COMMIT")
+            except Exception as e:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                # keep the writes for the next round unless newer ones replaced them
+                for k, v in batch.items():
+                    self.dirty.setdefault(k, v)
+                log.error("session flush error", extra={"error": str(e)})
+
+    def sweep(self):
+        """Delete expired entries (abandoned carts etc.)."""
+        now = time.time()
+        with self._lock:
+            for ns, ttl in self.ttls.items():
+                if ttl:
+                    self._conn.execute("DELETE FROM sessions WHERE ns=? AND updated_at < ?", (ns, now - ttl))
+            self.cache.clear()
+        self._last_sweep = now
+
+    def _run(self):
+        while not self._closed:
+            time.sleep(self.flush_s)
+            self.flush()
+            if time.time() - self._last_sweep > SESSION_SWEEP_SEC:
+                try: self.sweep()
+                except Exception: log.exception("session sweep error")
+
+    def close(self):
+        """Flush pending writes, stop the flusher and close the connection."""
+        self._closed = True
+        self.flush()
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn, self._pid = None, None
+        if self in _STORES:
+            _STORES.remove(self)
+
+_STORES = []
+
+def make_session_store(kind:str, path:str):
+    store = SqliteSessionStore(path) if (kind or "").lower() == "sqlite" else MemorySessionStore()
+    _STORES.append(store)
+    return store
+
+@atexit.register
+def _flush_on_exit():
+    for s in _STORES:
+        try: s.flush()
+        except Exception: log.exception("session flush error")
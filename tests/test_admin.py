@@ -0,0 +1,32 @@
+# tests/test_admin.py
+# /admin/orders exports the shop named by ?tenant= (the process's own shop without it); the
+# process ADMIN_TOKEN opens every shop, a tenant's own ADMIN_TOKEN only that tenant.
+import os, sys, json, tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATA_DB_FILE", os.path.join(tempfile.mkdtemp(), "data.sqlite"))
+os.environ.setdefault("DB_PATH", os.path.join(os.path.dirname(os.environ["DATA_DB_FILE"]), "users.sqlite3"))
+import app
+from bot.tenants import TenantRegistry, TenantConfigs
+
+def test_admin_orders_per_tenant(tmp_path, monkeypatch):
+    cfg = tmp_path / "tenants.json"
+    cfg.write_text(json.dumps({"tenants": {"a": {"ADMIN_TOKEN": "tok-a", "OUTBOX_WORKERS": "0"}, "b": {}}}))
+    reg = TenantRegistry(TenantConfigs(str(cfg)), app.Shop, base_dir=str(tmp_path))
+    monkeypatch.setattr(app, "TENANTS", reg)
+    monkeypatch.setattr(app, "ADMIN_TOKEN", "root")
+    try:
+        c = reg.get("a").db()
+        c.executemany("INSERT INTO orders (chat_id,total,status,created_at) VALUES (?,?,?,?)",
+                      [(str(i), i, "new", f"2026-01-0{i + 1}T10:00:00") for i in range(3)])
+        c.commit()
+        client = app.app.test_client()
+        r = client.get("/admin/orders.csv?tenant=a", headers={"Authorization": "Bearer tok-a"})
+        assert r.status_code == 200 and len(r.get_data().splitlines()) == 4
+        assert 'filename="orders_a.csv"' in r.headers["Content-Disposition"]
+        r = client.get("/admin/orders.csv?tenant=b", headers={"Authorization": "Bearer root"})
+        assert r.status_code == 200 and len(r.get_data().splitlines()) == 1
+        assert client.get("/admin/orders.csv?tenant=b", headers={"Authorization": "Bearer tok-a"}).status_code == 401
+        assert client.get("/admin/orders.csv", headers={"Authorization": "Bearer tok-a"}).status_code == 401
+        assert client.get("/admin/orders.csv?tenant=zz", headers={"Authorization": "Bearer root"}).status_code == 404
+    finally:
+        reg.close_all()
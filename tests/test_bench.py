@@ -0,0 +1,48 @@
+# tests/test_bench.py
+# The load-test inputs stay honest: the corpus is reproducible, uses the buttons app.py actually
+# renders, and its catalog CSV syncs; the fake Bot API answers like Telegram (429 with
+# retry_after, ETag on the sheet) and counts what it was sent.
+import os, sys, sqlite3, tempfile
+import requests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATA_DB_FILE", os.path.join(tempfile.mkdtemp(), "data.sqlite"))
+os.environ.setdefault("DB_PATH", os.path.join(os.path.dirname(os.environ["DATA_DB_FILE"]), "users.sqlite3"))
+import app
+from bench.corpus import generate, catalog_csv, LABELS
+from bench.fake_telegram import FakeTelegram
+from bot.sheet_sync import sync_sheet, init_sync_schema
+
+def test_corpus_is_reproducible_and_unique():
+    a, b = generate(users=40, seed=3), generate(users=40, seed=3)
+    assert a == b and a != generate(users=40, seed=4)
+    ids = [u["update_id"] for s in a for u in s]
+    assert len(ids) == len(set(ids)) and ids == sorted(ids)
+    for s in a:
+        assert len({u["message"]["chat"]["id"] for u in s}) == 1
+
+def test_corpus_buttons_match_app():
+    for lang, labels in LABELS.items():
+        T = app.TEXT[lang]
+        assert (labels["products"], labels["cart"], labels["order"], labels["prices"]) == \
+               (T["btn_products"], T["btn_cart"], T["btn_order"], T["btn_prices"])
+
+def test_fake_api_and_sheet():
+    srv = FakeTelegram(("127.0.0.1", 0), sheet_csv=catalog_csv(categories=3, per_category=4)).start()
+    try:
+        ok = requests.post(f"{srv.url}/bot1:x/sendMessage", json={"chat_id": 5, "text": "hi"}).json()
+        assert ok["ok"] and ok["result"]["chat"]["id"] == 5
+        assert requests.post(f"{srv.url}/nope", json={}).status_code == 404
+        srv.rate_429 = 1.0
+        r = requests.post(f"{srv.url}/bot1:x/sendMessage", json={"chat_id": 5, "text": "hi"})
+        assert r.status_code == 429 and r.json()["parameters"]["retry_after"] == srv.retry_after
+        assert srv.stats()["calls"] == {"sendMessage": 1} and srv.stats()["throttled"] == 1
+
+        c = sqlite3.connect(":memory:")
+        c.execute("""CREATE TABLE products (sku TEXT PRIMARY KEY, category TEXT, name TEXT, price REAL,
+                     stock INTEGER DEFAULT -1, is_available INTEGER DEFAULT 1)""")
+        init_sync_schema(c)
+        assert sync_sheet(c, f"{srv.url}/sheet.csv")["added"] == 12
+        assert sync_sheet(c, f"{srv.url}/sheet.csv")["not_modified"]
+    finally:
+        srv.shutdown()
+        srv.server_close()
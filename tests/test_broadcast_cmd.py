@@ -0,0 +1,43 @@
+# tests/test_broadcast_cmd.py
+# /broadcast subcommands are exact tokens: "/broadcast status [id]" and "/broadcast cancel [id]";
+# any other text after /broadcast, even one starting with "status", is the message to send.
+import os, sys, tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATA_DB_FILE", os.path.join(tempfile.mkdtemp(), "data.sqlite"))
+os.environ.setdefault("DB_PATH", os.path.join(os.path.dirname(os.environ["DATA_DB_FILE"]), "users.sqlite3"))
+import app
+from storage.broadcasts import latest_broadcast, get_broadcast, create_broadcast
+
+def test_parse_exact_subcommands():
+    p = app.parse_broadcast_command
+    assert p("/broadcast status") == ("status", None)
+    assert p("/broadcast Status #12") == ("status", 12)
+    assert p("/broadcast cancel 3") == ("cancel", 3)
+    assert p("/broadcast status update: we open at 9") is None
+    assert p("/broadcast cancelled orders ship tomorrow") is None
+    assert p("/broadcast cancel everything") is None
+    assert p("/broadcast hello") is None
+
+def test_status_prefixed_text_is_broadcast(tmp_path, monkeypatch):
+    shop = app.Shop("t", {"DATA_DB_FILE": str(tmp_path / "data.sqlite"), "DB_PATH": str(tmp_path / "users.sqlite3"),
+                          "OUTBOX_WORKERS": "0", "ADMINS": "1"})
+    sent = []
+    monkeypatch.setattr(app, "send_text", lambda shop, chat_id, text, **kw: sent.append(text))
+    say = lambda text: app.process_update(shop, {"message": {"chat": {"id": 1, "type": "private"}, "text": text}})
+    shop.broadcast_runner.stop()   # jobs stay queued: only the command handling is under test
+    try:
+        say("/broadcast status update: we open at 9")
+        first = latest_broadcast(shop.users.conn)
+        assert first["text"] == "status update: we open at 9" and sent[-1].startswith(f"Broadcast #{first['id']} queued")
+        say(f"/broadcast status {first['id']}")
+        assert sent[-1].startswith(f"Broadcast #{first['id']} [running]")
+        a = create_broadcast(shop.users.conn, "a", None, None, "1", 0)
+        b = create_broadcast(shop.users.conn, "b", None, None, "1", 0)
+        say(f"/broadcast cancel {a}")
+        assert sent[-1] == f"Broadcast #{a} cancelled."
+        assert get_broadcast(shop.users.conn, a)["status"] == "cancelled"
+        assert get_broadcast(shop.users.conn, b)["status"] == "running"   # not just "the latest one"
+        say("/broadcast status 999")
+        assert sent[-1] == "No broadcast #999."
+    finally:
+        shop.close()
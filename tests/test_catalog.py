@@ -0,0 +1,22 @@
+# tests/test_catalog.py
+# The ENV-backed catalog (and the router built over its categories) is built once per catalog
+# version: Products taps and free-text fallbacks reuse it instead of re-parsing PRODUCTS.
+import os, sys, tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATA_DB_FILE", os.path.join(tempfile.mkdtemp(), "data.sqlite"))
+os.environ.setdefault("DB_PATH", os.path.join(os.path.dirname(os.environ["DATA_DB_FILE"]), "users.sqlite3"))
+import app
+from bot.catalog import ENV_VERSION
+
+def test_env_catalog_built_once(tmp_path):
+    shop = app.Shop("t", {"DATA_DB_FILE": str(tmp_path / "data.sqlite"), "DB_PATH": str(tmp_path / "users.sqlite3"),
+                          "OUTBOX_WORKERS": "0", "PRODUCTS": "A1|Apple|2\nPear|3"})
+    try:
+        assert app.ensure_catalog(shop) == 2
+        cat, router = shop.catalog, shop.router
+        assert cat.version == ENV_VERSION and cat.get("A1")["price"] == 2.0
+        for _ in range(3):
+            assert app.ensure_catalog(shop) == 2
+        assert shop.catalog is cat and shop.router is router
+    finally:
+        shop.close()
@@ -0,0 +1,25 @@
+# tests/test_db.py
+# The module-level storage.db API keeps working for the default shop: it opens one UserStore at
+# DB_PATH on first use and every wrapper goes to that store.
+import os, sys, tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "users.sqlite3"))   # never the repo's data/
+import storage.db as db
+
+def test_module_wrappers_use_default_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "users.sqlite3"))
+    monkeypatch.setattr(db, "_DEFAULT", None)
+    db.init_db()
+    store = db.default_store()
+    try:
+        assert store.path == db.DB_PATH and db.default_store() is store
+        db.upsert_user(1, "a"); db.upsert_user(2, "b")
+        db.set_user_lang(2, "en")
+        db.log_message(1, "hi", "in")
+        assert db.get_user_lang(2) == "EN" and db.get_user_lang(1) == db.DEFAULT_LANG
+        assert sorted(db.list_user_ids()) == [1, 2]
+        db.mark_blocked([1])
+        assert db.page_user_ids() == [2] and db.count_user_ids() == 1
+        assert db.get_stats()["messages_total"] == 1 and db.MESSAGES is store.messages
+    finally:
+        store.close()
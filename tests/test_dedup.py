@@ -0,0 +1,56 @@
+# tests/test_dedup.py
+# A redelivered update_id is processed once: repeats are answered from the in-process LRU, and
+# the processed_updates row makes the claim exclusive across workers sharing the database.
+import os, sys, threading
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from storage.dedup import UpdateDeduper
+from storage.pool import manager, release
+
+def _pair(tmp_path, bot="b"):
+    path = str(tmp_path / "u.sqlite")
+    a = UpdateDeduper(manager(path).get, bot, max_entries=4)
+    a.init_schema()
+    return path, a, UpdateDeduper(manager(path).get, bot, max_entries=4)   # b: "another worker"
+
+def test_redelivery_claimed_once(tmp_path):
+    path, a, b = _pair(tmp_path)
+    assert a.claim(1) and not a.claim(1)
+    assert not b.claim(1)                           # not in b's LRU: the DB row decides
+    assert a.claim(None) and a.claim(None)          # updates without an id are never deduped
+    assert a.stats() == {"claimed": 1, "duplicates": 1, "released": 0, "cached": 1}
+    for i in range(2, 10):
+        a.claim(i)
+    assert a.stats()["cached"] == 4 and not a.claim(1)   # evicted from the LRU, still a duplicate
+    release(path)
+
+def test_forget_allows_redelivery(tmp_path):
+    path, a, b = _pair(tmp_path)
+    assert a.claim(7)
+    a.forget(7)
+    assert b.claim(7) and not a.claim(7)
+    release(path)
+
+def test_bots_do_not_share_ids(tmp_path):
+    path, a, _ = _pair(tmp_path)
+    other = UpdateDeduper(manager(path).get, "other")
+    assert a.claim(5) and other.claim(5)
+    release(path)
+
+def test_sweep_drops_old_rows(tmp_path):
+    path, a, b = _pair(tmp_path)
+    a.ttl = 60
+    a.claim(3)
+    a.sweep(now=a.recent[3] + 61)
+    assert b.claim(3)
+    release(path)
+
+def test_concurrent_workers_claim_each_id_once(tmp_path):
+    path, a, b = _pair(tmp_path)
+    wins = []
+    def worker(d):
+        wins.extend(i for i in range(200) if d.claim(i))
+    threads = [threading.Thread(target=worker, args=(d,)) for d in (a, b, a, b)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert sorted(wins) == list(range(200))
+    release(path)
@@ -0,0 +1,54 @@
+# tests/test_exports.py
+# Order export: keyset batches cover the date range exactly in every format, and a failed
+# /export upload tells the admin nothing about the Bot API URL (it carries the token).
+import os, sys, csv, gzip, json, socket, logging, tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATA_DB_FILE", os.path.join(tempfile.mkdtemp(), "data.sqlite"))
+os.environ.setdefault("DB_PATH", os.path.join(os.path.dirname(os.environ["DATA_DB_FILE"]), "users.sqlite3"))
+import app
+from storage.exports import export_chunks, COLUMNS
+
+def _shop(tmp_path, **env):
+    env = {"DATA_DB_FILE": str(tmp_path / "data.sqlite"), "DB_PATH": str(tmp_path / "users.sqlite3"),
+           "OUTBOX_WORKERS": "0", **env}
+    return app.Shop("t", env)
+
+def _orders(shop, n):
+    c = shop.db()
+    c.executemany("INSERT INTO orders (chat_id,items_json,total,status,created_at) VALUES (?,?,?,?,?)",
+                  [(str(i), json.dumps([{"sku": "A", "qty": i}]), i, "paid" if i % 2 else "new",
+                    f"2026-01-{1 + i % 28:02d}T10:00:00") for i in range(n)])
+    c.commit()
+    return c
+
+def test_export_formats_and_range(tmp_path):
+    shop = _shop(tmp_path)
+    try:
+        c = _orders(shop, 2500)   # more than one keyset batch
+        rows = list(csv.reader(b"".join(export_chunks(c, "csv")).decode("utf-8").splitlines()))
+        assert tuple(rows[0]) == COLUMNS and len(rows) == 2501
+        assert [int(r[0]) for r in rows[1:]] == list(range(1, 2501))
+        lines = gzip.decompress(b"".join(export_chunks(c, "ndjson", True, status="paid",
+                                                       since="2026-01-02", until="2026-01-03"))).splitlines()
+        docs = [json.loads(x) for x in lines]
+        assert docs and all(d["status"] == "paid" and d["created_at"].startswith("2026-01-02") for d in docs)
+        assert docs[0]["items"] == [{"sku": "A", "qty": int(docs[0]["chat_id"])}] and "items_json" not in docs[0]
+        assert list(export_chunks(c, "csv", since="2027-01-01")) == [",".join(COLUMNS).encode() + b"\r\n"]
+    finally:
+        shop.close()
+
+def test_failed_export_hides_error(tmp_path, monkeypatch):
+    s = socket.socket(); s.bind(("127.0.0.1", 0)); port = s.getsockname()[1]; s.close()
+    shop = _shop(tmp_path, TELEGRAM_BOT_TOKEN="123:SECRET", TELEGRAM_API_BASE=f"http://127.0.0.1:{port}")
+    sent, records = [], []
+    monkeypatch.setattr(app, "send_text", lambda shop, chat_id, text, **kw: sent.append(text))
+    h = logging.Handler(); h.emit = records.append
+    shop.log.addHandler(h)
+    try:
+        _orders(shop, 3)
+        app.send_export(shop, 42, "csv", False, None, "all", None, None)
+    finally:
+        shop.log.removeHandler(h)
+        shop.close()
+    assert sent == ["Export failed, please try again later."]
+    assert records and records[0].getMessage() == "export failed"
@@ -0,0 +1,31 @@
+# tests/test_intent_labels.py
+# The `intent` metrics label takes values from a fixed set: admin commands map to their command
+# name or "admin_other", forged callback data never becomes a label.
+import os, re, sys, tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATA_DB_FILE", os.path.join(tempfile.mkdtemp(), "data.sqlite"))
+os.environ.setdefault("DB_PATH", os.path.join(os.path.dirname(os.environ["DATA_DB_FILE"]), "users.sqlite3"))
+import app
+from bot.metrics import METRICS
+
+def test_admin_intent_is_bounded():
+    assert app.admin_intent("/report 7d") == "admin/report"
+    assert app.admin_intent("/broadcast hello") == "admin/broadcast"
+    assert app.admin_intent("/a9f3e2") == "admin_other"
+    assert app.admin_intent("/") == "admin_other"
+
+def test_update_labels_stay_in_fixed_set(tmp_path, monkeypatch):
+    shop = app.Shop("labels", {"DATA_DB_FILE": str(tmp_path / "data.sqlite"), "DB_PATH": str(tmp_path / "users.sqlite3"),
+                               "OUTBOX_WORKERS": "0", "ADMINS": "1"})
+    monkeypatch.setattr(app, "send_text", lambda *a, **kw: None)
+    monkeypatch.setattr(app, "answer_callback", lambda *a, **kw: None)
+    try:
+        for i in range(20):
+            app.handle_update(shop, {"message": {"chat": {"id": 1, "type": "private"}, "text": f"/cmd{i} x"}})
+            app.handle_update(shop, {"callback_query": {"id": str(i), "data": f"x{i}.1.2",
+                                                        "message": {"chat": {"id": 1}, "message_id": 5}}})
+        app.handle_update(shop, {"message": {"chat": {"id": 1, "type": "private"}, "text": "/report"}})
+    finally:
+        shop.close()
+    labels = set(re.findall(r'jawab_update_seconds_count\{tenant="labels",intent="([^"]*)"', METRICS.render()))
+    assert "admin/report" in labels and labels <= {"admin_other", "admin/report", "other", "none"}
@@ -0,0 +1,68 @@
+# tests/test_inventory.py
+# Stock reservations vs sheet syncs: a sync that edits a product keeps the bot's holds and
+# committed orders subtracted, and expiring a hold afterwards gives back exactly what it took.
+import os, sys, sqlite3, time
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bot.sheet_sync import init_sync_schema, apply_rows, parse_row
+from storage.inventory import init_inventory_schema, hold_cart, commit_cart, expire_holds, current_stock, OutOfStock
+
+def _conn(tmp_path):
+    c = sqlite3.connect(str(tmp_path / "shop.sqlite"), isolation_level="")
+    c.execute("""CREATE TABLE products (sku TEXT PRIMARY KEY, category TEXT, name TEXT, price REAL,
+                 stock INTEGER DEFAULT -1, is_available INTEGER DEFAULT 1)""")
+    c.commit()
+    init_sync_schema(c)
+    init_inventory_schema(c)
+    return c
+
+def _sync(c, price=1.0, stock=3):
+    return apply_rows(c, [parse_row({"sku": "A", "name": "Apple", "price": price, "stock": stock}),
+                          parse_row({"sku": "B", "name": "Free", "price": 1})])
+
+def _stock(c, sku="A"):
+    return current_stock(c, [sku])[sku]
+
+def _order(c, chat_id, qty):
+    items = [{"sku": "A", "qty": qty}]
+    hold_cart(c, chat_id, items, ttl=60)
+    c.execute("BEGIN IMMEDIATE")
+    with c:
+        commit_cart(c, chat_id, items, order_id=1)
+
+def test_order_sync_expire(tmp_path):
+    c = _conn(tmp_path)
+    _sync(c)
+    assert _stock(c) == 3 and _stock(c, "B") == -1
+    _order(c, 1, 2)
+    assert _stock(c) == 1
+    assert _sync(c, price=2.0)["changed"] == 1   # price-only edit
+    assert _stock(c) == 1
+    hold_cart(c, 2, [{"sku": "A", "qty": 1}], ttl=60)
+    assert _stock(c) == 0
+    _sync(c, price=3.0)
+    assert _stock(c) == 0
+    with pytest.raises(OutOfStock):
+        hold_cart(c, 3, [{"sku": "A", "qty": 1}], ttl=60)
+    assert expire_holds(c, now=time.time() + 120) == ["A"]
+    assert _stock(c) == 1   # the held unit is back, the ordered two are not
+
+def test_hold_sync_expire_does_not_oversell(tmp_path):
+    c = _conn(tmp_path)
+    _sync(c)
+    hold_cart(c, 1, [{"sku": "A", "qty": 2}], ttl=60)
+    _sync(c, price=2.0)
+    assert _stock(c) == 1
+    expire_holds(c, now=time.time() + 120)
+    assert _stock(c) == 3
+
+def test_new_sheet_count_is_the_base(tmp_path):
+    c = _conn(tmp_path)
+    _sync(c)
+    _order(c, 1, 2)
+    hold_cart(c, 2, [{"sku": "A", "qty": 1}], ttl=60)
+    _sync(c, stock=10)   # recount in the sheet: earlier orders are already in it, live holds are not
+    assert _stock(c) == 9
+    _order(c, 3, 4)
+    _sync(c, price=5.0, stock=10)
+    assert _stock(c) == 5
@@ -0,0 +1,63 @@
+# tests/test_journal.py
+# Journal group commit: rows are written in batches by the flusher, a full ring drops (or, with
+# the "block" policy, waits for the flusher), and a failed batch is counted, not retried forever.
+import os, sys, time, threading
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from storage.journal import Journal
+from storage.pool import manager, release
+
+SQL = "INSERT INTO log (n) VALUES (?)"
+
+def _conn_fn(tmp_path):
+    path = str(tmp_path / "j.sqlite")
+    pool = manager(path)
+    with pool.get() as c:
+        c.execute("CREATE TABLE log (n INTEGER)")
+    return path, pool.get
+
+def _rows(conn_fn):
+    return conn_fn().execute("SELECT COUNT(*) FROM log").fetchone()[0]
+
+def test_batches_commit_on_size(tmp_path):
+    path, conn_fn = _conn_fn(tmp_path)
+    j = Journal(conn_fn, SQL, flush_ms=60_000, batch_rows=50)   # only a full batch wakes the flusher
+    for i in range(120):
+        j.append((i,))
+    deadline = time.monotonic() + 2
+    while _rows(conn_fn) < 50 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert _rows(conn_fn) >= 50 and j.stats()["errors"] == 0   # well before flush_ms
+    assert j.stats()["batches"] < 120                            # grouped, not one commit per row
+    j.close()
+    assert _rows(conn_fn) == 120 and j.stats() == dict(j.stats(), appended=120, written=120, dropped=0, pending=0)
+    release(path)
+
+def test_full_ring_drops(tmp_path):
+    path, conn_fn = _conn_fn(tmp_path)
+    j = Journal(conn_fn, SQL, maxlen=10, flush_ms=60_000, batch_rows=1000)
+    results = [j.append((i,)) for i in range(15)]
+    assert results == [True] * 10 + [False] * 5 and j.stats()["dropped"] == 5
+    assert j.flush() == 10 and j.append((99,))
+    j.close()
+    release(path)
+
+def test_block_policy_waits_for_flusher(tmp_path):
+    path, conn_fn = _conn_fn(tmp_path)
+    j = Journal(conn_fn, SQL, maxlen=10, flush_ms=60_000, batch_rows=1000, policy="block", block_timeout=2)
+    for i in range(10):
+        j.append((i,))
+    threading.Timer(0.1, j.flush).start()
+    t0 = time.monotonic()
+    assert j.append((10,)) and time.monotonic() - t0 >= 0.05
+    j.close()
+    assert _rows(conn_fn) == 11 and j.stats()["dropped"] == 0
+    release(path)
+
+def test_failed_batch_is_counted(tmp_path):
+    path, conn_fn = _conn_fn(tmp_path)
+    j = Journal(conn_fn, "INSERT INTO missing (n) VALUES (?)", flush_ms=60_000)
+    j.append((1,)); j.append((2,))
+    assert j.flush() == 0
+    assert j.stats()["errors"] == 1 and j.stats()["dropped"] == 2 and j.stats()["pending"] == 0
+    j.close()
+    release(path)
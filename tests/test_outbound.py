@@ -0,0 +1,46 @@
+# tests/test_outbound.py
+# A failed Bot API call is logged without the token from its URL, and stats() only reports
+# derived latency fields, sent or not.
+import os, sys, socket, logging
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bot.outbound import Outbox
+from bot.log import redact
+
+class _Records(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+def _closed_port():
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+def test_request_failure_log_has_no_token():
+    out = _Records()
+    logging.getLogger("jawab.outbox").addHandler(out)
+    try:
+        ob = Outbox(workers=0, max_retries=0, timeout=2)
+        ob.submit(f"http://127.0.0.1:{_closed_port()}/bot123456:AAF-secret_x/sendMessage", {"chat_id": 1, "text": "hi"})
+    finally:
+        logging.getLogger("jawab.outbox").removeHandler(out)
+    failed = [r for r in out.records if r.getMessage() == "bot api request failed"]
+    assert failed and "bot<redacted>/sendMessage" in failed[0].error
+    assert not any("AAF-secret_x" in str(r.__dict__) for r in out.records)
+    assert ob.stats()["dropped"] == 1
+
+def test_stats_drop_raw_latency():
+    ob = Outbox(workers=0)
+    s = ob.stats()
+    assert "latency_sum" not in s and "latency_max" not in s and s["latency_avg_ms"] == 0.0
+    ob.counters.update(sent=2, latency_sum=0.5)
+    s = ob.stats()
+    assert "latency_sum" not in s and s["latency_avg_ms"] == 250.0
+
+def test_redact():
+    assert redact("https://api.telegram.org/bot1:a-B_c/sendDocument") == "https://api.telegram.org/bot<redacted>/sendDocument"
@@ -0,0 +1,80 @@
+# tests/test_paging.py
+# Inline catalog browsing: callback_data round-trips within Telegram's 64 bytes, every available
+# product is reachable by following the keyboards, and a callback from an older catalog version
+# starts over at the category list instead of adding whatever now sits at that index.
+import os, sys, json, tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATA_DB_FILE", os.path.join(tempfile.mkdtemp(), "data.sqlite"))
+os.environ.setdefault("DB_PATH", os.path.join(os.path.dirname(os.environ["DATA_DB_FILE"]), "users.sqlite3"))
+import app
+from bot import paging
+from bot.catalog import Catalog
+
+ITEMS = [{"sku": f"S{c}-{i}", "category": f"Cat {c}", "name": f"Item {c}-{i}", "price": i,
+          "is_available": (c + i) % 6 != 0} for c in range(19) for i in range(c * 3)]
+
+def test_encode_decode_round_trip():
+    for args in [("l", 0, 0), ("p", 71, 3, 2), ("a", 2**40, 10**6, 35), ("n", 5)]:
+        data = paging.encode(*args)
+        assert len(data.encode()) <= 64
+        assert paging.decode(data) == (args[0], args[1], list(args[2:]))
+    assert paging.encode("p", 71, 3, 2) == "p.1z.3.2"
+    for bad in ["", None, "x.1.2", "p", "p.zz!.1", "legacy_button"]:
+        assert paging.decode(bad) is None
+
+def _walk(cat, size):
+    """Follow every keyboard from the first category page; -> SKUs the "a" buttons add."""
+    seen, todo, added = set(), [("l", cat.version, [0])], []
+    while todo:
+        kind, version, args = todo.pop()
+        if (kind, tuple(args)) in seen or kind in ("n", "a"):
+            continue
+        seen.add((kind, tuple(args)))
+        if kind == "l":
+            kb = paging.category_list(cat, args[0], size)[1]
+        else:
+            kb = paging.product_page(cat, args[0], args[1], size)[3]
+        for row in kb["inline_keyboard"]:
+            for b in row:
+                k, v, a = paging.decode(b["callback_data"])
+                assert v == cat.version
+                if k == "a":
+                    added.append(cat.products_in(cat.categories[a[0]])[a[1]]["sku"])
+                todo.append((k, v, a))
+    return added
+
+def test_every_product_reachable():
+    cat = Catalog(ITEMS, version=9)
+    for size in (1, 4, 8):
+        added = _walk(cat, size)
+        assert sorted(added) == sorted(it["sku"] for it in ITEMS if it["is_available"])
+
+def test_pages_clamp_and_missing_category():
+    cat = Catalog(ITEMS, version=1)
+    assert paging.category_list(cat, 99, 8)[0] == paging.pages(len(cat.categories), 8) - 1
+    assert paging.product_page(cat, 5, -3, 4)[1] == 0
+    assert paging.product_page(cat, len(cat.categories), 0) is None
+    assert paging.pages(0) == 1
+
+def test_stale_callback_restarts(tmp_path, monkeypatch):
+    shop = app.Shop("t", {"DATA_DB_FILE": str(tmp_path / "data.sqlite"), "DB_PATH": str(tmp_path / "users.sqlite3"),
+                          "OUTBOX_WORKERS": "0"})
+    edits, answers = [], []
+    monkeypatch.setattr(app, "edit_screen", lambda shop, chat_id, mid, frag: edits.append(frag.text))
+    monkeypatch.setattr(app, "answer_callback", lambda shop, cid, text=None: answers.append(text))
+    cb = lambda data: app.handle_callback(shop, {"id": "1", "data": data, "message": {"chat": {"id": 7}, "message_id": 3}})
+    try:
+        app.install_catalog(shop, ITEMS, version=4)
+        cb(paging.encode("a", 4, 2, 0))
+        assert [it["sku"] for it in app.cart_get(shop, 7)] == [shop.catalog.products_in(shop.catalog.categories[2])[0]["sku"]]
+        assert answers[-1].startswith("Added to cart")
+        cb(paging.encode("p", 4, 1, 0))
+        name = shop.catalog.categories[1]
+        assert edits[-1] == f"Products in {name}:" and json.loads(shop.ctx["7"]) == {"category": name}
+        app.install_catalog(shop, ITEMS[::-1], version=5)
+        cb(paging.encode("a", 4, 2, 0))
+        assert edits[-1] == "Catalog updated. Categories:" and len(app.cart_get(shop, 7)) == 1
+        cb(paging.encode("a", 5, 2, 999))   # index out of range: answered, nothing added
+        assert answers[-1] is None and len(app.cart_get(shop, 7)) == 1
+    finally:
+        shop.close()
@@ -0,0 +1,33 @@
+# tests/test_ratelimit.py
+# Send scheduling: a private chat gets its burst then one message per 1/rate seconds, groups use
+# the per-minute rate, the global budget caps all chats together without one throttled chat
+# holding the others back, and after a 429 nothing for that chat is scheduled before retry_after.
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bot.ratelimit import TokenBucket, RateLimiter
+
+def test_bucket_burst_then_rate():
+    b = TokenBucket(rate=2, burst=3)
+    assert [b.reserve(10.0) for _ in range(5)] == [10.0, 10.0, 10.0, 10.5, 11.0]
+    assert b.reserve(20.0) == 20.0   # idle time refills the burst
+
+def test_private_and_group_rates():
+    rl = RateLimiter(rate_global=1000, rate_chat=1, rate_group=20 / 60, burst_chat=1)
+    assert [rl.reserve(1, 0.0) for _ in range(3)] == [0.0, 1.0, 2.0]
+    assert [round(rl.reserve(-100, 0.0), 6) for _ in range(3)] == [0.0, 3.0, 6.0]
+    assert [round(rl.reserve("-100200", 0.0), 6) for _ in range(2)] == [0.0, 3.0]
+    assert rl.reserve(2, 0.0) == 0.0   # other chats are not held back by chat 1
+
+def test_global_cap_spans_chats():
+    rl = RateLimiter(rate_global=30, rate_chat=1, burst_chat=1)
+    slots = [rl.reserve(chat, 0.0) for chat in range(60)]
+    assert slots[:30] == [0.0] * 30 and slots[30] > 0
+    assert round(slots[-1], 6) == round(30 / 30, 6)
+
+def test_defer_holds_chat_until_retry_after():
+    rl = RateLimiter(rate_global=1000, rate_chat=1, burst_chat=3)
+    rl.defer(1, 10.0)
+    assert rl.reserve(1, 0.0) >= 10.0 + 1.0   # the retried message itself goes at 10.0
+    assert rl.reserve(2, 0.0) == 0.0
+    rl.defer(None, 5.0, global_too=True)
+    assert rl.reserve(3, 0.0) >= 5.0
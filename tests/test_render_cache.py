@@ -0,0 +1,47 @@
+# tests/test_render_cache.py
+# Pre-serialized screens: splicing chat_id / message_id yields the same JSON as serializing the
+# whole body, screens are built once per (lang, screen, catalog version), and installing a new
+# catalog version drops the old screens.
+import os, sys, json, tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATA_DB_FILE", os.path.join(tempfile.mkdtemp(), "data.sqlite"))
+os.environ.setdefault("DB_PATH", os.path.join(os.path.dirname(os.environ["DATA_DB_FILE"]), "users.sqlite3"))
+import app
+from bot.render_cache import Fragment, RenderCache
+
+def test_fragment_body_is_full_json():
+    kb = {"inline_keyboard": [[{"text": "چای \"سبز\"", "callback_data": "a.1.0.0"}]]}
+    f = Fragment("قیمت‌ها:\n1) Tea — $2.00", kb, parse_mode="HTML")
+    want = {"text": "قیمت‌ها:\n1) Tea — $2.00", "reply_markup": kb, "parse_mode": "HTML"}
+    assert json.loads(f.body(42)) == dict(want, chat_id=42)
+    assert json.loads(f.body(-100123, 7)) == dict(want, chat_id=-100123, message_id=7)
+    assert json.loads(Fragment("hi").body("@chan")) == {"chat_id": "@chan", "text": "hi"}
+
+def test_cache_builds_once_and_evicts_lru():
+    rc, builds = RenderCache(max_entries=2), []
+    build = lambda key: lambda: (builds.append(key) or f"t{key}", None)
+    a = rc.get("a", build("a"))
+    assert rc.get("a", build("a")) is a and builds == ["a"]
+    rc.get("b", build("b")); rc.get("a", build("a")); rc.get("c", build("c"))   # "b" is least recent
+    rc.get("a", build("a")); rc.get("b", build("b"))
+    assert builds == ["a", "b", "c", "b"]
+    assert rc.stats() == {"entries": 2, "hits": 3, "misses": 4}
+    rc.clear()
+    assert rc.stats()["entries"] == 0
+
+def test_screens_follow_catalog_version(tmp_path):
+    shop = app.Shop("t", {"DATA_DB_FILE": str(tmp_path / "data.sqlite"), "DB_PATH": str(tmp_path / "users.sqlite3"),
+                          "OUTBOX_WORKERS": "0"})
+    items = [{"sku": "A", "category": "Tea", "name": "Green", "price": 2}]
+    try:
+        app.install_catalog(shop, items, version=3)
+        f = app.categories_screen(shop, "EN")
+        assert app.categories_screen(shop, "EN") is f and app.categories_screen(shop, "FA") is not f
+        app.install_catalog(shop, items, version=3)   # same version: cached screens stay
+        assert app.categories_screen(shop, "EN") is f
+        app.install_catalog(shop, items + [{"sku": "B", "category": "Coffee", "name": "Latte", "price": 3}], version=4)
+        assert shop.render.stats()["entries"] == 0
+        g = app.categories_screen(shop, "EN")
+        assert g is not f and "Coffee" in g.body(1).decode() and "Coffee" not in f.body(1).decode()
+    finally:
+        shop.close()
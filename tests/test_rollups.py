@@ -0,0 +1,58 @@
+# tests/test_rollups.py
+# /report totals come from hourly/daily rollups; over any range they must equal a scan of the
+# orders table, whether the rollups were bumped per order or rebuilt by backfill().
+import os, sys, json, random, sqlite3
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from storage.rollups import init_rollup_schema, record_order, range_summary, backfill
+
+T0 = datetime(2024, 3, 1, 0, 0)
+
+def _db():
+    c = sqlite3.connect(":memory:")
+    c.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, created_at TEXT, total REAL, items_json TEXT)")
+    init_rollup_schema(c)
+    return c
+
+def _place(c, rnd, n=300):
+    for _ in range(n):
+        at = (T0 + timedelta(minutes=rnd.randrange(10 * 24 * 60))).isoformat()
+        items = [{"sku": "A", "qty": rnd.randint(1, 3)} for _ in range(rnd.randint(1, 2))]
+        total = float(rnd.randint(1, 50))
+        with c:
+            c.execute("INSERT INTO orders (created_at,total,items_json) VALUES (?,?,?)", (at, total, json.dumps(items)))
+            record_order(c, at, total, sum(i["qty"] for i in items))
+
+def _scan(c, since, until):
+    rows = [r for r in c.execute("SELECT created_at,total,items_json FROM orders")
+            if since.isoformat() <= r[0] < until.isoformat()]
+    return {"orders": len(rows), "revenue": float(sum(r[1] for r in rows)),
+            "items": sum(i["qty"] for r in rows for i in json.loads(r[2]))}
+
+RANGES = [(T0, T0 + timedelta(days=10)),                                      # whole days
+          (T0 + timedelta(hours=5), T0 + timedelta(days=3, hours=7)),         # ragged head and tail
+          (T0 + timedelta(days=2, hours=3), T0 + timedelta(days=2, hours=9)), # inside one day
+          (T0 + timedelta(days=4), T0 + timedelta(days=4))]                   # empty
+
+def test_summary_matches_scan():
+    c, rnd = _db(), random.Random(1)
+    _place(c, rnd)
+    for since, until in RANGES:
+        assert range_summary(c, since, until) == _scan(c, since, until)
+
+def test_backfill_rebuilds_same_totals():
+    c, rnd = _db(), random.Random(2)
+    _place(c, rnd)
+    before = [range_summary(c, *r) for r in RANGES]
+    c.execute("DELETE FROM sales_hourly"); c.execute("DELETE FROM sales_daily"); c.commit()
+    assert range_summary(c, *RANGES[0])["orders"] == 0
+    assert backfill(c) == 300
+    assert [range_summary(c, *r) for r in RANGES] == before
+
+def test_schema_backfills_existing_orders_once():
+    c = sqlite3.connect(":memory:")
+    c.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, created_at TEXT, total REAL, items_json TEXT)")
+    c.execute("INSERT INTO orders (created_at,total,items_json) VALUES (?,?,?)",
+              ((T0 + timedelta(hours=1)).isoformat(), 9.5, json.dumps([{"sku": "A", "qty": 2}])))
+    init_rollup_schema(c)
+    assert range_summary(c, T0, T0 + timedelta(days=1)) == {"orders": 1, "revenue": 9.5, "items": 2}
@@ -0,0 +1,39 @@
+# tests/test_router.py
+# IntentRouter over the app's rules: one pass returns the highest-priority intent, so the more
+# specific "🧹 Empty cart" wins over "cart", categories rank right after products, and
+# emoji-only needles never match everything.
+import os, sys, tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATA_DB_FILE", os.path.join(tempfile.mkdtemp(), "data.sqlite"))
+os.environ.setdefault("DB_PATH", os.path.join(os.path.dirname(os.environ["DATA_DB_FILE"]), "users.sqlite3"))
+import app
+from bot.router import IntentRouter, normalize_text
+
+def _router(categories=()):
+    return IntentRouter(app.intent_rules(), categories=categories)
+
+def test_buttons_in_every_language():
+    r = _router()
+    for lang in app.TEXT:
+        assert r.match(app.TEXT[lang]["btn_cart"]) == ("cart", None)
+        assert r.match(app.TEXT[lang]["btn_products"]) == ("products", None)
+        assert r.match(app.TEXT[lang]["btn_order"]) == ("checkout", None)
+
+def test_empty_cart_beats_cart():
+    r = _router()
+    assert r.match("🧹 Empty cart") == ("empty_cart", None)
+    assert r.match("please empty cart now") == ("empty_cart", None)
+    assert r.match("show my cart") == ("cart", None)
+
+def test_priority_products_category_then_rest():
+    r = _router(["Cart accessories", "Drinks"])
+    assert r.match("products in cart accessories") == ("products", None)   # products outranks categories
+    assert r.match("cart accessories") == ("category", "Cart accessories")  # categories outrank cart
+    assert r.match("drink") == ("category", "Drinks")                      # text inside a category name
+    assert r.match("back to support") == ("support", None)                 # earlier rule wins, not earlier position
+
+def test_no_match_and_emoji_only():
+    r = _router(["Drinks"])
+    assert r.match("hello there") == (None, None)
+    assert r.match("🧺") == (None, None) and normalize_text("🧺") == ""
+    assert r.match("") == (None, None)
@@ -0,0 +1,56 @@
+# tests/test_search.py
+# Product search folds Persian/Arabic letter variants, diacritics and digits, tolerates typos and
+# partial words, ranks exact titles and in-order phrases first, and update() re-indexes only
+# what changed.
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bot.catalog import Catalog
+from bot.search import SearchIndex, fold, words
+
+ITEMS = [
+    {"sku": "c1", "category": "نوشیدنی", "name": "چای سبز"},
+    {"sku": "c2", "category": "نوشیدنی", "name": "قهوه ترک"},
+    {"sku": "c3", "category": "حلويات", "name": "كعكة الشوكولاتة"},
+    {"sku": "c4", "category": "Sweets", "name": "Chocolate bar 100g"},
+    {"sku": "c5", "category": "Sweets", "name": "Dark chocolate"},
+    {"sku": "c6", "category": "Sweets", "name": "Chocolate dark bar"},
+    {"sku": "c7", "category": "Bakery", "name": "Bread ۲۰۰ گرم"},
+    {"sku": "c8", "category": "Sweets", "name": "Hidden cake", "is_available": 0},
+]
+
+def _index(items=ITEMS, version=1):
+    idx = SearchIndex()
+    idx.update(Catalog(items, version=version))
+    return idx
+
+def test_fold_unifies_scripts():
+    assert fold("كيك") == fold("کیک")                       # Arabic kaf/yeh -> Persian
+    assert fold("الشوكولاتة") == fold("الشوکولاته")          # teh marbuta -> heh
+    assert fold("أحمد") == fold("احمد") and fold("مُحَمَّد") == fold("محمد")
+    assert fold("١٢٣") == fold("۱۲۳") == "123"
+    assert words("نان‌ها") == ["نان", "ها"] and words("قهــوه") == ["قهوه"]
+
+def test_cross_script_typo_and_prefix():
+    idx = _index()
+    assert idx.search("کعکه الشوکولاته")[0] == "c3"   # typed with Persian letters
+    assert set(idx.search("choclate")[:3]) == {"c4", "c5", "c6"}
+    assert idx.search("قهو") == ["c2"]
+    assert idx.search("200") == ["c7"]                # Persian digits indexed as ASCII
+    assert idx.search("hidden") == [] and idx.search("!!") == []
+
+def test_phrase_and_category_ranking():
+    idx = _index()
+    assert idx.search("dark chocolate")[0] == "c5"    # exact title before "Chocolate dark bar"
+    assert idx.search("chocolate dark")[0] == "c6"    # words adjacent and in order
+    assert idx.search("sweets chocolate")[0] in {"c4", "c5", "c6"}
+    assert idx.search("نوشیدنی") == ["c1", "c2"]      # category hits keep catalog order
+
+def test_update_is_incremental():
+    idx = _index()
+    items = [dict(it) for it in ITEMS]
+    items[1]["name"] = "قهوه اسپرسو"
+    del items[0]
+    assert idx.update(Catalog(items, version=2)) == {"added": 0, "changed": 1, "removed": 1, "docs": 6}
+    assert idx.search("اسپرسو") == ["c2"] and idx.search("چای") == [] and "سبز" not in idx.vocab
+    idx.ensure(Catalog(items, version=2))
+    assert idx.version == 2
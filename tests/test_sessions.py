@@ -0,0 +1,63 @@
+# tests/test_sessions.py
+# SqliteSessionStore: count() on a store this process has not touched yet (a freshly forked
+# worker), TTL expiry that agrees between get() and count() for write-behind entries, and
+# writes of one worker seen by another through the data_version-checked cache.
+# MemorySessionStore keeps the same dict-like namespace API.
+import os, sys, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from storage.sessions import SqliteSessionStore, MemorySessionStore
+
+def test_count_before_first_use(tmp_path):
+    path = str(tmp_path / "s.sqlite")
+    a = SqliteSessionStore(path)
+    a.namespace("cart")["1"] = [{"sku": "A"}]
+    a.flush()
+    b = SqliteSessionStore(path)   # like a worker after fork: no get / set yet
+    assert len(b.namespace("cart")) == 1
+    a.close(); b.close()
+
+def test_ttl_applies_to_cached_writes(tmp_path):
+    s = SqliteSessionStore(str(tmp_path / "s.sqlite"))
+    s._last_sweep = time.time()   # the periodic sweep would also drop the cache; test get() alone
+    carts = s.namespace("cart", ttl=0.2)
+    assert carts.get("1") is None
+    carts["1"] = ["x"]
+    assert carts.get("1") == ["x"] and len(carts) == 1
+    time.sleep(0.3)
+    assert carts.get("1") is None and "1" not in carts
+    assert len(carts) == 0
+    s.close()
+
+def test_other_worker_writes_invalidate_cache(tmp_path):
+    path = str(tmp_path / "s.sqlite")
+    a, b = SqliteSessionStore(path), SqliteSessionStore(path)
+    ca, cb = a.namespace("cart"), b.namespace("cart")
+    ca["1"] = ["x"]
+    a.flush()
+    assert cb.get("1") == ["x"]          # now cached in b
+    ca["1"] = ["x", "y"]
+    assert cb.get("1") == ["x"]          # a has not committed yet
+    a.flush()
+    assert cb.get("1") == ["x", "y"]     # a's commit bumped data_version: b re-reads
+    assert cb.pop("1") == ["x", "y"] and "1" not in cb
+    b.flush()
+    assert ca.get("1") is None and len(ca) == 0
+    a.close(); b.close()
+
+def test_write_behind_flusher_commits(tmp_path):
+    path = str(tmp_path / "s.sqlite")
+    a = SqliteSessionStore(path, flush_ms=10)
+    a.namespace("ctx")["7"] = "cart_order"
+    deadline = time.monotonic() + 2
+    b = SqliteSessionStore(path)
+    while b.namespace("ctx").get("7") is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert b.namespace("ctx").get("7") == "cart_order"
+    a.close(); b.close()
+
+def test_memory_store_namespaces():
+    s = MemorySessionStore()
+    carts, ctx = s.namespace("cart"), s.namespace("ctx")
+    carts["1"] = [1]
+    assert carts["1"] == [1] and ctx.get("1") is None and len(carts) == 1
+    assert carts.pop("1") == [1] and carts.pop("1", "gone") == "gone"
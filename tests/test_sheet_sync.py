@@ -0,0 +1,76 @@
+# tests/test_sheet_sync.py
+# sync_sheet against a local HTTP server: a Content-Length body (urllib3 2.x auto-closes the raw
+# stream at EOF) and a chunked one must both parse completely. Applying the delta takes the
+# write lock up front; staging the download does not hold it.
+import os, sys, sqlite3, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bot.sheet_sync import sync_sheet, init_sync_schema, apply_rows, parse_row
+
+SHEET = "﻿sku,category,name,price,stock\n" + "".join(f"S{i},Cat {i % 3},Item {i},{i}.5,{i % 7}\n" for i in range(3000))
+
+class _Sheet(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = SHEET.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("ETag", '"v1"')
+        if self.path.startswith("/chunked"):
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i in range(0, len(body), 4096):
+                part = body[i:i + 4096]
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(part), part))
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture(scope="module")
+def server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Sheet)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_port}"
+    srv.shutdown()
+
+def _conn():
+    c = sqlite3.connect(":memory:")
+    c.execute("""CREATE TABLE products (sku TEXT PRIMARY KEY, category TEXT, name TEXT, price REAL,
+                 stock INTEGER DEFAULT -1, is_available INTEGER DEFAULT 1)""")
+    init_sync_schema(c)
+    return c
+
+@pytest.mark.parametrize("path", ["/sheet.csv", "/chunked.csv"])
+def test_sync_reads_whole_sheet(server, path):
+    c = _conn()
+    res = sync_sheet(c, server + path)
+    assert res["total"] == res["added"] == 3000
+    assert c.execute("SELECT name, price, stock FROM products WHERE sku='S2999'").fetchone() == ("Item 2999", 2999.5, 2999 % 7)
+    assert c.execute("SELECT value FROM sync_state WHERE key='sheet_etag'").fetchone()[0] == '"v1"'
+
+def test_apply_takes_write_lock_only_after_staging(tmp_path):
+    path = str(tmp_path / "shop.sqlite")
+    c = sqlite3.connect(path)
+    c.execute("""CREATE TABLE products (sku TEXT PRIMARY KEY, category TEXT, name TEXT, price REAL,
+                 stock INTEGER DEFAULT -1, is_available INTEGER DEFAULT 1)""")
+    init_sync_schema(c)
+    other = sqlite3.connect(path, timeout=0)
+    stmts = []
+    c.set_trace_callback(stmts.append)
+
+    def rows():
+        yield parse_row({"sku": "A", "name": "Apple", "price": 1})
+        other.execute("INSERT INTO products (sku,name,price) VALUES ('X','stale',1)")   # would fail while locked
+        other.commit()
+        yield parse_row({"sku": "B", "name": "Pear", "price": 2})
+
+    assert apply_rows(c, rows()) == {"total": 2, "added": 2, "changed": 0, "removed": 1}
+    assert "BEGIN IMMEDIATE" in stmts
+    assert [r[0] for r in c.execute("SELECT sku FROM products ORDER BY sku")] == ["A", "B"]
@@ -0,0 +1,47 @@
+# tests/test_snapshot.py
+# The mmapped catalog snapshot reads back exactly what the in-memory Catalog serves, and a store
+# in another "worker" picks up a newly published file while old mappings stay readable.
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bot.catalog import Catalog
+from bot.snapshot import SnapshotStore, SnapshotCatalog, write_snapshot
+
+ITEMS = [{"sku": f"S{i}", "category": ["Tea", "قهوه", None][i % 3], "name": f"Item {i} چای",
+          "price": i + 0.5, "stock": i % 4 - 1, "is_available": i % 5 != 0} for i in range(60)]
+
+def test_snapshot_matches_catalog(tmp_path):
+    path = str(tmp_path / "cat.bin")
+    assert write_snapshot(path, ITEMS, version=7) == 60
+    snap, cat = SnapshotCatalog(path), Catalog(ITEMS, version=7)
+    assert snap.version == 7 and len(snap) == len(cat)
+    assert sorted(snap.categories) == sorted(cat.categories)
+    for c in cat.categories:
+        want = [(p["sku"], p["name"], p["price"]) for p in cat.products_in(c)]
+        got = snap.products_in(c)
+        assert [(p["sku"], p["name"], p["price"]) for p in got] == want
+        assert [p["sku"] for p in got[1:3]] == [p[0] for p in want[1:3]] and got[-1]["sku"] == want[-1][0]
+    for it in ITEMS:
+        assert snap.get(it["sku"])["stock"] == it["stock"]
+    assert snap.get("missing") is None and len(snap.products_in("nope")) == 0
+    snap.set_stock("S1", 99)
+    assert snap.get("S1")["stock"] == 99
+
+def test_store_remaps_new_version(tmp_path):
+    path = str(tmp_path / "sub" / "cat.bin")
+    writer, reader = SnapshotStore(path), SnapshotStore(path, check_every=0)
+    assert reader.current() is None
+    writer.publish(ITEMS[:10], version=1)
+    old = reader.current()
+    assert old.version == 1 and len(old) == 10
+    writer.publish(ITEMS, version=2)
+    assert reader.current().version == 2 and len(reader.current()) == 60
+    assert old.get("S3")["name"] == "Item 3 چای"   # the previous mapping is still consistent
+
+def test_store_ignores_foreign_file(tmp_path):
+    path = str(tmp_path / "cat.bin")
+    store = SnapshotStore(path, check_every=0)
+    store.publish(ITEMS[:5], version=1)
+    with open(path + ".x", "wb") as f:
+        f.write(b"not a snapshot" * 10)
+    os.replace(path + ".x", path)
+    assert store.current().version == 1
@@ -0,0 +1,81 @@
+# tests/test_tenants.py
+# TenantRegistry builds each shop through its factory from a tenant-scoped env (no process
+# shop settings leak in) and closes it on eviction; a slow build happens once per tenant and
+# outside the registry lock. Metric names register only once.
+import os, sys, json, time, threading
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bot.tenants as tenants
+from bot.metrics import Registry
+
+class _Shop:
+    def __init__(self, name, env):
+        self.name, self.env, self.closed = name, env, False
+
+    def close(self):
+        self.closed = True
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    cfg = tmp_path / "tenants.json"
+    cfg.write_text(json.dumps({"defaults": {"PLAN": "gold"},
+                               "tenants": {"a": {"TELEGRAM_BOT_TOKEN": "1:a"}, "b": {"TELEGRAM_BOT_TOKEN": "2:b"}}}))
+    monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "0:main")
+    monkeypatch.setenv("ADMINS", "42")
+    monkeypatch.setattr(tenants, "TENANT_CLOSE_GRACE", 0)
+    return tenants.TenantRegistry(tenants.TenantConfigs(str(cfg)), _Shop, max_loaded=1, base_dir=str(tmp_path))
+
+def test_shop_env_is_tenant_scoped(registry, tmp_path):
+    a = registry.get("a")
+    assert a.name == "a" and registry.get("a") is a
+    assert a.env["TELEGRAM_BOT_TOKEN"] == "1:a" and a.env["PLAN"] == "gold"
+    assert "ADMINS" not in a.env
+    assert a.env["DB_PATH"] == os.path.join(str(tmp_path), "a", "users.sqlite3")
+    assert registry.get("nope") is None and registry.get("../a") is None
+
+def test_lru_eviction_closes_shop(registry):
+    a = registry.get("a")
+    b = registry.get("b")
+    assert registry.shops() == [b]
+    deadline = time.monotonic() + 2
+    while not a.closed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert a.closed and not b.closed
+
+def test_metric_names_register_once():
+    r = Registry()
+    r.counter("x_total", "x", ("tenant",))
+    with pytest.raises(ValueError):
+        r.counter("x_total", "x", ("tenant",))
+
+def test_shop_prefixed_texts_do_not_leak(tmp_path, monkeypatch):
+    for k in ("CONTENT_GOLD_AR", "APP_SILVER_EN", "BTN_PRODUCTS_FA", "CATALOG_TITLE_EN"):
+        monkeypatch.setenv(k, "main shop text")
+    env = tenants.tenant_environ("a", {"APP_SILVER_EN": "a's plan"}, str(tmp_path))
+    assert env["APP_SILVER_EN"] == "a's plan"
+    assert not {"CONTENT_GOLD_AR", "BTN_PRODUCTS_FA", "CATALOG_TITLE_EN"} & set(env)
+
+def test_slow_load_builds_once_without_blocking_others(registry):
+    registry.max_loaded = 2
+    built, release = [], threading.Event()
+
+    def factory(name, env):
+        built.append(name)
+        if name == "a":
+            release.wait(2)
+        return _Shop(name, env)
+
+    registry.factory = factory
+    got = []
+    threads = [threading.Thread(target=lambda: got.append(registry.get("a"))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    t0 = time.monotonic()
+    b = registry.get("b")   # not held up by a's build
+    assert b.name == "b" and time.monotonic() - t0 < 0.5
+    release.set()
+    for t in threads:
+        t.join(2)
+    assert built.count("a") == 1 and len(got) == 4 and all(s is got[0] for s in got)
+    assert registry.counters["loads"] == 2
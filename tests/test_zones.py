@@ -0,0 +1,83 @@
+# tests/test_zones.py
+# Delivery zones: the grid lookup agrees with testing every zone in priority order, the three
+# source formats describe the same zones, and checkout prices delivery by zone (refusing
+# locations outside every zone and orders below the zone's minimum).
+import os, sys, json, random, tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATA_DB_FILE", os.path.join(tempfile.mkdtemp(), "data.sqlite"))
+os.environ.setdefault("DB_PATH", os.path.join(os.path.dirname(os.environ["DATA_DB_FILE"]), "users.sqlite3"))
+import pytest
+import app
+from bot.zones import Zone, ZoneIndex, parse_zones
+
+ZONES = [
+    {"name": "Center", "fee": 1.5, "min_order": 10,
+     "polygon": [[35.68, 51.38], [35.72, 51.38], [35.72, 51.43], [35.70, 51.41], [35.68, 51.43]]},   # concave
+    {"name": "North", "fee": 3, "min_order": 20, "center": [35.75, 51.42], "radius_km": 6},
+    {"name": "Wide", "fee": 5, "center": [35.70, 51.40], "radius_km": 15},
+]
+
+def _brute(zones, lat, lon):
+    return next((z for z in zones if z.contains(lat, lon)), None)
+
+def test_grid_matches_brute_force():
+    zones = parse_zones(json.dumps(ZONES))
+    rnd = random.Random(5)
+    for cell in (0.01, 0.003, 0.05):
+        idx = ZoneIndex(zones, cell_deg=cell)
+        for _ in range(3000):
+            lat, lon = 35.5 + rnd.random() * 0.4, 51.2 + rnd.random() * 0.4
+            assert idx.locate(lat, lon) is _brute(zones, lat, lon)
+    idx = ZoneIndex(zones)
+    assert idx.locate(35.69, 51.39).name == "Center"
+    assert idx.locate(35.69, 51.428).name == "Wide"     # in the notch of the concave polygon
+    assert idx.locate(35.0, 50.0) is None and ZoneIndex().locate(35.7, 51.4) is None
+
+def test_huge_zone_coarsens_grid():
+    idx = ZoneIndex([Zone("Province", center=(32.0, 53.0), radius_km=300)])
+    assert idx.stats()["cell_deg"] > 0.01 and idx.stats()["cells"] <= 200000
+    assert idx.locate(32.0, 53.0).name == "Province" and idx.locate(36.0, 53.0) is None
+
+def test_formats_agree():
+    geo = {"type": "FeatureCollection", "features": [
+        {"type": "Feature", "properties": {"name": "Center", "fee": 1.5, "min_order": 10},
+         "geometry": {"type": "Polygon", "coordinates": [[[lon, lat] for lat, lon in ZONES[0]["polygon"]]]}},
+        {"type": "Feature", "properties": {"name": "North", "fee": 3, "min_order": 20, "radius_km": 6},
+         "geometry": {"type": "Point", "coordinates": [51.42, 35.75]}}]}
+    csv_text = ("name,fee,min_order,lat,lon,radius_km,polygon\n"
+                "Center,1.5,10,,,,\"" + "; ".join(f"{a} {b}" for a, b in ZONES[0]["polygon"]) + "\"\n"
+                "North,3,20,35.75,51.42,6,\n")
+    shape = lambda zs: [(z.name, z.fee, z.min_order, z.poly, z.center, z.radius_km) for z in zs]
+    want = shape(parse_zones(json.dumps(ZONES[:2])))
+    assert shape(parse_zones(json.dumps(geo))) == want
+    assert shape(parse_zones(csv_text, "csv")) == want
+    with pytest.raises(ValueError):
+        Zone("bad", poly=[(1, 1), (2, 2)])
+    with pytest.raises(ValueError):
+        parse_zones(json.dumps([{"name": "nowhere", "fee": 1}]))
+
+def test_checkout_prices_by_zone(tmp_path, monkeypatch):
+    zones_file = tmp_path / "zones.json"
+    zones_file.write_text(json.dumps(ZONES[:2]), encoding="utf-8")
+    shop = app.Shop("t", {"DATA_DB_FILE": str(tmp_path / "data.sqlite"), "DB_PATH": str(tmp_path / "users.sqlite3"),
+                          "OUTBOX_WORKERS": "0", "DEFAULT_LANG": "EN", "DELIVERY_ZONES": str(zones_file)})
+    sent = []
+    monkeypatch.setattr(app, "send_text", lambda shop, chat_id, text, **kw: sent.append(text))
+    monkeypatch.setattr(app, "notify_admins", lambda shop, text: None)
+    at = lambda lat, lon: app.process_update(shop, {"message": {"chat": {"id": 9, "type": "private"},
+                                                                 "location": {"latitude": lat, "longitude": lon}}})
+    try:
+        assert len(shop.zones) == 2
+        app.cart_add(shop, 9, {"sku": "T", "name": "Tea", "price": 12.0, "qty": 1})
+        shop.ctx["9"] = "cart_order"
+        at(35.0, 50.0)
+        assert sent[-1] == app.TEXT["EN"]["out_of_zone"] and shop.ctx.get("9") == "cart_order"
+        at(35.75, 51.42)
+        assert sent[-1].startswith("Minimum order for North: $20.00") and app.cart_get(shop, 9)
+        shop.ctx["9"] = "cart_order"
+        at(35.69, 51.39)
+        assert "Delivery (Center): $1.50\nTotal: $13.50" in sent[-1] and not app.cart_get(shop, 9)
+        row = shop.db().execute("SELECT delivery_zone, delivery_fee, total FROM orders").fetchall()
+        assert [tuple(r) for r in row] == [("Center", 1.5, 13.5)]
+    finally:
+        shop.close()